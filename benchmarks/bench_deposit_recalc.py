@@ -0,0 +1,131 @@
+"""
+Benchmark the columnar deposit validator against the original row-wise implementation.
+
+Usage:
+    python benchmarks/bench_deposit_recalc.py --rows 10000 100000 1000000
+
+The row-wise version is slow, so it is only run up to --legacy-max-rows; larger
+sizes report the columnar engine alone.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validation import DEFAULT_TOLERANCES, recalculate_and_validate_deposits
+
+# The row-wise formulas exactly as main.py had them before the columnar engine
+LEGACY_RECALCULATIONS = {
+    'RC_CLEO.Lit Sell GDR/USD - Reference': lambda row: row['CLEO.Lit Buy GDR/USD - Reference'] * (100 + row['Total Markup - For Referrence']) / 100,
+    'RC_Deposit Amount USD': lambda row: row['Deposit Amount OC'] * row['CLEO.lit Buy Token/USD Reference'],
+    'RC_GDR Client Receive': lambda row: row['RC_Deposit Amount USD'] / row['RC_CLEO.Lit Sell GDR/USD - Reference'],
+    'RC_COGs': lambda row: row['GDR Client Receive'] * row['CLEO.Lit Buy GDR/USD - Reference'],
+    'RC_Revenue': lambda row: row['GDR Client Receive'] * row['RC_CLEO.Lit Sell GDR/USD - Reference'],
+    'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': lambda row: row['Mark up rate 5 - Transfer transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 4 - Value - Business risk reserve': lambda row: row['Mark up rate 4 - Business risk reserve'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 3 - Value - Crypto to fiat conversion': lambda row: row['Mark up rate 3 - Crypto to fiat conversion'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': lambda row: row['Mark up rate 2 - Withdrawal transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 1 - Value - Gold price fluctuation': lambda row: row['Mark up rate 1 - Gold Price Fluctuation'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs'])
+}
+
+
+def make_deposits(rows, seed=0, discrepancy_rate=0.01):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Transaction ID': [f"TX{i:09d}" for i in range(rows)],
+        'Amount Dc': rng.uniform(-1, 1000, rows),
+        'Deposit Amount OC': rng.uniform(0.001, 30000, rows),
+        'CLEO.lit Buy Token/USD Reference': rng.uniform(0.9, 1.1, rows),
+        'CLEO.Lit Buy GDR/USD - Reference': rng.uniform(60, 80, rows),
+        'Mark up rate 1 - Gold Price Fluctuation': rng.uniform(0, 1, rows),
+        'Mark up rate 2 - Withdrawal transasaction & gas fee': rng.uniform(0, 1, rows),
+        'Mark up rate 3 - Crypto to fiat conversion': rng.uniform(0, 1, rows),
+        'Mark up rate 4 - Business risk reserve': rng.uniform(0, 1, rows),
+        'Mark up rate 5 - Transfer transasaction & gas fee': rng.uniform(0, 1, rows),
+    })
+    df['Total Markup - For Referrence'] = df[[
+        'Mark up rate 1 - Gold Price Fluctuation',
+        'Mark up rate 2 - Withdrawal transasaction & gas fee',
+        'Mark up rate 3 - Crypto to fiat conversion',
+        'Mark up rate 4 - Business risk reserve',
+        'Mark up rate 5 - Transfer transasaction & gas fee',
+    ]].sum(axis=1)
+
+    # Fill the exported columns with the correct values so only injected rows mismatch
+    df['CLEO.Lit Sell GDR/USD - Reference'] = df['CLEO.Lit Buy GDR/USD - Reference'] * (100 + df['Total Markup - For Referrence']) / 100
+    df['Deposit Amount USD'] = df['Deposit Amount OC'] * df['CLEO.lit Buy Token/USD Reference']
+    df['GDR Client Receive'] = df['Deposit Amount USD'] / df['CLEO.Lit Sell GDR/USD - Reference']
+    df['COGs'] = df['GDR Client Receive'] * df['CLEO.Lit Buy GDR/USD - Reference']
+    df['Revenue'] = df['GDR Client Receive'] * df['CLEO.Lit Sell GDR/USD - Reference']
+    for rate_col, value_col in [
+        ('Mark up rate 5 - Transfer transasaction & gas fee', 'Mark up rate 5 - Value - Transfer transasaction & gas fee'),
+        ('Mark up rate 4 - Business risk reserve', 'Mark up rate 4 - Value - Business risk reserve'),
+        ('Mark up rate 3 - Crypto to fiat conversion', 'Mark up rate 3 - Value - Crypto to fiat conversion'),
+        ('Mark up rate 2 - Withdrawal transasaction & gas fee', 'Mark up rate 2 - Value - Withdrawal transasaction & gas fee'),
+        ('Mark up rate 1 - Gold Price Fluctuation', 'Mark up rate 1 - Value - Gold price fluctuation'),
+    ]:
+        df[value_col] = df[rate_col] / df['Total Markup - For Referrence'] * (df['Revenue'] - df['COGs'])
+    bad = rng.random(rows) < discrepancy_rate
+    df.loc[bad, 'COGs'] += 1.0
+    return df
+
+
+def legacy_recalculate_and_validate_deposits(df, tolerances):
+    for col, func in LEGACY_RECALCULATIONS.items():
+        df[col] = df.apply(func, axis=1)
+
+    results = []
+    for _, row in df.iterrows():
+        status = "Valid"
+        discrepancies = []
+        if row['Amount Dc'] <= 0:
+            status = "Invalid - Amount should be positive"
+        for col_name in tolerances:
+            if col_name in df.columns:
+                if abs(row[col_name] - row[col_name.replace('RC_', '')]) > tolerances[col_name]:
+                    status = f"Invalid - Discrepancy in {col_name.replace('RC_', '')}"
+                    discrepancies.append({
+                        'Column': col_name.replace('RC_', ''),
+                        'Expected': row[col_name.replace('RC_', '')],
+                        'Actual': row[col_name]
+                    })
+        result = {'Transaction ID': row['Transaction ID'], 'Status': status, 'Discrepancies': discrepancies}
+        for col_name in LEGACY_RECALCULATIONS:
+            result[col_name] = row[col_name]
+            result[col_name.replace('RC_', '')] = row[col_name.replace('RC_', '')]
+        results.append(result)
+    return pd.DataFrame(results)
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df.copy(), DEFAULT_TOLERANCES)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max-rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'columnar rows/s':>17} {'speedup':>9}")
+    for rows in args.rows:
+        df = make_deposits(rows)
+        new, new_seconds = timed(recalculate_and_validate_deposits, df)
+        if rows <= args.legacy_max_rows:
+            old, old_seconds = timed(legacy_recalculate_and_validate_deposits, df)
+            expected = new.to_frame(discrepancies='records').astype({'Status': object})
+            pd.testing.assert_frame_equal(old, expected)
+            print(f"{rows:>10} {rows / old_seconds:>15,.0f} {rows / new_seconds:>17,.0f} {old_seconds / new_seconds:>8.1f}x")
+        else:
+            print(f"{rows:>10} {'-':>15} {rows / new_seconds:>17,.0f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
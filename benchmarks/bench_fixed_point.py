@@ -0,0 +1,87 @@
+"""
+Benchmark the fixed-point deposit validator against the Decimal reference path.
+
+Usage:
+    python benchmarks/bench_fixed_point.py --rows 10000 100000 300000
+
+Every size up to --decimal-max-rows also checks that both paths agree bit for bit: same
+statuses, and every RC_ value has the same Decimal sign, digits and exponent.
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal, getcontext
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_deposit_recalc import make_deposits
+from formulas import GDR_BUY_RATE, XAU_BACKUP_BUY_RATE
+from validation import recalculate_and_validate_deposits_decimal, recalculate_and_validate_deposits_exact
+
+TRUNCATIONS = {
+    'RC_CLEO.Lit Sell GDR/USD - Reference': 1e-2,
+    'RC_Deposit Amount USD': 1e-2,
+    'RC_GDR Client Receive': 1e-2,
+    'RC_COGs': 1e-2,
+    'RC_Revenue': 1e-2,
+    'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': 1e-2,
+    'RC_Mark up rate 4 - Value - Business risk reserve': 1e-2,
+    'RC_Mark up rate 3 - Value - Crypto to fiat conversion': 1e-2,
+    'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': 1e-2,
+    'RC_Mark up rate 1 - Value - Gold price fluctuation': 1e-2
+}
+
+
+def make_text_deposits(rows, discrepancy_rate=0.01):
+    # Exports carry a fixed number of decimals; format like the CSV text the page reads
+    df = make_deposits(rows, discrepancy_rate=0).rename(columns={GDR_BUY_RATE: XAU_BACKUP_BUY_RATE})
+    for col in df.columns:
+        if col != 'Transaction ID':
+            df[col] = df[col].map('{:.8f}'.format)
+
+    # Formulas chain through exported columns, so settle them to the truncated values in a few passes
+    for _ in range(3):
+        results = recalculate_and_validate_deposits_exact(df.copy(), TRUNCATIONS)
+        for col in TRUNCATIONS:
+            df[col.replace('RC_', '')] = results.recalculated[col].to_strings()
+    bad = np.random.default_rng(1).random(rows) < discrepancy_rate
+    df.loc[bad, 'COGs'] = '0.00'
+    return df
+
+
+def assert_identical(reference, fixed):
+    assert (reference.codes == fixed.codes).all()
+    for col in TRUNCATIONS:
+        for a, b in zip(reference.recalculated[col], fixed.recalculated[col].to_strings()):
+            assert a.as_tuple() == Decimal(b).as_tuple(), (col, a, b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 300_000])
+    parser.add_argument('--decimal-max-rows', type=int, default=100_000)
+    args = parser.parse_args()
+    getcontext().prec = 18
+
+    print(f"{'rows':>10} {'Decimal rows/s':>15} {'fixed-point rows/s':>19} {'speedup':>9}")
+    for rows in args.rows:
+        df = make_text_deposits(rows)
+        start = time.perf_counter()
+        fixed = recalculate_and_validate_deposits_exact(df.copy(), TRUNCATIONS)
+        fixed_seconds = time.perf_counter() - start
+        if rows <= args.decimal_max_rows:
+            start = time.perf_counter()
+            reference = recalculate_and_validate_deposits_decimal(df.copy(), TRUNCATIONS)
+            decimal_seconds = time.perf_counter() - start
+            assert_identical(reference, fixed)
+            print(f"{rows:>10} {rows / decimal_seconds:>15,.0f} {rows / fixed_seconds:>19,.0f} {decimal_seconds / fixed_seconds:>8.1f}x")
+        else:
+            print(f"{rows:>10} {'-':>15} {rows / fixed_seconds:>19,.0f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
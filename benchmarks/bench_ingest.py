@@ -0,0 +1,69 @@
+"""
+Benchmark schema-driven CSV ingestion against a bare pd.read_csv on a wide deposit export.
+
+Usage:
+    python benchmarks/bench_ingest.py --rows 100000 --extra-columns 60
+
+The export gets --extra-columns columns the validation never reads (text, status-like
+codes and numbers), as real exports carry. Reports parse time and the memory of the
+resulting frame for both readers.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_deposit_recalc import make_deposits
+from schema import DEPOSIT_SCHEMA
+
+
+def make_wide_export(rows, extra_columns, seed=0):
+    rng = np.random.default_rng(seed)
+    df = make_deposits(rows, seed=seed)
+    for k in range(extra_columns):
+        if k % 3 == 0:
+            df[f"Note {k}"] = [f"ref-{v:08d}" for v in rng.integers(0, 10 ** 8, rows)]
+        elif k % 3 == 1:
+            df[f"Status {k}"] = rng.choice(['Completed', 'Pending', 'Failed'], rows)
+        else:
+            df[f"Metric {k}"] = rng.random(rows)
+    return df
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--extra-columns', type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'deposits.csv')
+        make_wide_export(args.rows, args.extra_columns).to_csv(path, index=False)
+
+        bare, bare_seconds = timed(lambda: pd.read_csv(path))
+        typed, typed_seconds = timed(lambda: DEPOSIT_SCHEMA.read(path))
+        bare_mb = bare.memory_usage(deep=True).sum() / 1024 ** 2
+        typed_mb = typed.memory_usage(deep=True).sum() / 1024 ** 2
+
+        print(f"{os.path.getsize(path) / 1024 ** 2:.0f} MB, {args.rows:,} rows, {bare.shape[1]} columns")
+        print(f"{'reader':>10} {'seconds':>9} {'frame MB':>9}")
+        print(f"{'bare':>10} {bare_seconds:>9.2f} {bare_mb:>9.1f}")
+        print(f"{'schema':>10} {typed_seconds:>9.2f} {typed_mb:>9.1f}")
+        print(f"{'speedup':>10} {bare_seconds / typed_seconds:>8.1f}x {bare_mb / typed_mb:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
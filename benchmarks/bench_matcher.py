@@ -0,0 +1,173 @@
+"""
+Benchmark and check the testGen template matcher on screenshot fixtures, offline.
+
+Usage:
+    python benchmarks/bench_matcher.py
+    python benchmarks/bench_matcher.py --save fixtures/
+    python benchmarks/bench_matcher.py --fixtures fixtures/
+
+Without --fixtures, screenshots are synthesized: a cluttered 1920x1080 page with every
+template from IMGtemplate (except the *80 copies) pasted once, at 100%, 80% and 125% zoom
+on successive screenshots.
+--save writes them as PNGs plus expected.json, which maps each screenshot to the centre of
+every template on it (null when absent); real screenshots can be checked by writing the
+same file by hand. Every lookup must land within a few pixels of the expected centre, and
+absent templates must not match. Reports ms per lookup for the notebook's original
+approach (read the template, match the whole colour frame), a cold whole-frame search, a
+warm search in the remembered region, and match_all over every template on one frame.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from template_matcher import TEMPLATE_DIR, TemplateMatcher, _cv2, load_image, template_name
+
+ZOOMS = (1.0, 0.8, 1.25)
+SCREEN = (1920, 1080)
+# Allowed distance from the expected centre, in pixels
+TOLERANCE = 4
+
+
+def fixture_templates(template_dir):
+    # The *80 copies are the same buttons at another zoom, so they would also match each other
+    return sorted(os.path.join(template_dir, name) for name in os.listdir(template_dir)
+                  if name.endswith('.png') and not template_name(name).endswith('80'))
+
+
+def make_screenshot(paths, seed, zoom=1.0, absent=()):
+    """
+    A synthetic page with each template pasted once at the given zoom and a random position.
+
+    Returns:
+        tuple: (RGB array, {name: (cx, cy) or None}).
+    """
+    rng = np.random.default_rng(seed)
+    page = Image.new('RGB', SCREEN, (245, 246, 248))
+    draw = ImageDraw.Draw(page)
+    # Panels, lines and text as distractors
+    for _ in range(60):
+        x, y = int(rng.integers(0, SCREEN[0] - 200)), int(rng.integers(0, SCREEN[1] - 60))
+        shade = tuple(int(v) for v in rng.integers(180, 255, 3))
+        draw.rectangle([x, y, x + int(rng.integers(40, 400)), y + int(rng.integers(10, 120))], fill=shade)
+    for _ in range(150):
+        x, y = int(rng.integers(0, SCREEN[0] - 200)), int(rng.integers(0, SCREEN[1] - 20))
+        text = ''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz0123456789 $.,'), int(rng.integers(4, 30))))
+        draw.text((x, y), text, fill=tuple(int(v) for v in rng.integers(0, 120, 3)))
+
+    expected, taken = {}, []
+    for path in paths:
+        name = template_name(path)
+        if name in absent:
+            expected[name] = None
+            continue
+        template = Image.open(path).convert('RGBA')
+        size = (round(template.width * zoom), round(template.height * zoom))
+        template = template.resize(size, Image.LANCZOS)
+        # Non-overlapping positions, so each template appears exactly once
+        for _ in range(1000):
+            x, y = int(rng.integers(0, SCREEN[0] - size[0])), int(rng.integers(0, SCREEN[1] - size[1]))
+            box = (x - 4, y - 4, x + size[0] + 4, y + size[1] + 4)
+            if all(box[2] <= t[0] or t[2] <= box[0] or box[3] <= t[1] or t[3] <= box[1] for t in taken):
+                break
+        taken.append(box)
+        page.paste(template, (x, y), template)
+        expected[name] = (x + size[0] // 2, y + size[1] // 2)
+    return np.asarray(page), expected
+
+
+def load_fixtures(directory):
+    with open(os.path.join(directory, 'expected.json')) as f:
+        expected = json.load(f)
+    return [(load_image(os.path.join(directory, name)), {k: tuple(v) if v else None for k, v in centres.items()})
+            for name, centres in expected.items()]
+
+
+def save_fixtures(fixtures, directory):
+    os.makedirs(directory, exist_ok=True)
+    expected = {}
+    for i, (frame, centres) in enumerate(fixtures):
+        name = f"screen{i}.png"
+        Image.fromarray(frame).save(os.path.join(directory, name))
+        expected[name] = centres
+    with open(os.path.join(directory, 'expected.json'), 'w') as f:
+        json.dump(expected, f, indent=2)
+
+
+def check(found, expected, label):
+    for name, centre in expected.items():
+        match = found[name]
+        if centre is None:
+            assert match is None, f"{label}: {name} is absent but matched {match}"
+            continue
+        assert match is not None, f"{label}: {name} not found"
+        distance = max(abs(match.center[0] - centre[0]), abs(match.center[1] - centre[1]))
+        assert distance <= TOLERANCE, f"{label}: {name} expected at {centre}, found {match}"
+
+
+def per_lookup_ms(func, lookups, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / (repeat * lookups)
+
+
+def original_lookup(paths, frame):
+    # templatePosOnScreen as in testGen.ipynb: read the template, match the whole colour frame
+    cv2 = _cv2()
+    for path in paths:
+        template = cv2.imread(path)
+        result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+        cv2.minMaxLoc(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', default=TEMPLATE_DIR)
+    parser.add_argument('--fixtures', help="Directory of saved screenshots with expected.json")
+    parser.add_argument('--save', help="Write the synthetic screenshots and expected.json here")
+    parser.add_argument('--screens', type=int, default=3, help="Synthetic screenshots to generate")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        paths = fixture_templates(args.templates)
+        # The last screenshot leaves two templates out, to check they are not matched elsewhere
+        fixtures = [make_screenshot(paths, seed, ZOOMS[seed % len(ZOOMS)], absent=[template_name(p) for p in paths[:2]]
+                                    if seed == args.screens - 1 else ()) for seed in range(args.screens)]
+        if args.save:
+            save_fixtures(fixtures, args.save)
+
+    matcher = TemplateMatcher(args.templates)
+    print(f"{'screenshot':>10} {'templates':>9} {'original ms':>12} {'cold ms':>8} {'roi ms':>7} {'match_all ms':>13}")
+    for i, (frame, expected) in enumerate(fixtures):
+        names = list(expected)
+        paths = [os.path.join(args.templates, f"{name}.png") for name in names]
+        color = frame if frame.ndim == 3 else np.repeat(frame[:, :, None], 3, axis=2)
+
+        def cold():
+            matcher.forget()
+            return matcher.match_all(frame, names)
+
+        check(cold(), expected, f"screenshot {i} cold")
+        # Warm lookups start from the regions the cold pass remembered
+        check({name: matcher.locate(name, frame) for name in names}, expected, f"screenshot {i} roi")
+
+        original = per_lookup_ms(lambda: original_lookup(paths, color), len(names), args.repeat)
+        cold_ms = per_lookup_ms(lambda: [(matcher.forget(name), matcher.locate(name, frame)) for name in names],
+                                len(names), args.repeat)
+        roi_ms = per_lookup_ms(lambda: [matcher.locate(name, frame) for name in names], len(names), args.repeat)
+        all_ms = per_lookup_ms(lambda: matcher.match_all(frame, names), len(names), args.repeat)
+        print(f"{i:>10} {len(names):>9} {original:>12.2f} {cold_ms:>8.2f} {roi_ms:>7.2f} {all_ms:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
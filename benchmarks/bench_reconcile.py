@@ -0,0 +1,91 @@
+"""
+Benchmark cross-flow reconciliation: key indexes, anti-joins and running balances.
+
+Usage:
+    python benchmarks/bench_reconcile.py --rows 100000 1000000
+
+Each size builds that many deposits, half as many withdrawals and half as many transfers
+(each transfer lands as one of the deposits), injects orphans, amount mismatches, duplicates
+and deposit/withdraw ID collisions, and checks reconcile finds exactly those. Running
+balances are checked against a per-wallet cumulative sum on the smallest size.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconcile import reconcile
+
+
+def make_flows(rows, seed=0, wallets=None):
+    rng = np.random.default_rng(seed)
+    addresses = np.array([f"0x{i:040x}" for i in range(wallets or max(rows // 20, 10))], dtype=object)
+    start = np.datetime64('2026-10-01T00:00:00')
+
+    def times(n):
+        return (start + rng.integers(0, 86400, n).astype('timedelta64[s]')).astype(str)
+
+    deposits = pd.DataFrame({
+        'Transaction ID': [f"D{i:09d}" for i in range(rows)],
+        'Wallet Address': rng.choice(addresses, rows),
+        'GDR Client Receive': np.round(rng.uniform(1, 100, rows), 2),
+        'Deposit Amount OC': np.round(rng.uniform(1, 100, rows), 2),
+        'Created At': times(rows),
+    })
+    count = rows // 2
+    # The last three deposit IDs are overwritten below, so no transfer lands there
+    landed = rng.choice(rows - 3, count, replace=False)
+    transfers = pd.DataFrame({
+        'Record ID': deposits['Transaction ID'].to_numpy()[landed],
+        'Source Wallet Address': rng.choice(addresses, count),
+        'Destination Wallet Address': rng.choice(addresses, count),
+        'Transfer Amount DC': deposits['Deposit Amount OC'].to_numpy()[landed],
+        'Created At': times(count),
+    })
+    transfers['Destination Amount DC'] = transfers['Transfer Amount DC']
+    withdrawals = pd.DataFrame({
+        'Transaction ID': [f"W{i:09d}" for i in range(count)],
+        'Wallet Address': rng.choice(addresses, count),
+        'Withdraw Amount OC': np.round(rng.uniform(1, 50, count), 2),
+        'Created At': times(count),
+    })
+
+    # 10 orphans, 5 mismatches, 3 repeated deposit IDs (6 rows), 2 collisions (4 rows)
+    transfers.loc[:9, 'Record ID'] = [f"X{i}" for i in range(10)]
+    transfers.loc[10:14, 'Destination Amount DC'] += 5
+    deposits.loc[rows - 3:, 'Transaction ID'] = deposits.loc[:2, 'Transaction ID'].to_numpy()
+    withdrawals.loc[:1, 'Transaction ID'] = deposits.loc[100:101, 'Transaction ID'].to_numpy()
+    return {'deposit': deposits, 'withdraw': withdrawals, 'transfer': transfers}
+
+
+def assert_balances(ledger):
+    for _, group in ledger.groupby('Wallet', observed=True, sort=False):
+        assert np.allclose(group['Balance'].to_numpy(), np.cumsum(group['Amount'].to_numpy()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'deposits':>10} {'movements':>10} {'reconcile s':>12} {'rows/s':>12}")
+    for i, rows in enumerate(args.rows):
+        flows = make_flows(rows)
+        start = time.perf_counter()
+        result = reconcile(flows)
+        seconds = time.perf_counter() - start
+        counts = result.counts()
+        assert (counts['Duplicated'], counts['Orphaned'], counts['Amount mismatches']) == (10, 10, 5), counts
+        if i == 0:
+            assert_balances(result.ledger)
+        total = sum(len(df) for df in flows.values())
+        print(f"{rows:>10} {len(result.ledger):>10} {seconds:>12.2f} {total / seconds:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the mismatch report: its cost inside a chunked run, and drill-down from a group.
+
+Usage:
+    python benchmarks/bench_report.py
+    python benchmarks/bench_report.py --rows 1000000 --chunksize 100000
+
+A withdraw export with currency, day and network columns is validated in chunks with and
+without report_columns; the difference is the report's share of the run. The chunked report
+must equal one built over the whole file in memory, and each group's drill-down must list
+exactly its invalid rows. Drill-down is timed cold (the first lookup builds the row index)
+and warm.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report import MismatchReport, report_columns
+from schema import WITHDRAW_SCHEMA
+from streaming import validate_withdrawals_chunked
+from synthetic import generate
+from validation import recalculate_and_validate_withdrawals
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=300_000)
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    df = generate('withdraw', args.rows, args.seed, discrepancy_rate=0.02)[0]
+    seconds = rng.integers(0, args.days * 86400, args.rows)
+    df['Created At'] = (pd.Timestamp('2024-05-01', tz='UTC') + pd.to_timedelta(seconds, unit='s')).strftime(
+        '%Y-%m-%dT%H:%M:%SZ')
+    df['Original Currency - OC'] = rng.choice(['USDC', 'USDT'], args.rows)
+    data = df.to_csv(index=False).encode()
+    dimensions = report_columns(df.columns)
+
+    plain, plain_seconds = timed(lambda: validate_withdrawals_chunked(
+        io.BytesIO(data), chunksize=args.chunksize, max_offending_rows=args.rows,
+        read_csv_kwargs=WITHDRAW_SCHEMA.read_csv_kwargs(list(dimensions.values()))))
+    summary, report_seconds = timed(lambda: validate_withdrawals_chunked(
+        io.BytesIO(data), chunksize=args.chunksize, report_columns=dimensions, max_offending_rows=args.rows))
+    assert plain.invalid_count == summary.invalid_count
+
+    frame = WITHDRAW_SCHEMA.read(io.BytesIO(data), list(dimensions.values()))
+    frame[list(dimensions.values())] = frame[list(dimensions.values())].astype(str)
+    results = recalculate_and_validate_withdrawals(frame)
+    whole = MismatchReport(summary.report.checks, dimensions)
+    whole.add_results(results, frame)
+    table = summary.report.table()
+    pd.testing.assert_frame_equal(table, whole.table(), check_dtype=False)
+
+    groups = list(table[whole.labels].itertuples(index=False, name=None))
+    _, cold = timed(lambda: summary.report.rows(groups[0]))
+    _, warm = timed(lambda: [summary.report.rows(group) for group in groups])
+    # Drill-down ids are positions in offending_rows; look their currency up by Transaction ID
+    currency = frame.set_index('Transaction ID')[dimensions['Currency']]
+    currency = currency.loc[summary.offending_rows['Transaction ID']].to_numpy()
+    for group, count in zip(groups, table['Invalid']):
+        rows = summary.report.rows(group)
+        assert len(rows) == count and (currency[rows] == group[0]).all(), group
+
+    print(f"{'rows':>10} {'groups':>7} {'plain s':>8} {'report s':>9} {'overhead':>9} {'drill cold ms':>14} "
+          f"{'drill warm ms':>14}")
+    print(f"{args.rows:>10} {len(table):>7} {plain_seconds:>8.2f} {report_seconds:>9.2f} "
+          f"{report_seconds / plain_seconds - 1:>8.1%} {cold * 1e3:>14.2f} {warm / len(groups) * 1e3:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
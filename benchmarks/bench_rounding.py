@@ -0,0 +1,65 @@
+"""
+Benchmark the vectorized rounding kernel against per-cell float truncation.
+
+Usage:
+    python benchmarks/bench_rounding.py --rows 100000 1000000 --places 2
+
+Values mix random floats, two-decimal amounts and their products, as the deposit formulas
+produce. Every size up to --decimal-max-rows also checks that each rounding mode agrees with
+Decimal(repr(x)).quantize(...) on every value, and counts the values the old
+int(x * 10 ** places) / 10 ** places truncation got wrong (e.g. 0.29 -> 0.28).
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rounding import ROUND_DOWN, ROUNDING_MODES, round_places
+
+
+def make_values(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(1, 10 ** 7, rows) / 100
+    rates = rng.integers(1, 10 ** 4, rows) / 100
+    values = np.where(rng.random(rows) < 0.5, amounts * rates / 100, amounts)
+    return np.where(rng.random(rows) < 0.1, rng.random(rows) * 1000, values)
+
+
+def assert_matches_decimal(values, places):
+    quantum = Decimal(1).scaleb(-places)
+    for rounding in ROUNDING_MODES:
+        expected = [float(Decimal(repr(x)).quantize(quantum, rounding=rounding)) for x in values.tolist()]
+        assert (round_places(values, places, rounding) == np.array(expected)).all(), rounding
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--places', type=int, default=2)
+    parser.add_argument('--decimal-max-rows', type=int, default=100_000)
+    args = parser.parse_args()
+    factor = 10.0 ** args.places
+
+    print(f"{'rows':>10} {'per-cell s':>11} {'kernel s':>9} {'speedup':>9} {'per-cell wrong':>15}")
+    for rows in args.rows:
+        values = make_values(rows)
+        start = time.perf_counter()
+        per_cell = np.array([int(x * factor) / factor for x in values])
+        per_cell_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        kernel = round_places(values, args.places, ROUND_DOWN)
+        kernel_seconds = time.perf_counter() - start
+        if rows <= args.decimal_max_rows:
+            assert_matches_decimal(values, args.places)
+        wrong = int((per_cell != kernel).sum())
+        print(f"{rows:>10} {per_cell_seconds:>11.3f} {kernel_seconds:>9.3f} "
+              f"{per_cell_seconds / kernel_seconds:>8.1f}x {wrong:>15,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Replay the testGen withdraw scenario headlessly and compare the step runner with fixed sleeps.
+
+Usage:
+    python benchmarks/bench_steps.py
+    python benchmarks/bench_steps.py --transactions 20 --latency 0.2 --zoom 0.8
+    python benchmarks/bench_steps.py --save recording/
+    python benchmarks/bench_steps.py --recording recording/
+
+Without --recording, a one-transaction recording is synthesized: one frame per input action,
+showing the templates the following steps wait for on a cluttered page. ReplayScreen moves
+to the next frame `--latency` seconds after each action, like a UI responding. --save writes
+the frames and a timeline.json of latencies. The run checks every click lands on its button
+and every value is typed in order, then checks that a button which never appears times out.
+Reports seconds per transaction against the scenario's fixed sleepTime total, and the
+per-step latency summary.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from step_runner import ReplayScreen, StepRunner, StepTimeout, latency_frame, step_action
+from template_matcher import TemplateMatcher
+
+# The withdraw scenario of testGen.ipynb, with its fixed sleeps
+WITHDRAW_STEPS = [
+    {"clickImage": "IMGtemplate/wd1-withdraw.png", "sleepTime": 6},
+    {"wait": "IMGtemplate/wd2-popup.png", "sleepTime": 1},
+    {"clickImage": "IMGtemplate/wd3-chooseNetwork.png", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd4-choosePolygonAmoy.png", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd5-tokenSend.png", "sleepTime": 0.8},
+    {"type": "G", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd6-GDR.png", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd7-amount.png", "sleepTime": 0.8},
+    {"transactionValue": "G", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd8-tokenReceive.png", "sleepTime": 0.5},
+    {"type": "usdc", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd9-usdc.png", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd10-address.png", "sleepTime": 0.8},
+    {"type": "0x0000000000000000000000000000000000000001", "sleepTime": 0.8},
+    {"clickImage": "IMGtemplate/wd11-submit.png", "sleepTime": 0.8},
+]
+SCREEN = (1280, 800)
+TOLERANCE = 4
+
+
+def page(rng):
+    # A cluttered page background: panels and text as distractors
+    image = Image.new('RGB', SCREEN, (245, 246, 248))
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = int(rng.integers(0, SCREEN[0] - 200)), int(rng.integers(0, SCREEN[1] - 60))
+        draw.rectangle([x, y, x + int(rng.integers(40, 300)), y + int(rng.integers(10, 100))],
+                       fill=tuple(int(v) for v in rng.integers(180, 255, 3)))
+    for _ in range(60):
+        x, y = int(rng.integers(0, SCREEN[0] - 200)), int(rng.integers(0, SCREEN[1] - 20))
+        text = ''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz0123456789 $.,'), int(rng.integers(4, 30))))
+        draw.text((x, y), text, fill=tuple(int(v) for v in rng.integers(0, 120, 3)))
+    return image
+
+
+def make_recording(steps, zoom=1.0, seed=0):
+    """
+    One frame per input action; frame k shows the templates of the steps run after k actions.
+
+    Returns:
+        tuple: (frames, {template path: expected click centre}).
+    """
+    rng = np.random.default_rng(seed)
+    shown, actions = {}, 0
+    for step in steps:
+        action = step_action(step)
+        if action in ('clickImage', 'wait'):
+            shown.setdefault(actions, []).append(step[action])
+        if action != 'wait':
+            actions += 1
+    frames, centres = [], {}
+    for k in range(actions):
+        image, taken = page(rng), []
+        for path in shown.get(k, []):
+            template = Image.open(path).convert('RGB')
+            size = (round(template.width * zoom), round(template.height * zoom))
+            template = template.resize(size, Image.LANCZOS)
+            for _ in range(1000):
+                x, y = int(rng.integers(0, SCREEN[0] - size[0])), int(rng.integers(0, SCREEN[1] - size[1]))
+                box = (x - 4, y - 4, x + size[0] + 4, y + size[1] + 4)
+                if all(box[2] <= t[0] or t[2] <= box[0] or box[3] <= t[1] or t[3] <= box[1] for t in taken):
+                    break
+            taken.append(box)
+            image.paste(template, (x, y))
+            centres[path] = (x + size[0] // 2, y + size[1] // 2)
+        frames.append(np.asarray(image))
+    return frames, centres
+
+
+def check_actions(screen, steps, values, centres):
+    expected = []
+    for value in values:
+        for step in steps:
+            action = step_action(step)
+            if action == 'clickImage':
+                expected.append(('click', centres.get(step[action])))
+            elif action == 'type':
+                expected.append(('type', step['type']))
+            elif action == 'transactionValue':
+                expected.append(('type', str(value)))
+    assert len(screen.actions) == len(expected), (len(screen.actions), len(expected))
+    for got, want in zip(screen.actions, expected):
+        assert got[0] == want[0], (got, want)
+        if got[0] == 'click' and want[1] is not None:
+            assert max(abs(got[1][0] - want[1][0]), abs(got[1][1] - want[1][1])) <= TOLERANCE, (got, want)
+        elif got[0] == 'type':
+            assert got[1] == want[1], (got, want)
+
+
+def check_timeout(frames, matcher):
+    # The second frame never appears, so the second step's button times out after its retry
+    screen = ReplayScreen(frames[:1] * 2, latency=0.01)
+    runner = StepRunner(WITHDRAW_STEPS[:3], matcher, screen, timeout=0.3, retries=1)
+    start = time.perf_counter()
+    try:
+        runner.run(1.0)
+    except StepTimeout as e:
+        assert e.step == 1, e
+    else:
+        raise AssertionError("a missing button did not time out")
+    assert time.perf_counter() - start < 5
+    failed = runner.records[-1]
+    assert failed['status'] == 'timeout' and failed['attempts'] == 2, failed
+    # keep_going logs the failure and runs the next transaction
+    runner.run_many([1.0, 2.0], keep_going=True)
+    assert sum(r['status'] == 'timeout' for r in runner.records) == 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds the replayed UI takes to respond")
+    parser.add_argument('--zoom', type=float, default=1.0, help="Zoom of the synthesized recording")
+    parser.add_argument('--recording', help="Directory of recorded frames (and timeline.json) to replay")
+    parser.add_argument('--save', help="Write the synthesized frames and timeline.json here")
+    parser.add_argument('--log', help="Append every step record to this JSON Lines file")
+    args = parser.parse_args()
+
+    matcher = TemplateMatcher()
+    if args.recording:
+        screen, centres = ReplayScreen.from_directory(args.recording, args.latency), {}
+    else:
+        frames, centres = make_recording(WITHDRAW_STEPS, args.zoom)
+        screen = ReplayScreen(frames, args.latency)
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            for k, frame in enumerate(frames):
+                Image.fromarray(frame).save(os.path.join(args.save, f"{k:03d}.png"))
+            with open(os.path.join(args.save, 'timeline.json'), 'w') as f:
+                json.dump([args.latency] * len(frames), f)
+
+    values = np.round(np.random.default_rng(0).uniform(1000, 100000, args.transactions), 2)
+    runner = StepRunner(WITHDRAW_STEPS, matcher, screen, log=args.log)
+    start = time.perf_counter()
+    records = runner.run_many(values)
+    seconds = (time.perf_counter() - start) / args.transactions
+    check_actions(screen, WITHDRAW_STEPS, values, centres)
+    if not args.recording:
+        check_timeout(screen.frames, matcher)
+
+    fixed = sum(step['sleepTime'] for step in WITHDRAW_STEPS)
+    print(latency_frame(records).to_string(index=False))
+    print(f"\n{args.transactions} transactions: {seconds:.2f} s per transaction with the step runner, "
+          f"{fixed:.1f} s of fixed sleeps before ({fixed / seconds:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Validate a growing cumulative deposit export day by day, with and without the outcome store.
+
+Usage:
+    python benchmarks/bench_store.py
+    python benchmarks/bench_store.py --history 1000000 --daily 20000 --days 5 --engine exact
+
+Day 0 writes --history rows; every later day appends --daily new rows and edits --changes
+earlier ones (their Revenue moves by one cent, as a corrected export would), then the whole
+file is validated twice: from scratch with validate_deposits_chunked, and with
+validate_deposits_incremental against a store that has seen every earlier day. Both must
+report the same counts and offending rows. Reports seconds per day for each, and the rows
+the store recalculated; with the store, time follows the day's delta instead of the history.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import DEPOSIT_ENGINES
+from store import ValidationStore, validate_deposits_incremental
+from streaming import MAX_OFFENDING_ROWS, validate_deposits_chunked
+from synthetic import generate
+
+
+def check(full, incremental, day):
+    assert full.total_rows == incremental.total_rows, (day, full.total_rows, incremental.total_rows)
+    assert full.invalid_count == incremental.invalid_count, (day, full.invalid_count, incremental.invalid_count)
+    assert full.mismatch_counts == incremental.mismatch_counts, day
+    pd.testing.assert_frame_equal(full.offending_rows, incremental.offending_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=200_000, help="Rows in the day 0 export")
+    parser.add_argument('--daily', type=int, default=5_000, help="Rows appended per day")
+    parser.add_argument('--changes', type=int, default=50, help="Earlier rows edited per day")
+    parser.add_argument('--days', type=int, default=4)
+    parser.add_argument('--engine', choices=list(DEPOSIT_ENGINES), default='main')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    validate, tolerances, schema, as_text, formulas = DEPOSIT_ENGINES[args.engine]
+    read_csv_kwargs = schema.read_csv_kwargs(as_text=as_text)
+    rng = np.random.default_rng(args.seed)
+    export = generate('deposit', args.history, args.seed, engine=args.engine)[0]
+
+    print(f"{'day':>4} {'rows':>10} {'full s':>8} {'store s':>8} {'recalculated':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'deposits.csv')
+        with ValidationStore(os.path.join(directory, 'validated.sqlite')) as store:
+            for day in range(args.days + 1):
+                if day:
+                    start = args.history + (day - 1) * args.daily
+                    edited = rng.choice(len(export), min(args.changes, len(export)), replace=False)
+                    export.loc[edited, 'Revenue'] = export.loc[edited, 'Revenue'] + 0.01
+                    export = pd.concat([export, generate('deposit', args.daily, args.seed, engine=args.engine,
+                                                         start=start)[0]], ignore_index=True)
+                export.to_csv(path, index=False)
+
+                begin = time.perf_counter()
+                full = validate_deposits_chunked(path, tolerances, max_offending_rows=MAX_OFFENDING_ROWS,
+                                                 engine=validate, read_csv_kwargs=read_csv_kwargs)
+                full_seconds = time.perf_counter() - begin
+                begin = time.perf_counter()
+                incremental = validate_deposits_incremental(path, store, tolerances, engine=validate,
+                                                            read_csv_kwargs=read_csv_kwargs, formulas=formulas,
+                                                            source_name=f"day {day}")
+                store_seconds = time.perf_counter() - begin
+                check(full, incremental, day)
+
+                recalculated = store.runs()['recalculated_rows'].iloc[-1]
+                print(f"{day:>4} {full.total_rows:>10} {full_seconds:>8.2f} {store_seconds:>8.2f} "
+                      f"{recalculated:>13} {full_seconds / store_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark withdraw validation end to end: read the export, recalculate, compare.
+
+Usage:
+    python benchmarks/bench_withdraw.py --rows 100000 1000000
+
+Each size is written as CSV and Parquet, then validated whole (schema read plus
+recalculate_and_validate_withdrawals) and in chunks (validate_withdrawals_chunked).
+Checks that every path finds exactly the injected discrepancies.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formulas import GDR_BUY_RATE, TOKEN_SELL_RATE
+from schema import WITHDRAW_SCHEMA
+from streaming import validate_withdrawals_chunked
+from validation import recalculate_and_validate_withdrawals
+
+NETWORKS = {'Polygon': 0.01, 'Polygon Amoy': 0.0, 'Ethereum': 2.5, 'Arbitrum': 0.05}
+
+
+def make_withdrawals(rows, seed=0, discrepancy_rate=0.01):
+    rng = np.random.default_rng(seed)
+    network = rng.choice(list(NETWORKS), rows)
+    df = pd.DataFrame({
+        'Transaction ID': [f"WD{i:09d}" for i in range(rows)],
+        'Network': network,
+        'Token Send': 'GDR',
+        'Token Receive': rng.choice(['USDC', 'USDT'], rows),
+        'Withdraw Amount OC': np.round(rng.uniform(-1, 500, rows), 2),
+        GDR_BUY_RATE: np.round(rng.uniform(60, 80, rows), 4),
+        TOKEN_SELL_RATE: np.round(rng.uniform(0.99, 1.01, rows), 4),
+        'Transaction Fee - Rate': rng.choice([0.001, 0.0025, 0.005], rows),
+        'Network Fee DC': pd.Series(network).map(NETWORKS).to_numpy(),
+    })
+
+    # Exported columns are rounded to cents, as the tolerances expect
+    df['Withdraw Amount USD'] = np.round(df['Withdraw Amount OC'] * df[GDR_BUY_RATE], 2)
+    df['Transaction Fee USD'] = np.round(df['Withdraw Amount USD'] * df['Transaction Fee - Rate'], 2)
+    df['Network Fee USD'] = np.round(df['Network Fee DC'] * df[TOKEN_SELL_RATE], 2)
+    df['Client Receive DC'] = np.round(
+        (df['Withdraw Amount USD'] - df['Transaction Fee USD'] - df['Network Fee USD']) / df[TOKEN_SELL_RATE], 2)
+    bad = rng.random(rows) < discrepancy_rate
+    df.loc[bad, 'Transaction Fee USD'] += 1.0
+    return df, bad | (df['Withdraw Amount OC'] <= 0).to_numpy()
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'format':>8} {'read s':>7} {'validate s':>11} {'chunked s':>10} {'rows/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            df, expected_invalid = make_withdrawals(rows)
+            for fmt in ['csv', 'parquet']:
+                path = os.path.join(tmp, f"withdrawals.{fmt}")
+                df.to_csv(path, index=False) if fmt == 'csv' else df.to_parquet(path, index=False)
+
+                frame, read_seconds = timed(lambda: WITHDRAW_SCHEMA.read(path))
+                results, validate_seconds = timed(lambda: recalculate_and_validate_withdrawals(frame))
+                summary, chunked_seconds = timed(lambda: validate_withdrawals_chunked(path))
+                assert (results.invalid == expected_invalid).all()
+                assert summary.invalid_count == expected_invalid.sum()
+
+                total = read_seconds + validate_seconds
+                print(f"{rows:>10} {fmt:>8} {read_seconds:>7.2f} {validate_seconds:>11.2f} {chunked_seconds:>10.2f} "
+                      f"{rows / total:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Reproducible validator benchmark suite on seeded synthetic exports.
+
+Usage:
+    python benchmarks/suite.py --rows 10000 100000 1000000
+    python benchmarks/suite.py --cases deposit-main withdraw --rows 50000000 --data-dir /data/bench
+    python benchmarks/suite.py --rows 1000000 --fail-on-regression
+
+Each case generates its export with synthetic.py (seeded, discrepancies at known rows) as
+CSV, then times each stage separately:
+
+    ingest     schema read of the columns the validator needs
+    recalc     RC_ formulas
+    compare    tolerance comparison and status codes
+    render     ranking the invalid rows by discrepancy and building the first results page
+
+Sizes of --stream-rows or more are validated in one chunked 'stream' stage instead, so
+50M-row exports fit in memory. Every run checks that the validator flags exactly the
+injected rows, and reports rows/s and peak memory (resident set high-water mark, reset per
+stage where the platform allows it). Results are appended to --history as JSON lines, and
+each stage is compared with its last recorded run of the same case and size; a slowdown
+above --threshold is marked as a regression, unless both runs are under --min-seconds.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import localcontext
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import PAGE_TOLERANCES
+from pagination import PAGE_SIZES, rank_rows
+from schema import DEPOSIT_SCHEMA, TRANSFER_SCHEMA, WITHDRAW_SCHEMA, XAU_BACKUP_DEPOSIT_SCHEMA
+from streaming import validate_deposits_chunked, validate_transfers_chunked, validate_withdrawals_chunked
+from synthetic import id_column, write_export
+from validation import (DEFAULT_TOLERANCES, amount_not_positive, compare_transfers,
+                        recalculate_and_validate_deposits_exact, recalculate_and_validate_deposits_truncated,
+                        recalculate_deposits, recalculate_deposits_exact, recalculate_deposits_truncated,
+                        recalculate_transfers, recalculate_withdrawals, truncation_places, validate_recalculated_deposits,
+                        validate_recalculated_deposits_exact, validate_recalculated_withdrawals)
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.jsonl')
+
+# Chunked runs keep every offending row, so the flagged IDs can be checked
+KEEP_ALL = sys.maxsize
+
+PAGE_PLACES = {col: truncation_places(tolerance) for col, tolerance in PAGE_TOLERANCES.items()}
+
+
+def _transfer_magnitude(df, rows):
+    # As the transfer page ranks non-matching records
+    fee = df['Transaction Fee Oc Difference'].to_numpy()[rows]
+    amount = (df['Transfer Amount DC'].to_numpy() - df['Destination Amount DC'].to_numpy())[rows]
+    return np.fmax(np.abs(fee), np.abs(amount))
+
+
+def _render_results(results):
+    rows = rank_rows(np.flatnonzero(results.invalid), results.magnitude(np.flatnonzero(results.invalid)))
+    results.to_frame(rows[:PAGE_SIZES[0]])
+    return results.invalid
+
+
+def _render_transfers(df):
+    invalid = ~df['All Matching'].to_numpy()
+    rows = np.flatnonzero(invalid)
+    df.iloc[rank_rows(rows, _transfer_magnitude(df, rows))[:PAGE_SIZES[0]]]
+    return invalid
+
+
+# Case -> (synthetic kind, synthetic engine, read, recalc, compare, render, stream), one per validator
+CASES = {
+    'deposit-main': ('deposit', 'main', lambda path: DEPOSIT_SCHEMA.read(path),
+                     recalculate_deposits,
+                     lambda df, rc: validate_recalculated_deposits(df, rc, DEFAULT_TOLERANCES),
+                     _render_results,
+                     lambda path: validate_deposits_chunked(path, DEFAULT_TOLERANCES, max_offending_rows=KEEP_ALL,
+                                                            read_csv_kwargs=DEPOSIT_SCHEMA.read_csv_kwargs())),
+    'deposit-truncated': ('deposit', 'truncated', lambda path: XAU_BACKUP_DEPOSIT_SCHEMA.read(path),
+                          lambda df: recalculate_deposits_truncated(df, PAGE_PLACES),
+                          lambda df, rc: validate_recalculated_deposits(df, rc, PAGE_TOLERANCES, amount_not_positive(df),
+                                                                        expected_recalculated=True),
+                          _render_results,
+                          lambda path: validate_deposits_chunked(
+                              path, PAGE_TOLERANCES, max_offending_rows=KEEP_ALL,
+                              engine=recalculate_and_validate_deposits_truncated,
+                              read_csv_kwargs=XAU_BACKUP_DEPOSIT_SCHEMA.read_csv_kwargs())),
+    'deposit-exact': ('deposit', 'exact', lambda path: XAU_BACKUP_DEPOSIT_SCHEMA.read(path, as_text=True),
+                      lambda df: recalculate_deposits_exact(df, PAGE_TOLERANCES),
+                      lambda df, rc: validate_recalculated_deposits_exact(df, rc, PAGE_TOLERANCES),
+                      _render_results,
+                      lambda path: validate_deposits_chunked(
+                          path, PAGE_TOLERANCES, max_offending_rows=KEEP_ALL, engine=recalculate_and_validate_deposits_exact,
+                          read_csv_kwargs=XAU_BACKUP_DEPOSIT_SCHEMA.read_csv_kwargs(as_text=True))),
+    'withdraw': ('withdraw', 'main', lambda path: WITHDRAW_SCHEMA.read(path),
+                 recalculate_withdrawals,
+                 validate_recalculated_withdrawals,
+                 _render_results,
+                 lambda path: validate_withdrawals_chunked(path, max_offending_rows=KEEP_ALL)),
+    'transfer': ('transfer', 'main', lambda path: TRANSFER_SCHEMA.read(path),
+                 recalculate_transfers,
+                 lambda df, rc: compare_transfers(rc),
+                 _render_transfers,
+                 lambda path: validate_transfers_chunked(path, max_offending_rows=KEEP_ALL,
+                                                         read_csv_kwargs=TRANSFER_SCHEMA.read_csv_kwargs())),
+}
+
+
+def reset_peak_memory():
+    """Reset the resident set high-water mark; returns False where the platform cannot."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory():
+    """Peak resident set size in bytes since the last reset (or since start)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(func, *args):
+    reset_peak_memory()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start, peak_memory()
+
+
+def export_path(data_dir, kind, engine, rows, seed, rate):
+    # Truncated and exact deposits share one export layout
+    layout = 'page' if kind == 'deposit' and engine != 'main' else 'main'
+    return os.path.join(data_dir, f"{kind}-{layout}-{rows}-{seed}-{rate}.csv")
+
+
+def ensure_export(data_dir, kind, engine, rows, seed, rate):
+    """Write the export unless an identical one exists; returns (path, injected)."""
+    path = export_path(data_dir, kind, engine, rows, seed, rate)
+    injected_path = path + '.injected.csv'
+    if os.path.exists(path) and os.path.exists(injected_path):
+        return path, pd.read_csv(injected_path)
+    injected = write_export(kind, path, rows, seed, rate, engine)
+    injected.to_csv(injected_path, index=False)
+    return path, injected
+
+
+def check_rows(case, invalid, injected):
+    rows = np.flatnonzero(invalid)
+    expected = injected['Row'].to_numpy()
+    if not np.array_equal(rows, expected):
+        missed, extra = np.setdiff1d(expected, rows), np.setdiff1d(rows, expected)
+        raise AssertionError(f"{case}: {len(missed)} injected rows not flagged (e.g. {missed[:5].tolist()}), "
+                             f"{len(extra)} other rows flagged (e.g. {extra[:5].tolist()})")
+
+
+def check_summary(case, kind, summary, injected):
+    ids = summary.offending_rows[id_column(kind)].astype(str).to_numpy()
+    expected = injected[id_column(kind)].astype(str).to_numpy()
+    if summary.invalid_count != len(expected) or not np.array_equal(ids, expected):
+        raise AssertionError(f"{case}: {summary.invalid_count} rows flagged, {len(expected)} injected")
+
+
+def run_case(case, path, injected, rows, stream_rows):
+    """Time one case on one export; returns {stage: (seconds, peak bytes)}."""
+    kind, _, read, recalc, compare, render, stream = CASES[case]
+    stages = {}
+    if rows >= stream_rows:
+        summary, seconds, peak = measure(stream, path)
+        check_summary(case, kind, summary, injected)
+        stages['stream'] = (seconds, peak)
+        return stages
+
+    df, seconds, peak = measure(read, path)
+    stages['ingest'] = (seconds, peak)
+    recalculated, seconds, peak = measure(recalc, df)
+    stages['recalc'] = (seconds, peak)
+    results, seconds, peak = measure(compare, df, recalculated)
+    stages['compare'] = (seconds, peak)
+    invalid, seconds, peak = measure(render, results)
+    stages['render'] = (seconds, peak)
+    check_rows(case, invalid, injected)
+    return stages
+
+
+def last_runs(history, machine):
+    """(case, rows, stage) -> rows/s of the most recent run recorded on this machine."""
+    runs = {}
+    if os.path.exists(history):
+        with open(history) as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('machine') == machine:
+                    runs[(record['case'], record['rows'], record['stage'])] = record['rows_per_second']
+    return runs
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, data_dir):
+    previous = last_runs(args.history, platform.node())
+    context = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': revision(), 'python': platform.python_version(),
+               'machine': platform.node(), 'cpus': os.cpu_count(), 'seed': args.seed, 'rate': args.rate}
+    regressions = 0
+
+    print(f"{'case':>18} {'rows':>10} {'stage':>8} {'seconds':>8} {'rows/s':>12} {'peak MiB':>9} {'vs last':>8}")
+    with open(args.history, 'a') as history, localcontext(prec=18):
+        # The exact engine reproduces the correct-decimal page, which runs at 18 digits
+        for rows in args.rows:
+            for case in args.cases:
+                kind, engine = CASES[case][:2]
+                path, injected = ensure_export(data_dir, kind, engine, rows, args.seed, args.rate)
+                for stage, (seconds, peak) in run_case(case, path, injected, rows, args.stream_rows).items():
+                    rate = rows / seconds if seconds else float('inf')
+                    last = previous.get((case, rows, stage))
+                    change = ''
+                    if last:
+                        change = f"{rate / last - 1:+.0%}"
+                        noisy = max(seconds, rows / last) < args.min_seconds
+                        if rate < last / (1 + args.threshold) and not noisy:
+                            change += ' !'
+                            regressions += 1
+                    print(f"{case:>18} {rows:>10} {stage:>8} {seconds:>8.3f} {rate:>12,.0f} {peak / 1024 ** 2:>9.0f} "
+                          f"{change:>8}")
+                    history.write(json.dumps(dict(context, case=case, rows=rows, stage=stage, seconds=seconds,
+                                                  rows_per_second=rate, peak_bytes=peak)) + '\n')
+
+    if regressions:
+        print(f"{regressions} stages slower than the last run by more than {args.threshold:.0%}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, default=0.01, help="Share of rows given a discrepancy")
+    parser.add_argument('--stream-rows', type=int, default=5_000_000,
+                        help="Sizes from this many rows are validated in chunks")
+    parser.add_argument('--data-dir', default=None, help="Keep generated exports here and reuse them")
+    parser.add_argument('--history', default=HISTORY)
+    parser.add_argument('--threshold', type=float, default=0.25, help="Slowdown marked as a regression")
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help="Stages faster than this in both runs are too noisy to mark")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+        return run(args, args.data_dir)
+    with tempfile.TemporaryDirectory(prefix='validator-bench-') as data_dir:
+        return run(args, data_dir)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from columnar import csv_to_arrow, file_format
+from fixed_point import FixedPointArray
+from reconcile import Reconciliation
+from schema import read_columns, read_header
+from validation import ValidationResults
+
+# Memory budget for cached frames and recalculated columns, shared by all pages and sessions
+CACHE_MAX_BYTES = 1024 ** 3
+
+# Directory for Arrow copies of uploaded CSVs (see arrow_copy); unset, uploads are parsed as sent
+ARROW_CACHE_DIR = os.environ.get('FINOPS_ARROW_CACHE_DIR')
+
+
+def file_digest(file):
+    """SHA-256 of an uploaded file's content; identical uploads share cache entries."""
+    if hasattr(file, 'getvalue'):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.file_digest(file, 'sha256').hexdigest()
+    file.seek(position)
+    return digest
+
+
+def formulas_key(recalculations):
+    """Cache key component identifying a formula set by its text, not by object identity."""
+    return tuple(recalculations.formulas.items())
+
+
+def schema_key(schema):
+    """Cache key component identifying a schema by its columns and dtypes."""
+    return (schema.name, tuple((col, repr(dtype)) for col, dtype in schema.dtypes.items()))
+
+
+def estimate_nbytes(value):
+    """Approximate memory held by a cached value. Object columns count pointers only."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, FixedPointArray):
+        exact = value.exact.nbytes if value.exact is not None else 0
+        return value.sign.nbytes + value.coef.nbytes + value.exp.nbytes + exact
+    if isinstance(value, Reconciliation):
+        return value.nbytes
+    if isinstance(value, ValidationResults):
+        # Value arrays are shared with the recalculated columns, which are cached separately
+        return value.mismatch.nbytes + value.codes.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Least-recently-used cache with a byte budget.
+
+    Entries are evicted oldest first once the estimated size of everything cached exceeds
+    max_bytes. Values are returned as stored, not copied, so callers must treat them as
+    read-only; the validation stages built for caching (recalculate_deposits,
+    validate_recalculated_deposits, ...) never modify their inputs.
+
+    Safe to share between threads (e.g. background jobs): compute() runs outside the lock,
+    so two threads missing the same key at once both compute it and the first stored wins.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, calling compute() to fill it on a miss.
+
+        Parameters:
+            key (tuple): Hashable key, e.g. (stage, file digest, settings...).
+            compute (callable): Produces the value on a miss.
+
+        Returns:
+            object: The cached or newly computed value.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            # Never evict the entry just added, even if it alone exceeds the budget
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# Module state survives Streamlit reruns, so one cache serves every rerun of every page
+CACHE = ResultCache()
+
+
+def arrow_copy(file, digest, directory=None):
+    """
+    Path of an Arrow IPC copy of an uploaded CSV, converted on first use.
+
+    The copy outlives the process, so later sessions on the same content memory-map it
+    instead of parsing the CSV again. Columns are stored as text, which keeps exact digits
+    for the decimal page; typed reads cast them.
+    """
+    directory = directory or ARROW_CACHE_DIR
+    path = os.path.join(directory, f"{digest}.arrow")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        # Write aside and rename, so a concurrent session never maps a partial file
+        partial = f"{path}.{os.getpid()}.partial"
+        csv_to_arrow(file, partial)
+        os.replace(partial, path)
+    return path
+
+
+def _source(file, digest):
+    # Uploaded CSVs are read from their Arrow copy when ARROW_CACHE_DIR is set
+    if ARROW_CACHE_DIR and file_format(file) == 'csv':
+        return arrow_copy(file, digest)
+    return file
+
+
+def cached_read_header(file):
+    """
+    Digest and column names of an upload, for pages that pick columns before reading any.
+
+    Returns:
+        tuple: (digest, header).
+    """
+    digest = file_digest(file)
+    source = _source(file, digest)
+    return digest, CACHE.get_or_compute(('header', digest), lambda: read_header(source))
+
+
+def cached_read_schema(file, schema, as_text=False):
+    """
+    Read an upload's schema columns once per distinct content.
+
+    Returns:
+        tuple: (digest, header, DataFrame). header lists every column in the file, for
+            choosing extra columns to read with cached_read_columns. The frame is shared;
+            do not modify it.
+
+    Raises:
+        MissingColumnsError: If the upload lacks a schema column.
+    """
+    digest, header = cached_read_header(file)
+    schema.check(header)
+    df = CACHE.get_or_compute(('schema', digest, schema_key(schema), as_text),
+                              lambda: schema.read(_source(file, digest), as_text=as_text))
+    return digest, header, df
+
+
+def cached_read_columns(file, digest, columns, as_text=False):
+    """Read further columns of an upload (e.g. ones picked for display) once per selection."""
+    key = ('columns', digest, tuple(columns), as_text)
+    return CACHE.get_or_compute(key, lambda: read_columns(_source(file, digest), columns, as_text))
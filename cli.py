@@ -0,0 +1,394 @@
+"""
+Validate deposit, withdraw or transfer CSVs without Streamlit, e.g. from cron.
+
+Usage:
+    python cli.py deposit exports/*.csv --workers 32 --output invalid.csv
+    python cli.py deposit export.csv --engine exact --tolerance "RC_COGs=0.001"
+    python cli.py withdraw withdrawals.csv --tolerance "RC_Network Fee USD=0.001"
+    python cli.py transfer transfers.parquet --output mismatches.parquet
+    python cli.py deposit export.csv --metrics metrics.prom --profile run.prof
+    python cli.py deposit daily_export.csv --store validated.sqlite
+    python cli.py withdraw withdrawals.csv --report by_currency_day_network.csv
+
+Each CSV is split into byte ranges on line boundaries and the ranges are validated in a
+process pool, so a single large export uses every core. Per-shard summaries are merged in
+file order. Fields must not contain embedded newlines, which holds for the exports these
+pages read. Parquet and Feather/Arrow inputs are validated one file per worker. The output
+format follows the --output extension (.csv, .parquet, .feather). Exits with status 1 when
+any row is invalid.
+
+--metrics writes per-stage time and memory (JSON for a .json path, Prometheus text otherwise);
+stage times are summed over the workers. --profile runs cProfile in every worker and merges
+the dumps into one .prof file for pstats or snakeviz.
+
+--store keeps every deposit row's outcome in a SQLite file (see store.py), so a cumulative
+export only recalculates the rows that are new or changed since the last run. Stored runs
+validate their files one after another in this process; the store answers history queries
+with `python store.py validated.sqlite <Transaction ID>`.
+
+--report writes each file's mismatch report (see report.py): rows, mismatch rate and
+discrepancy totals per currency, day and network, for the dimensions the file has.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from decimal import getcontext
+
+import pandas as pd
+
+import perf
+from columnar import file_format, write_frame
+from formulas import DEPOSIT_FORMULAS, XAU_BACKUP_DEPOSIT_FORMULAS
+from report import MismatchReport, report_columns
+from schema import (DEPOSIT_SCHEMA, TRANSFER_SCHEMA, WITHDRAW_SCHEMA, XAU_BACKUP_DEPOSIT_SCHEMA, MissingColumnsError,
+                    read_header)
+from store import ValidationStore, validate_deposits_incremental
+from streaming import (CHUNK_ROWS, MAX_OFFENDING_ROWS, TRANSFER_CHECKS, ValidationSummary, validate_deposits_chunked,
+                       validate_transfers_chunked, validate_withdrawals_chunked)
+from validation import (DEFAULT_TOLERANCES, WITHDRAW_TOLERANCES, recalculate_and_validate_deposits,
+                        recalculate_and_validate_deposits_exact, recalculate_and_validate_deposits_truncated)
+
+# Files smaller than this per worker are not split further
+MIN_SHARD_BYTES = 8 * 1024 ** 2
+
+# The deposit pages' default tolerances (XAU backup rate, truncate to 2 places)
+PAGE_TOLERANCES = dict.fromkeys(XAU_BACKUP_DEPOSIT_FORMULAS, 1e-2)
+
+# Engine name -> (chunk validator, default tolerances, schema, read as text, formulas), one per deposit page
+DEPOSIT_ENGINES = {
+    'main': (recalculate_and_validate_deposits, DEFAULT_TOLERANCES, DEPOSIT_SCHEMA, False, DEPOSIT_FORMULAS),
+    'truncated': (recalculate_and_validate_deposits_truncated, PAGE_TOLERANCES, XAU_BACKUP_DEPOSIT_SCHEMA, False,
+                  XAU_BACKUP_DEPOSIT_FORMULAS),
+    'exact': (recalculate_and_validate_deposits_exact, PAGE_TOLERANCES, XAU_BACKUP_DEPOSIT_SCHEMA, True,
+              XAU_BACKUP_DEPOSIT_FORMULAS),
+}
+
+
+class ShardFile(io.RawIOBase):
+    """Read-only view of a CSV byte range with the header line prepended."""
+
+    def __init__(self, path, header, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._header = header
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._header:
+            n = min(len(buffer), len(self._header))
+            buffer[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self._remaining)]
+        n = self._file.readinto(view)
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def plan_shards(path, shards, min_shard_bytes=MIN_SHARD_BYTES):
+    """
+    Split a CSV into at most `shards` byte ranges that start and end on line boundaries.
+
+    Returns:
+        tuple: (header bytes, [(start, end), ...]) covering every data row exactly once.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        count = max(1, min(shards, (size - data_start) // min_shard_bytes))
+        bounds = [data_start]
+        for k in range(1, count):
+            f.seek(data_start + (size - data_start) * k // count)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+        bounds.append(size)
+    return header, [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def validate_shard(kind, path, header, start, end, engine='main', tolerances=None, chunksize=CHUNK_ROWS,
+                   max_offending_rows=MAX_OFFENDING_ROWS, report=False):
+    """Validate one byte range of a CSV, or a whole columnar file when header is None; runs in a worker process."""
+    if header is None:
+        return validate_source(kind, path, read_header(path), engine, tolerances, chunksize, max_offending_rows,
+                               report)
+    with io.BufferedReader(ShardFile(path, header, start, end), buffer_size=1024 ** 2) as handle:
+        return validate_source(kind, handle, read_header(io.BytesIO(header)), engine, tolerances, chunksize,
+                               max_offending_rows, report)
+
+
+def measure_shard(profile_path, *args):
+    """
+    Run validate_shard under a Recorder, and cProfile when profile_path is set; runs in a worker process.
+
+    Returns:
+        tuple: (ValidationSummary, Recorder snapshot); the profile is dumped to profile_path.
+    """
+    profiler = perf.Profiler() if profile_path else None
+    with perf.Recorder() as recorder:
+        if profiler is not None:
+            profiler.start()
+        try:
+            summary = validate_shard(*args)
+        finally:
+            if profiler is not None:
+                profiler.stop().dump(profile_path)
+    return summary, recorder.snapshot()
+
+
+def validate_source(kind, source, columns, engine, tolerances, chunksize, max_offending_rows, report=False):
+    """Validate an open CSV handle or a columnar file path; columns is its header. report builds summary.report."""
+    dimensions = report_columns(columns) if report else None
+    if kind == 'transfer':
+        # Every source column is kept so the output rows are complete
+        return validate_transfers_chunked(source, chunksize, max_offending_rows=max_offending_rows,
+                                          read_csv_kwargs=TRANSFER_SCHEMA.read_csv_kwargs(columns),
+                                          report_columns=dimensions)
+    if kind == 'withdraw':
+        return validate_withdrawals_chunked(source, tolerances, chunksize, max_offending_rows=max_offending_rows,
+                                            report_columns=dimensions)
+    validate, _, schema, as_text, _ = DEPOSIT_ENGINES[engine]
+    # The exact engine reproduces the correct-decimal page, which runs at 18 digits
+    getcontext().prec = 18
+    return validate_deposits_chunked(source, tolerances, chunksize, max_offending_rows=max_offending_rows,
+                                     engine=validate,
+                                     read_csv_kwargs=schema.read_csv_kwargs(list((dimensions or {}).values()),
+                                                                            as_text=as_text),
+                                     report_columns=dimensions)
+
+
+def validate_files(kind, paths, engine='main', tolerances=None, workers=None, chunksize=CHUNK_ROWS,
+                   max_offending_rows=MAX_OFFENDING_ROWS, recorder=None, profile_dir=None, report=False, pool=None):
+    """
+    Validate several files in parallel.
+
+    Parameters:
+        kind (str): 'deposit', 'withdraw' or 'transfer'.
+        paths (list): CSV, Parquet or Arrow paths.
+        engine (str): Deposit engine name in DEPOSIT_ENGINES.
+        tolerances (dict): Deposit or withdraw tolerances; defaults to the engine's or WITHDRAW_TOLERANCES.
+        workers (int): Worker processes; defaults to the CPU count.
+        chunksize (int): Rows per chunk inside each shard.
+        max_offending_rows (int): Cap on offending rows kept per file.
+        recorder (perf.Recorder): Receives the stage timings of every shard.
+        profile_dir (str): Directory for one cProfile dump per shard (shard-<n>.prof).
+        report (bool): Build each summary's MismatchReport over the dimensions its file has.
+        pool (ProcessPoolExecutor): A running pool to validate on (e.g. a service's warm workers);
+            by default one of `workers` processes is started for this call.
+
+    Returns:
+        dict: path -> merged ValidationSummary, in the order given.
+
+    Raises:
+        MissingColumnsError: Before any work starts, if a file lacks a required column.
+    """
+    workers = workers or os.cpu_count() or 1
+    if kind != 'transfer' and tolerances is None:
+        tolerances = default_tolerances(kind, engine)
+    checks = TRANSFER_CHECKS if kind == 'transfer' else [col.replace('RC_', '') for col in tolerances]
+    schema = {'deposit': DEPOSIT_ENGINES[engine][2], 'withdraw': WITHDRAW_SCHEMA, 'transfer': TRANSFER_SCHEMA}[kind]
+    headers = {path: read_header(path) for path in paths}
+    for path, header in headers.items():
+        schema.check(header, source=path)
+
+    measured = recorder is not None or profile_dir is not None
+    with nullcontext(pool) if pool is not None else ProcessPoolExecutor(max_workers=workers) as pool:
+        futures, shard_count = {}, 0
+        for path in paths:
+            if file_format(path) == 'csv':
+                header, ranges = plan_shards(path, workers)
+            else:
+                header, ranges = None, [(None, None)]
+            futures[path] = []
+            for start, end in ranges:
+                args = (kind, path, header, start, end, engine, tolerances, chunksize, max_offending_rows, report)
+                if measured:
+                    profile_path = profile_dir and os.path.join(profile_dir, f"shard-{shard_count}.prof")
+                    futures[path].append(pool.submit(measure_shard, profile_path, *args))
+                else:
+                    futures[path].append(pool.submit(validate_shard, *args))
+                shard_count += 1
+        summaries = {}
+        for path, shard_futures in futures.items():
+            # A file without rows has no shards; its report is then empty rather than missing
+            summary = ValidationSummary(checks, max_offending_rows,
+                                        MismatchReport(checks, report_columns(headers[path])) if report else None)
+            for future in shard_futures:
+                result = future.result()
+                if measured:
+                    result, snapshot = result
+                    if recorder is not None:
+                        recorder.merge(snapshot)
+                summary.merge(result)
+            summaries[path] = summary
+    return summaries
+
+
+def validate_files_stored(paths, store, engine='main', tolerances=None, chunksize=CHUNK_ROWS,
+                          max_offending_rows=MAX_OFFENDING_ROWS):
+    """
+    Validate deposit files one after another, recalculating only rows the store does not hold as valid.
+
+    Parameters:
+        paths (list): CSV, Parquet or Arrow paths.
+        store (ValidationStore): Outcomes of earlier runs; receives one run per file.
+        Other parameters as for validate_files.
+
+    Returns:
+        dict: path -> ValidationSummary, in the order given.
+
+    Raises:
+        MissingColumnsError: Before any work starts, if a file lacks a required column.
+    """
+    validate, defaults, schema, as_text, formulas = DEPOSIT_ENGINES[engine]
+    tolerances = defaults if tolerances is None else tolerances
+    for path in paths:
+        schema.check(read_header(path), source=path)
+    getcontext().prec = 18
+    return {path: validate_deposits_incremental(path, store, tolerances, chunksize,
+                                                max_offending_rows=max_offending_rows, engine=validate,
+                                                read_csv_kwargs=schema.read_csv_kwargs(as_text=as_text),
+                                                formulas=formulas)
+            for path in paths}
+
+
+def default_tolerances(kind, engine='main'):
+    """Tolerances a deposit engine or the withdraw validator uses unless overridden."""
+    return WITHDRAW_TOLERANCES if kind == 'withdraw' else DEPOSIT_ENGINES[engine][1]
+
+
+def parse_tolerances(items, defaults):
+    tolerances = dict(defaults)
+    for item in items:
+        col, _, value = item.rpartition('=')
+        if col not in tolerances:
+            raise ValueError(f"unknown tolerance column: {col}")
+        tolerances[col] = float(value)
+    return tolerances
+
+
+def write_results(summaries, output):
+    frames = []
+    for path, summary in summaries.items():
+        rows = summary.offending_rows
+        rows.insert(0, 'File', path)
+        frames.append(rows)
+    write_frame(pd.concat(frames, ignore_index=True), output)
+
+
+def summary_counts(summary):
+    """A summary's counters, as written by --summary-json."""
+    return {'total_rows': summary.total_rows, 'invalid_count': summary.invalid_count,
+            'mismatch_counts': summary.mismatch_counts, 'truncated': summary.truncated}
+
+
+def write_reports(summaries, output):
+    frames = []
+    for path, summary in summaries.items():
+        table = summary.report.table()
+        table.insert(0, 'File', path)
+        frames.append(table)
+    write_frame(pd.concat(frames, ignore_index=True), output)
+
+
+def merge_profile_dir(profile_dir, output):
+    # Shards are numbered in submission order; sort numerically so the merge is deterministic
+    parts = sorted((os.path.join(profile_dir, name) for name in os.listdir(profile_dir)),
+                   key=lambda path: int(path.rsplit('-', 1)[1].split('.')[0]))
+    perf.merge_profiles(parts, output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=['deposit', 'withdraw', 'transfer'])
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--engine', choices=list(DEPOSIT_ENGINES), default='main',
+                        help="main: main.py (GDR/USD rate); truncated: float deposit page; exact: correct-decimal page")
+    parser.add_argument('--tolerance', action='append', default=[], metavar='COLUMN=VALUE',
+                        help="Override one deposit or withdraw tolerance, e.g. RC_COGs=1e-8. Repeatable.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--max-offending-rows', type=int, default=MAX_OFFENDING_ROWS)
+    parser.add_argument('--output', help="CSV, Parquet or Feather file for the invalid rows of every input")
+    parser.add_argument('--summary-json', help="Write the per-file counters as JSON")
+    parser.add_argument('--metrics', help="Write per-stage time and memory as JSON (.json) or Prometheus text")
+    parser.add_argument('--profile', help="Profile every worker with cProfile and write the merged .prof here")
+    parser.add_argument('--store', help="SQLite file of deposit outcomes; only new or changed rows are recalculated")
+    parser.add_argument('--report', help="CSV, Parquet or Feather file for the mismatch report of every input")
+    args = parser.parse_args(argv)
+    if args.store and args.kind != 'deposit':
+        parser.error("--store only applies to deposits")
+    if args.store and args.report:
+        parser.error("--report cannot be combined with --store")
+
+    tolerances = None
+    if args.kind != 'transfer':
+        try:
+            tolerances = parse_tolerances(args.tolerance, default_tolerances(args.kind, args.engine))
+        except ValueError as e:
+            parser.error(str(e))
+
+    recorder = perf.Recorder().start() if args.metrics else None
+    if args.store:
+        # Runs in this process, where the recorder is active; the profile is this process's
+        profiler = perf.Profiler().start() if args.profile else None
+        try:
+            with ValidationStore(args.store) as store:
+                summaries = validate_files_stored(args.files, store, args.engine, tolerances, args.chunksize,
+                                                  args.max_offending_rows)
+        except MissingColumnsError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        finally:
+            if profiler is not None:
+                profiler.stop().dump(args.profile)
+    else:
+        with tempfile.TemporaryDirectory() if args.profile else nullcontext() as profile_dir:
+            try:
+                summaries = validate_files(args.kind, args.files, args.engine, tolerances, args.workers,
+                                           args.chunksize, args.max_offending_rows, recorder, profile_dir,
+                                           args.report is not None)
+            except MissingColumnsError as e:
+                print(f"error: {e}", file=sys.stderr)
+                return 2
+            if args.profile:
+                merge_profile_dir(profile_dir, args.profile)
+
+    for path, summary in summaries.items():
+        print(f"{path}: {summary.total_rows} rows, {summary.invalid_count} invalid")
+        for name, count in summary.mismatch_counts.items():
+            if count:
+                print(f"    {name}: {count}")
+    if args.output:
+        write_results(summaries, args.output)
+    if args.report:
+        write_reports(summaries, args.report)
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump({path: summary_counts(summary) for path, summary in summaries.items()}, f, indent=2)
+
+    if recorder is not None:
+        recorder.stop()
+        labels = {'kind': args.kind, 'engine': args.engine} if args.kind == 'deposit' else {'kind': args.kind}
+        with open(args.metrics, 'w') as f:
+            f.write(recorder.to_json(**labels) if args.metrics.endswith('.json') else recorder.to_prometheus(**labels))
+
+    return 1 if any(s.invalid_count for s in summaries.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
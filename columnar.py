@@ -0,0 +1,141 @@
+import io
+import os
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import perf
+
+# Leading bytes of each columnar format; anything else is read as CSV
+_MAGIC = {b'PAR1': 'parquet', b'ARROW1': 'arrow'}
+
+# File types the upload widgets accept
+INPUT_TYPES = ['csv', 'parquet', 'feather', 'arrow']
+
+# Export format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Feather': ('feather', 'application/vnd.apache.arrow.file'),
+}
+
+
+def file_format(source):
+    """'parquet', 'arrow' (Feather v2 / Arrow IPC file) or 'csv', from the first bytes of a path or file object."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            head = f.read(6)
+    elif not source.seekable():
+        # Columnar formats need random access, so a stream (e.g. a CLI shard) is a CSV
+        return 'csv'
+    else:
+        position = source.tell()
+        source.seek(0)
+        head = source.read(6)
+        source.seek(position)
+    for magic, name in _MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return 'csv'
+
+
+def _native(source):
+    # Paths are memory-mapped; uploads are wrapped without copying their bytes
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source))
+    if hasattr(source, 'getvalue'):
+        return pa.BufferReader(source.getvalue())
+    source.seek(0)
+    return pa.PythonFile(source, mode='r')
+
+
+def columnar_header(source):
+    """Column names of a Parquet or Arrow file, read from its metadata."""
+    if file_format(source) == 'parquet':
+        return pq.read_schema(_native(source)).names
+    return pa.ipc.open_file(_native(source)).schema.names
+
+
+def read_columnar_table(source, columns=None):
+    """
+    Read some columns of a Parquet or Arrow file as an Arrow table.
+
+    Only the requested columns are read. Arrow files on disk are memory-mapped, so their
+    columns are not copied until converted to pandas.
+    """
+    columns = list(columns) if columns is not None else None
+    if file_format(source) == 'parquet':
+        return pq.read_table(_native(source), columns=columns)
+    return feather.read_table(_native(source), columns=columns, memory_map=True)
+
+
+def iter_columnar_batches(source, columns, batch_rows):
+    """
+    Split a Parquet or Arrow file into tables of at most batch_rows rows, read lazily.
+
+    Returns:
+        tuple: (total rows, iterator of pa.Table).
+    """
+    if columns is not None:
+        wanted = set(columns)
+        columns = [col for col in columnar_header(source) if col in wanted]
+    if file_format(source) == 'parquet':
+        parquet = pq.ParquetFile(_native(source))
+        batches = (pa.Table.from_batches([batch]) for batch in parquet.iter_batches(batch_rows, columns=columns))
+        return parquet.metadata.num_rows, batches
+
+    reader = pa.ipc.open_file(_native(source))
+    table = reader.read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table.num_rows, (table.slice(start, batch_rows) for start in range(0, table.num_rows, batch_rows))
+
+
+def csv_to_arrow(source, path):
+    """
+    Convert a CSV to an Arrow IPC file, batch by batch, keeping every column as text.
+
+    Text columns keep the exact digits for the decimal pages; typed readers cast on read.
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    # The first block names the columns; the second pass reads them all as strings
+    names = pa_csv.open_csv(source).schema.names
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    options = pa_csv.ConvertOptions(column_types=dict.fromkeys(names, pa.string()), strings_can_be_null=True)
+    reader = pa_csv.open_csv(source, convert_options=options)
+    with pa.ipc.new_file(path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+@perf.timed(perf.EXPORT)
+def frame_to_bytes(df, fmt):
+    """Serialize a results frame in one of EXPORT_FORMATS, e.g. for a download button."""
+    buffer = io.BytesIO()
+    write_frame(df, buffer, fmt)
+    return buffer.getvalue()
+
+
+def write_frame(df, target, fmt=None):
+    """
+    Write a frame as CSV, Parquet or Feather.
+
+    Parameters:
+        df (DataFrame): Results to write; the index is not written.
+        target (str or file): Path or binary file object.
+        fmt (str): Key of EXPORT_FORMATS; inferred from a path's extension when omitted.
+    """
+    if fmt is None:
+        extension = os.path.splitext(os.fspath(target))[1].lstrip('.').lower()
+        fmt = {'parquet': 'Parquet', 'feather': 'Feather', 'arrow': 'Feather'}.get(extension, 'CSV')
+    df = df.reset_index(drop=True)
+    if fmt == 'Parquet':
+        df.to_parquet(target, index=False)
+    elif fmt == 'Feather':
+        df.to_feather(target)
+    else:
+        df.to_csv(target, index=False)
@@ -0,0 +1,431 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN, getcontext
+
+import numpy as np
+import pandas as pd
+
+# Significant digits the fast path reproduces; matches getcontext().prec = 18 in the decimal page
+PREC = 18
+
+_POW10 = np.array([10 ** i for i in range(PREC + 1)], dtype=np.int64)
+_BASE = _POW10[PREC]
+_HALF_BASE = _POW10[PREC // 2]
+# Rows per block when parsing or formatting through byte matrices
+_BLOCK = 1 << 16
+
+
+def _fast_context():
+    context = getcontext()
+    return context.prec == PREC and context.rounding == ROUND_HALF_EVEN
+
+
+def _ndigits(x):
+    # Number of decimal digits of each non-negative value (0 for 0)
+    return np.searchsorted(_POW10, x, side='right')
+
+
+def _mul_wide(a, b):
+    # Exact a * b for 0 <= a, b <= 10**18, as hi * 10**18 + lo
+    a1, a0 = np.divmod(a, _HALF_BASE)
+    b1, b0 = np.divmod(b, _HALF_BASE)
+    m1, m0 = np.divmod(a1 * b0 + a0 * b1, _HALF_BASE)
+    carry, lo = np.divmod(a0 * b0 + m0 * _HALF_BASE, _BASE)
+    return a1 * b1 + m1 + carry, lo
+
+
+def _scale_wide(c, shift):
+    # Exact c * 10**shift for results below 10**36, as hi * 10**18 + lo
+    low = np.minimum(shift, PREC)
+    hi, lo = np.divmod(c, _POW10[PREC - low])
+    return hi * _POW10[np.maximum(shift - PREC, 0)], lo * _POW10[low]
+
+
+def _normalize(hi, lo):
+    carry = np.floor_divide(lo, _BASE)
+    return hi + carry, lo - carry * _BASE
+
+
+def _divmod_wide(hi, lo, divisor):
+    # floor((hi * 10**18 + lo) / divisor) and the remainder, for quotients below 10**18
+    estimate = (hi.astype(float) * 1e18 + lo.astype(float)) / divisor.astype(float)
+    q = np.clip(estimate, 0, 1e18).astype(np.int64)
+    p_hi, p_lo = _mul_wide(q, divisor)
+    r_hi, r_lo = _normalize(hi - p_hi, lo - p_lo)
+    # One float step brings the estimate within one unit, then finish with exact fix-ups
+    q = q + np.floor((r_hi.astype(float) * 1e18 + r_lo.astype(float)) / divisor.astype(float)).astype(np.int64)
+    p_hi, p_lo = _mul_wide(q, divisor)
+    r_hi, r_lo = _normalize(hi - p_hi, lo - p_lo)
+    while True:
+        low = r_hi < 0
+        high = (r_hi > 0) | ((r_hi == 0) & (r_lo >= divisor))
+        if not (low.any() or high.any()):
+            return q, r_lo
+        step = high.astype(np.int64) - low.astype(np.int64)
+        q = q + step
+        r_hi, r_lo = _normalize(r_hi, r_lo - step * divisor)
+
+
+def _round_wide(hi, lo, exp):
+    # Round hi * 10**18 + lo (hi < 10**18) half-even to PREC digits
+    digits = np.where(hi > 0, _ndigits(hi) + PREC, _ndigits(lo))
+    drop = np.maximum(digits - PREC, 0)
+    unit = _POW10[drop]
+    coef = hi * _POW10[PREC - drop] + lo // unit
+    rem = lo % unit
+    half = unit // 2
+    up = (drop > 0) & ((rem > half) | ((rem == half) & (coef % 2 == 1)))
+    return _carry(coef + up, exp + drop)
+
+
+def _carry(coef, exp):
+    # Rounding 99...9 up gives 10**PREC, which Decimal stores as 10**(PREC - 1) with exponent + 1
+    overflow = coef == _BASE
+    return np.where(overflow, _POW10[PREC - 1], coef), exp + overflow
+
+
+def _parse_block(raw):
+    # Parse an array of ASCII byte strings of the form [+-]digits[.digits], one character column at a time
+    width = raw.dtype.itemsize
+    chars = np.ascontiguousarray(raw.view(np.uint8).reshape(len(raw), width).T)
+    negative = chars[0] == ord('-')
+    ok = np.ones(len(raw), dtype=bool)
+    seen_dot = np.zeros(len(raw), dtype=bool)
+    seen_digit = np.zeros(len(raw), dtype=bool)
+    started = np.zeros(len(raw), dtype=bool)
+    significant = np.zeros(len(raw), dtype=np.int64)
+    coef = np.zeros(len(raw), dtype=np.int64)
+    exp = np.zeros(len(raw), dtype=np.int64)
+    for j, column in enumerate(chars):
+        value = column - np.uint8(ord('0'))
+        digit = value < 10
+        dot = column == ord('.')
+        allowed = digit | dot | (column == 0)
+        if j == 0:
+            allowed |= negative | (column == ord('+'))
+        ok &= allowed & ~(dot & seen_dot)
+        seen_dot |= dot
+        seen_digit |= digit
+        started |= digit & (value > 0)
+        significant += digit & started
+        coef = np.where(digit, coef * 10 + value, coef)
+        exp -= digit & seen_dot
+    ok &= seen_digit & (significant <= PREC)
+    return ok & negative, np.where(ok, coef, 0), np.where(ok, exp, 0), ok
+
+
+def _format_block(sign, coef, places):
+    # Build right-aligned characters ([-]int[.frac]) in a byte matrix, then left-align them
+    digits = np.maximum(_ndigits(coef), places + 1)
+    length = digits + (places > 0) + sign
+    width = int(length.max())
+    k = np.arange(width)[None, :]
+    digit_index = k - ((places > 0) & (k > places))
+    chars = (coef[:, None] // _POW10[np.minimum(digit_index, PREC)]) % 10 + ord('0')
+    chars = np.where(k < (digits + (places > 0))[:, None], chars, 0)
+    if places > 0:
+        chars = np.where(k == places, ord('.'), chars)
+    chars = np.where(sign[:, None] & (k == length[:, None] - 1), ord('-'), chars)
+    index = length[:, None] - 1 - k
+    chars = np.where(index >= 0, np.take_along_axis(chars, np.maximum(index, 0), axis=1), 0)
+    return np.ascontiguousarray(chars.astype(np.uint8)).view(f'S{width}').ravel()
+
+
+class FixedPointArray:
+    """
+    Exact decimal column stored as int64 coefficients and exponents.
+
+    Each value is (-1)**sign * coef * 10**exp with coef < 10**18, i.e. the same triple Decimal
+    keeps. Arithmetic reproduces Decimal with prec 18 and ROUND_HALF_EVEN bit for bit: results
+    are computed exactly in two-limb integers and rounded the way Decimal rounds. Rows the fast
+    path cannot handle (unparseable or over-long text, NaN, division by zero, operands whose
+    exponents are too far apart) are computed with real Decimal objects, for those rows only.
+    Under any other decimal context every row takes the Decimal path.
+    """
+
+    def __init__(self, sign, coef, exp, exact=None):
+        self.sign = sign
+        self.coef = coef
+        self.exp = exp
+        # Decimal values for rows held outside the int64 representation; None while there are none
+        self.exact = exact
+        self.slow = np.zeros(len(coef), dtype=bool) if exact is None else np.not_equal(exact, None)
+
+    def __len__(self):
+        return len(self.coef)
+
+    @classmethod
+    def from_text(cls, values):
+        """
+        Parse CSV text (or anything Decimal() accepts) into a fixed-point array.
+
+        Plain ASCII numbers such as "-1234.5600" are parsed as a byte matrix without creating
+        any Python objects; everything else (exponents, NaN, over-long numbers) goes through
+        Decimal() for that row.
+
+        Parameters:
+            values (array-like): One value per row, normally the raw strings read with dtype=str.
+
+        Returns:
+            FixedPointArray: Values identical to [Decimal(v) for v in values].
+        """
+        values = np.asarray(values, dtype=object)
+        n = len(values)
+        result = cls(np.zeros(n, dtype=bool), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64))
+        fast = ~pd.isna(values)
+        try:
+            raw = values[fast].astype(bytes)
+        except (UnicodeEncodeError, TypeError):
+            raw, fast = None, np.zeros(n, dtype=bool)
+        if raw is not None:
+            rows = np.flatnonzero(fast)
+            for start in range(0, len(raw), _BLOCK):
+                block = rows[start:start + _BLOCK]
+                sign, coef, exp, ok = _parse_block(raw[start:start + _BLOCK])
+                result.sign[block], result.coef[block], result.exp[block] = sign, coef, exp
+                fast[block] = ok
+        slow = np.flatnonzero(~fast)
+        result._assign(slow, [Decimal(v) for v in values[slow]])
+        return result
+
+    @classmethod
+    def _full(cls, value, n):
+        scalar = cls(np.zeros(1, dtype=bool), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+        scalar._assign(np.arange(1), [value])
+        exact = None if scalar.exact is None else np.repeat(scalar.exact, n)
+        return cls(np.repeat(scalar.sign, n), np.repeat(scalar.coef, n), np.repeat(scalar.exp, n), exact)
+
+    def _coerce(self, other):
+        if isinstance(other, FixedPointArray):
+            return other
+        if isinstance(other, (int, Decimal)):
+            return FixedPointArray._full(Decimal(other), len(self))
+        return NotImplemented
+
+    def _assign(self, rows, values):
+        # Store Decimal results, keeping every finite value that fits in the int64 representation
+        if len(rows) == 0:
+            return
+        self.slow = self.slow.copy()
+        for i, value in zip(rows.tolist(), values):
+            sign, digits, exp = value.as_tuple()
+            if isinstance(exp, int) and len(digits) <= PREC:
+                self.sign[i] = bool(sign)
+                self.coef[i] = int(''.join(map(str, digits)))
+                self.exp[i] = exp
+                if self.exact is not None:
+                    self.exact[i] = None
+                self.slow[i] = False
+            else:
+                if self.exact is None:
+                    self.exact = np.full(len(self), None, dtype=object)
+                self.sign[i], self.coef[i], self.exp[i] = False, 0, 0
+                self.exact[i] = value
+                self.slow[i] = True
+
+    def to_decimal(self, rows=None):
+        """Return the values of the given row positions (default: all) as Decimal objects."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+        return [
+            self.exact[i] if self.slow[i] else Decimal(f"{'-' if self.sign[i] else ''}{self.coef[i]}E{self.exp[i]}")
+            for i in rows.tolist()
+        ]
+
+    def take(self, rows):
+        """The values at the given row positions or boolean mask, as a new array."""
+        exact = None if self.exact is None else self.exact[rows]
+        return FixedPointArray(self.sign[rows], self.coef[rows], self.exp[rows], exact)
+
+    def to_strings(self, rows=None):
+        """
+        Format values in plain notation, exactly as format(Decimal, 'f') does.
+
+        Only the given row positions (default: all) are formatted, e.g. the mismatching rows shown.
+        """
+        if rows is not None:
+            return self.take(rows).to_strings()
+        places = -self.exp
+        if len(self) and not self.slow.any() and (places == places[0]).all() and 0 <= places[0] <= PREC:
+            blocks = [
+                _format_block(self.sign[start:start + _BLOCK], self.coef[start:start + _BLOCK], int(places[0]))
+                for start in range(0, len(self), _BLOCK)
+            ]
+            return np.concatenate(blocks).astype(str).astype(object)
+        return np.array([format(value, 'f') for value in self.to_decimal()], dtype=object)
+
+    def _binary(self, other, fast_op, slow_op):
+        if not _fast_context():
+            n = len(self)
+            result = FixedPointArray(np.zeros(n, dtype=bool), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64))
+            fallback = np.ones(n, dtype=bool)
+        else:
+            sign, coef, exp, fallback = fast_op(self, other)
+            result = FixedPointArray(sign, coef, exp)
+            fallback = fallback | self.slow | other.slow
+        rows = np.flatnonzero(fallback)
+        result._assign(rows, [slow_op(a, b) for a, b in zip(self.to_decimal(rows), other.to_decimal(rows))])
+        return result
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._binary(other, _add, lambda a, b: a + b)
+
+    def __radd__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return other._binary(self, _add, lambda a, b: a + b)
+
+    def __sub__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._binary(other, _sub, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return other._binary(self, _sub, lambda a, b: a - b)
+
+    def __mul__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._binary(other, _mul, lambda a, b: a * b)
+
+    def __rmul__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return other._binary(self, _mul, lambda a, b: a * b)
+
+    def __truediv__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self._binary(other, _div, lambda a, b: a / b)
+
+    def __rtruediv__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return other._binary(self, _div, lambda a, b: a / b)
+
+    def __neg__(self):
+        # Decimal negation of a zero gives +0
+        result = FixedPointArray(~self.sign & (self.coef != 0), self.coef.copy(), self.exp.copy())
+        rows = np.flatnonzero(self.slow)
+        result._assign(rows, [-value for value in self.to_decimal(rows)])
+        return result
+
+    def __abs__(self):
+        result = FixedPointArray(np.zeros(len(self), dtype=bool), self.coef.copy(), self.exp.copy())
+        rows = np.flatnonzero(self.slow)
+        result._assign(rows, [abs(value) for value in self.to_decimal(rows)])
+        return result
+
+    def __gt__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        fallback = np.ones(len(self), dtype=bool)
+        greater = np.zeros(len(self), dtype=bool)
+        if _fast_context():
+            # The sign of a correctly rounded difference is the sign of the exact difference
+            sign, coef, _, fallback = _sub(self, other)
+            greater = ~sign & (coef != 0)
+            fallback = fallback | self.slow | other.slow
+        rows = np.flatnonzero(fallback)
+        greater[rows] = [a > b for a, b in zip(self.to_decimal(rows), other.to_decimal(rows))]
+        return greater
+
+    def quantize_down(self, exponent):
+        """
+        Truncate every value to the given exponent, like Decimal.quantize(..., rounding=ROUND_DOWN).
+
+        Parameters:
+            exponent (int): Target exponent, e.g. -2 for two decimal places.
+
+        Returns:
+            FixedPointArray: Truncated values. Rows Decimal would reject (more than 18 digits after
+                quantizing) raise the same InvalidOperation.
+        """
+        quantum = Decimal(f"1E{exponent}")
+        drop = exponent - self.exp
+        coef = np.where(drop > PREC, 0, self.coef // _POW10[np.clip(drop, 0, PREC)])
+        coef = coef * _POW10[np.clip(-drop, 0, PREC)]
+        fallback = (drop < 0) & (_ndigits(self.coef) - drop > PREC)
+        if not _fast_context():
+            fallback[:] = True
+        result = FixedPointArray(self.sign.copy(), coef, np.full(len(self), exponent, dtype=np.int64))
+        rows = np.flatnonzero(fallback | self.slow)
+        result._assign(rows, [value.quantize(quantum, rounding=ROUND_DOWN) for value in self.to_decimal(rows)])
+        return result
+
+
+def _add(a, b):
+    exp = np.minimum(a.exp, b.exp)
+    shift_a, shift_b = a.exp - exp, b.exp - exp
+    fallback = np.maximum(shift_a, shift_b) > PREC
+    a_hi, a_lo = _scale_wide(a.coef, np.minimum(shift_a, PREC))
+    b_hi, b_lo = _scale_wide(b.coef, np.minimum(shift_b, PREC))
+
+    # Same signs: add magnitudes. Different signs: subtract the smaller magnitude from the larger
+    same = a.sign == b.sign
+    a_larger = (a_hi > b_hi) | ((a_hi == b_hi) & (a_lo >= b_lo))
+    big_hi, big_lo = np.where(a_larger, a_hi, b_hi), np.where(a_larger, a_lo, b_lo)
+    small_hi, small_lo = np.where(a_larger, b_hi, a_hi), np.where(a_larger, b_lo, a_lo)
+    hi, lo = _normalize(
+        np.where(same, a_hi + b_hi, big_hi - small_hi),
+        np.where(same, a_lo + b_lo, big_lo - small_lo),
+    )
+    fallback |= hi >= _BASE
+    hi = np.where(fallback, 0, hi)
+
+    # An exact zero from opposite signs is +0; both negative keeps -0
+    sign = np.where(same, a.sign, np.where(a_larger, a.sign, b.sign))
+    sign &= (hi != 0) | (lo != 0) | (same & a.sign)
+    coef, exp = _round_wide(hi, lo, exp)
+    return sign, coef, exp, fallback
+
+
+def _sub(a, b):
+    # Decimal subtracts by adding the operand with its sign flipped, zeros included
+    return _add(a, FixedPointArray(~b.sign, b.coef, b.exp, b.exact))
+
+
+def _mul(a, b):
+    hi, lo = _mul_wide(a.coef, b.coef)
+    coef, exp = _round_wide(hi, lo, a.exp + b.exp)
+    return a.sign ^ b.sign, coef, exp, np.zeros(len(coef), dtype=bool)
+
+
+def _div(a, b):
+    fallback = b.coef == 0
+    zero = a.coef == 0
+    numerator = np.where(zero, 1, a.coef)
+    divisor = np.where(fallback, 1, b.coef)
+
+    # Scale the numerator so the integer quotient has exactly PREC digits
+    digits_a, digits_b = _ndigits(numerator), _ndigits(divisor)
+    leading_a = numerator * _POW10[PREC - digits_a]
+    leading_b = divisor * _POW10[PREC - digits_b]
+    shift = PREC - 1 - digits_a + digits_b + (leading_a < leading_b)
+    q, rem = _divmod_wide(*_scale_wide(numerator, shift), divisor)
+
+    twice = 2 * rem
+    up = (twice > divisor) | ((twice == divisor) & (q % 2 == 1))
+    coef, exp = _carry(q + up, a.exp - b.exp - shift)
+
+    # An exact quotient drops trailing zeros down to the ideal exponent, as Decimal does
+    ideal = a.exp - b.exp
+    strip = (rem == 0) & (exp < ideal)
+    while strip.any():
+        strip &= coef % 10 == 0
+        coef = np.where(strip, coef // 10, coef)
+        exp = exp + strip
+        strip &= exp < ideal
+    coef = np.where(zero, 0, coef)
+    exp = np.where(zero, ideal, exp)
+    return a.sign ^ b.sign, coef, exp, fallback
@@ -0,0 +1,206 @@
+import ast
+import operator
+import re
+from graphlib import TopologicalSorter
+
+import perf
+
+# Column references in formula text are wrapped in backticks, as in DataFrame.eval
+_COLUMN = re.compile(r"`([^`]+)`")
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+GDR_BUY_RATE = 'CLEO.Lit Buy GDR/USD - Reference'
+XAU_BACKUP_BUY_RATE = 'CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference'
+
+_MARKUP_SHARE = "`{rate}` / `Total Markup - For Referrence` * (`Revenue` - `COGs`)"
+
+
+def deposit_formulas(buy_rate_column=GDR_BUY_RATE):
+    """
+    Build the deposit recalculation registry.
+
+    Parameters:
+        buy_rate_column (str): Column holding the GDR buy rate. main.py uses the GDR/USD reference,
+            the deposit pages use the XAU backup rate.
+
+    Returns:
+        dict: Output column -> formula text. Order is display order only; evaluation order is derived
+            from the column references.
+    """
+    return {
+        'RC_CLEO.Lit Sell GDR/USD - Reference': f"`{buy_rate_column}` * (100 + `Total Markup - For Referrence`) / 100",
+        'RC_Deposit Amount USD': "`Deposit Amount OC` * `CLEO.lit Buy Token/USD Reference`",
+        'RC_GDR Client Receive': "`RC_Deposit Amount USD` / `RC_CLEO.Lit Sell GDR/USD - Reference`",
+        'RC_COGs': f"`GDR Client Receive` * `{buy_rate_column}`",
+        'RC_Revenue': "`GDR Client Receive` * `RC_CLEO.Lit Sell GDR/USD - Reference`",
+        'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': _MARKUP_SHARE.format(rate='Mark up rate 5 - Transfer transasaction & gas fee'),
+        'RC_Mark up rate 4 - Value - Business risk reserve': _MARKUP_SHARE.format(rate='Mark up rate 4 - Business risk reserve'),
+        'RC_Mark up rate 3 - Value - Crypto to fiat conversion': _MARKUP_SHARE.format(rate='Mark up rate 3 - Crypto to fiat conversion'),
+        'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': _MARKUP_SHARE.format(rate='Mark up rate 2 - Withdrawal transasaction & gas fee'),
+        'RC_Mark up rate 1 - Value - Gold price fluctuation': _MARKUP_SHARE.format(rate='Mark up rate 1 - Gold Price Fluctuation')
+    }
+
+
+DEPOSIT_FORMULAS = deposit_formulas()
+XAU_BACKUP_DEPOSIT_FORMULAS = deposit_formulas(XAU_BACKUP_BUY_RATE)
+
+# Withdrawals: the client sends GDR on a chosen network and receives a token (e.g. USDC).
+# Formulas read the exported (cent-rounded) amounts they build on, as the export computes them,
+# so rounding does not accumulate along the chain; a wrong fee also shows in Client Receive DC.
+TOKEN_SELL_RATE = 'CLEO.lit Sell Token/USD Reference'
+
+WITHDRAW_FORMULAS = {
+    'RC_Withdraw Amount USD': f"`Withdraw Amount OC` * `{GDR_BUY_RATE}`",
+    'RC_Transaction Fee USD': "`Withdraw Amount USD` * `Transaction Fee - Rate`",
+    'RC_Network Fee USD': f"`Network Fee DC` * `{TOKEN_SELL_RATE}`",
+    'RC_Client Receive DC': f"(`Withdraw Amount USD` - `Transaction Fee USD` - `Network Fee USD`) / `{TOKEN_SELL_RATE}`"
+}
+
+TRANSFER_FORMULAS = {
+    'Recalculated Transaction Fee Oc': "`Transaction Fee - Rate` * `Transfer Amount DC`"
+}
+
+
+def formula_inputs(text):
+    """Return the columns a formula reads, in order of first appearance."""
+    return list(dict.fromkeys(_COLUMN.findall(text)))
+
+
+def formulas_markdown(formulas):
+    """Render a registry as the bullet list shown in the "Recalculation Logic" expanders."""
+    lines = ["### Recalculation Formulas"]
+    for name, text in formulas.items():
+        lines.append(f"- **{name}**: `{_COLUMN.sub(lambda m: m.group(1), text)}`")
+    return "\n".join(lines)
+
+
+class CompiledFormulas:
+    """
+    A registry compiled into a flat list of whole-column operations.
+
+    Each formula is parsed once. Identical subexpressions (e.g. `Revenue` - `COGs` in the five
+    markup formulas) are emitted once and shared, and formulas run in dependency order, so a
+    formula may read another formula's output regardless of where it sits in the registry.
+    """
+
+    def __init__(self, formulas):
+        self.formulas = dict(formulas)
+        graph = {name: [col for col in formula_inputs(text) if col in self.formulas] for name, text in self.formulas.items()}
+        self.order = list(TopologicalSorter(graph).static_order())
+        self.inputs = list(dict.fromkeys(
+            col for name in self.order for col in formula_inputs(self.formulas[name]) if col not in self.formulas
+        ))
+
+        # Steps are (key, func, argument keys); keys double as CSE identities and value slots.
+        # A step with no func stores a formula output under its column key.
+        self.steps = []
+        emitted = set()
+        for name in self.order:
+            result = self._emit(self._parse(self.formulas[name]), emitted)
+            self.steps.append((('col', name), None, (result,)))
+
+    @staticmethod
+    def _parse(text):
+        columns = formula_inputs(text)
+        source = _COLUMN.sub(lambda m: f"_c{columns.index(m.group(1))}", text)
+        return ast.parse(source, mode='eval').body, columns
+
+    def _emit(self, parsed, emitted):
+        node, columns = parsed
+        if isinstance(node, ast.Name) and re.fullmatch(r"_c\d+", node.id):
+            return ('col', columns[int(node.id[2:])])
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return ('const', node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            args = (self._emit((node.operand, columns), emitted),)
+            key, func = ('neg',) + args, operator.neg
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            args = (self._emit((node.left, columns), emitted), self._emit((node.right, columns), emitted))
+            key, func = (type(node.op).__name__,) + args, _BINARY_OPS[type(node.op)]
+        else:
+            raise ValueError(f"Unsupported expression in formula: {ast.unparse(node)}")
+        if key not in emitted:
+            emitted.add(key)
+            self.steps.append((key, func, args))
+        return key
+
+    def downstream(self, names):
+        """Return the given formula outputs plus every output that reads them, directly or not."""
+        stale = set(names)
+        for name in self.order:
+            if any(col in stale for col in formula_inputs(self.formulas[name])):
+                stale.add(name)
+        return stale
+
+    @perf.timed(perf.RECALCULATE)
+    def evaluate(self, df, convert=None, finalize=None, previous=None, changed=None, inputs=None,
+                 checkpoint=None):
+        """
+        Evaluate every formula over whole columns.
+
+        Parameters:
+            df (DataFrame): Source columns. Formula outputs are read from the results, not from df.
+            convert (callable): Optional conversion applied to each input column array,
+                e.g. casting to float or to Decimal objects.
+            finalize (callable): Optional finalize(name, values) applied to each formula output
+                before dependent formulas see it, e.g. truncation.
+            previous (dict): Optional earlier result of evaluate. With changed, outputs that do not
+                depend on a changed output are reused from it instead of recomputed.
+            changed (iterable): Outputs whose finalize behaviour changed since previous.
+            inputs (dict): Optional input column -> array already converted, used instead of
+                converting df's column again.
+            checkpoint (callable): Optional checkpoint() called after each input conversion and each
+                step, e.g. Job.checkpoint, so a long evaluation can be stopped between them.
+
+        Returns:
+            dict: Output column -> array, in registry order.
+        """
+        if previous is not None:
+            stale = self.downstream(changed or ())
+            needed = self._needed(stale)
+        else:
+            stale = set(self.formulas)
+            needed = None
+
+        values = {}
+        for col in self.inputs:
+            if needed is not None and ('col', col) not in needed:
+                continue
+            if inputs is not None and col in inputs:
+                values[('col', col)] = inputs[col]
+                continue
+            array = df[col].to_numpy()
+            values[('col', col)] = convert(array) if convert is not None else array
+            if checkpoint is not None:
+                checkpoint()
+
+        def resolve(key):
+            return key[1] if key[0] == 'const' else values[key]
+
+        for key, func, args in self.steps:
+            if func is None:
+                if key[1] not in stale:
+                    values[key] = previous[key[1]]
+                    continue
+                result = resolve(args[0])
+                values[key] = finalize(key[1], result) if finalize is not None else result
+            elif needed is None or key in needed:
+                values[key] = func(*(resolve(arg) for arg in args))
+            if checkpoint is not None:
+                checkpoint()
+
+        return {name: values[('col', name)] for name in self.formulas}
+
+    def _needed(self, stale):
+        # Walk the steps backwards from the stale outputs to find every value they read
+        needed = {('col', name) for name in stale}
+        for key, func, args in reversed(self.steps):
+            if key in needed and (func is not None or key[1] in stale):
+                needed.update(arg for arg in args if arg[0] != 'const')
+        return needed
@@ -0,0 +1,283 @@
+"""
+Background validation jobs, so a page stays responsive while a large upload validates.
+
+A page submits its validation as a job keyed by what decides the result (page, file digest,
+settings). Jobs run on one thread pool shared by every session, and the page polls its job,
+showing progress and the counts so far. A widget change stops the script run but not the job:
+the rerun finds the job by its key and keeps waiting, so interacting mid-run never starts a
+second validation. When the key changes (another file, other settings) the session releases
+its previous job, which is cancelled once no session waits on it; sessions submitting the
+same key share one job.
+
+Cancellation is cooperative: a job stops with JobCancelled the next time it reports progress
+(after every chunk of a chunked run) or calls checkpoint() (between stages of a whole-file
+run, and between the formula steps within each). Jobs run on threads, not processes, so they
+share the upload and CACHE without copying; pandas and numpy release the GIL for much of the
+work. Partial results are published as small snapshots, since the job keeps changing its own.
+"""
+import io
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+
+import perf
+
+# Validations running at once across all sessions; further jobs queue
+JOB_WORKERS = int(os.environ.get('FINOPS_JOB_WORKERS', 2))
+
+# Finished jobs kept, so reruns and other sessions get their results without validating again
+FINISHED_JOBS = 16
+
+# Seconds between progress updates while a page waits, and offending rows shown meanwhile
+POLL_SECONDS = 0.25
+PARTIAL_ROWS = 20
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job nobody waits on any more."""
+
+
+class Job:
+    """
+    One background validation. Its work reports through progress and publish and may call
+    checkpoint between stages; state moves from queued to running to done, failed or cancelled.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.state = QUEUED
+        self.rows = 0
+        self.fraction = 0.0
+        self.partial = None
+        self.metrics = None
+        self.profile = None
+        self.started = None
+        self.finished = None
+        self.owners = set()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the job to stop at its next checkpoint."""
+        self._cancel.set()
+
+    def checkpoint(self):
+        """Stop with JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.key} was cancelled")
+
+    def progress(self, rows, fraction):
+        """A progress(rows_done, fraction) callback for read_chunks and validate_*_chunked."""
+        self.rows = rows
+        self.fraction = fraction
+        self.checkpoint()
+
+    def publish(self, partial):
+        """
+        A partial(summary) callback for validate_*_chunked: the pages show it while the job runs.
+
+        The running summary keeps changing on the job's thread, so a snapshot of its counts and
+        first PARTIAL_ROWS offending rows is kept instead.
+        """
+        self.partial = partial.snapshot(PARTIAL_ROWS)
+
+    def wait(self, timeout=None):
+        """True once the job has finished, waiting at most timeout seconds."""
+        return self._done.wait(timeout)
+
+    def result(self):
+        """
+        The job's return value, once it has finished.
+
+        Raises:
+            JobCancelled: If it was cancelled; otherwise whatever the job raised.
+        """
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self, work, profile=None):
+        self.started = time.time()
+        self.state = RUNNING
+        try:
+            self.checkpoint()
+            # Stage times of the job's own thread, merged into the page run that waited on it; a
+            # profiler only sees the thread it runs on, so the job is profiled here, not by the page
+            profiler = perf.Profiler(profile) if profile else None
+            with perf.Recorder() as recorder, profiler or nullcontext():
+                self._result = work(self)
+            self.metrics = recorder.snapshot()
+            self.profile = profiler
+            self.state = DONE
+        except JobCancelled as e:
+            self._error = e
+            self.state = CANCELLED
+        except Exception as e:
+            self._error = e
+            self.state = FAILED
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+
+class JobPool:
+    """
+    Jobs by key on a shared thread pool.
+
+    Parameters:
+        workers (int): Jobs running at once.
+        keep (int): Finished jobs kept for reuse, most recently submitted first.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, keep=FINISHED_JOBS):
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='validation-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, key, work, owner=None, profile=None):
+        """
+        The job for key: the queued, running or finished one, or a new one running work(job).
+
+        A cancelled or failed job is replaced, so a retry runs again. owner (e.g. a session)
+        is recorded as waiting on the job until it calls release. profile names a perf.PROFILERS
+        tool to profile a new job with, kept as job.profile.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.cancelled or job.state == FAILED:
+                job = Job(key)
+                self._jobs[key] = job
+                self._executor.submit(job._run, work, profile)
+            self._jobs.move_to_end(key)
+            if owner is not None:
+                job.owners.add(owner)
+            finished = [old for old, other in self._jobs.items() if other.done]
+            for old in finished[:max(len(finished) - self.keep, 0)]:
+                del self._jobs[old]
+        return job
+
+    def release(self, job, owner):
+        """owner no longer waits on job; an unfinished job nobody waits on is cancelled."""
+        with self._lock:
+            job.owners.discard(owner)
+            if not job.owners and not job.done:
+                job.cancel()
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def jobs(self):
+        """Every known job, least recently submitted first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+
+# Module state survives Streamlit reruns, so every session shares one pool
+JOBS = JobPool()
+
+
+def upload_copy(file):
+    """A private handle on an upload's bytes, so a job reads it while the page's own reads move the original."""
+    if isinstance(file, (str, os.PathLike)):
+        return file
+    if hasattr(file, 'getvalue'):
+        return io.BytesIO(file.getvalue())
+    position = file.tell()
+    file.seek(0)
+    data = file.read()
+    file.seek(position)
+    return io.BytesIO(data)
+
+
+def _owner():
+    import streamlit as st
+
+    return st.session_state.setdefault('job_owner', uuid.uuid4().hex)
+
+
+def page_job(name, key, work, partial=None):
+    """
+    Wait for this session's background job on a page, showing its progress and partial results.
+
+    Parameters:
+        name (str): Page key; a session waits on one job per page, and a new key releases the old job.
+        key (tuple): What decides the result, e.g. (page, file digest, settings); sessions share jobs by key.
+        work (callable): work(job) -> result, run when no job for key exists.
+        partial (callable): Optional partial(summary) rendering job.partial while the job runs.
+
+    Returns:
+        The job's result; a failed job raises its exception.
+    """
+    import streamlit as st
+
+    owner = _owner()
+    previous = st.session_state.get(f"{name}_job")
+    if previous is not None and previous.key != key:
+        JOBS.release(previous, owner)
+    profiler = perf.active_profiler()
+    job = JOBS.submit(key, work, owner, profiler.tool if profiler is not None else None)
+    st.session_state[f"{name}_job"] = job
+    if not job.done:
+        bar = st.progress(0.0, text="Queued..." if job.state == QUEUED else "Validating...")
+        shown = st.empty()
+        # A rerun stops this loop (Streamlit raises inside st calls); the job keeps running
+        while not job.wait(POLL_SECONDS):
+            bar.progress(job.fraction, text=f"{job.rows:,} rows processed" if job.rows else "Validating...")
+            if partial is not None and job.partial is not None:
+                with shown.container():
+                    partial(job.partial)
+        bar.empty()
+        shown.empty()
+        recorder = perf.active()
+        if recorder is not None and job.metrics is not None:
+            recorder.merge(job.metrics)
+        if profiler is not None and job.profile is not None:
+            profiler.job = job.profile
+    return job.result()
+
+
+def release_page_job(name):
+    """Release this session's job on a page, e.g. once its file is removed."""
+    import streamlit as st
+
+    job = st.session_state.pop(f"{name}_job", None)
+    if job is not None:
+        JOBS.release(job, _owner())
+
+
+def show_summary(summary):
+    """Counts so far and the first offending rows of a published ValidationSummary snapshot."""
+    import streamlit as st
+
+    st.write(f"{summary.total_rows:,} rows validated so far, {summary.invalid_count:,} invalid.")
+    counts = dict(summary.mismatch_counts)
+    st.write(pd.DataFrame({'Column': list(counts), 'Mismatches': list(counts.values())}))
+    offending = summary.offending_rows
+    if len(offending):
+        st.dataframe(offending.head(PARTIAL_ROWS))
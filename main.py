@@ -1,103 +1,44 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+
+import perf
+from formulas import DEPOSIT_FORMULAS, formulas_markdown
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from cache import CACHE, cached_read_columns, cached_read_header, cached_read_schema, formulas_key
+from jobs import page_job, release_page_job, show_summary, upload_copy
+from pagination import paginate, result_rows
+from report import MismatchReport, report_columns, report_expander
+from schema import DEPOSIT_SCHEMA
+from streaming import CHUNK_ROWS, read_chunks, validate_deposits_chunked
+from validation import DEPOSIT_RECALCULATIONS, ToleranceValidator, discrepancy_magnitude, recalculate_deposits
 
 # Streamlit app title
 st.title('Cryptocurrency Deposit Transaction Validator')
 
 # Step 1: Upload Deposit CSV file
-deposit_file = st.file_uploader("Upload Deposit CSV", type=["csv"])
-
-# Step 2: Define recalculation, validation, and comparison logic for deposit transactions
-def recalculate_and_validate_deposits(df, tolerances=None):
-    results = []
-
-    if tolerances is None:
-        tolerances = {
-            'RC_CLEO.Lit Sell GDR/USD - Reference': 1e-15,
-            'RC_Deposit Amount USD': 1e-10,
-            'RC_GDR Client Receive': 1e-10,
-            'RC_COGs': 1e-10,
-            'RC_Revenue': 1e-10,
-            'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': 1e-10,
-            'RC_Mark up rate 4 - Value - Business risk reserve': 1e-10,
-            'RC_Mark up rate 3 - Value - Crypto to fiat conversion': 1e-10,
-            'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': 1e-10,
-            'RC_Mark up rate 1 - Value - Gold price fluctuation': 1e-10
-        }
-
-    # Define recalculations
-    recalculations = {
-        'RC_CLEO.Lit Sell GDR/USD - Reference': lambda row: row['CLEO.Lit Buy GDR/USD - Reference'] * (100 + row['Total Markup - For Referrence']) / 100,
-        'RC_Deposit Amount USD': lambda row: row['Deposit Amount OC'] * row['CLEO.lit Buy Token/USD Reference'],
-        'RC_GDR Client Receive': lambda row: row['RC_Deposit Amount USD'] / row['RC_CLEO.Lit Sell GDR/USD - Reference'],
-        'RC_COGs': lambda row: row['GDR Client Receive'] * row['CLEO.Lit Buy GDR/USD - Reference'],
-        'RC_Revenue': lambda row: row['GDR Client Receive'] * row['RC_CLEO.Lit Sell GDR/USD - Reference'],
-        'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': lambda row: row['Mark up rate 5 - Transfer transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 4 - Value - Business risk reserve': lambda row: row['Mark up rate 4 - Business risk reserve'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 3 - Value - Crypto to fiat conversion': lambda row: row['Mark up rate 3 - Crypto to fiat conversion'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': lambda row: row['Mark up rate 2 - Withdrawal transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 1 - Value - Gold price fluctuation': lambda row: row['Mark up rate 1 - Gold Price Fluctuation'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs'])
-    }
-
-    # Apply recalculations
-    for col, func in recalculations.items():
-        df[col] = df.apply(func, axis=1)
-
-    for index, row in df.iterrows():
-        status = "Valid"
-        discrepancies = []
-
-        # Example validation logic: deposit amount should be positive
-        if row['Amount Dc'] <= 0:
-            status = "Invalid - Amount should be positive"
-        
-        # Comparison logic with custom tolerance for each recalculated column
-        for col_name in tolerances:
-            if col_name in df.columns:
-                if abs(row[col_name] - row[col_name.replace('RC_', '')]) > tolerances[col_name]:
-                    status = f"Invalid - Discrepancy in {col_name.replace('RC_', '')}"
-                    discrepancies.append({
-                        'Column': col_name.replace('RC_', ''),
-                        'Expected': row[col_name.replace('RC_', '')],
-                        'Actual': row[col_name]
-                    })
-
-        result = {
-            'Transaction ID': row['Transaction ID'], 
-            'Status': status, 
-            'Discrepancies': discrepancies,
-            'RC_CLEO.Lit Sell GDR/USD - Reference': row['RC_CLEO.Lit Sell GDR/USD - Reference'],
-            'CLEO.Lit Sell GDR/USD - Reference': row['CLEO.Lit Sell GDR/USD - Reference'],
-            'RC_Deposit Amount USD': row['RC_Deposit Amount USD'],
-            'Deposit Amount USD': row['Deposit Amount USD'],
-            'RC_GDR Client Receive': row['RC_GDR Client Receive'],
-            'GDR Client Receive': row['GDR Client Receive'],
-            'RC_COGs': row['RC_COGs'],
-            'COGs': row['COGs'],
-            'RC_Revenue': row['RC_Revenue'],
-            'Revenue': row['Revenue'],
-            'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': row['RC_Mark up rate 5 - Value - Transfer transasaction & gas fee'],
-            'Mark up rate 5 - Value - Transfer transasaction & gas fee': row['Mark up rate 5 - Value - Transfer transasaction & gas fee'],
-            'RC_Mark up rate 4 - Value - Business risk reserve': row['RC_Mark up rate 4 - Value - Business risk reserve'],
-            'Mark up rate 4 - Value - Business risk reserve': row['Mark up rate 4 - Value - Business risk reserve'],
-            'RC_Mark up rate 3 - Value - Crypto to fiat conversion': row['RC_Mark up rate 3 - Value - Crypto to fiat conversion'],
-            'Mark up rate 3 - Value - Crypto to fiat conversion': row['Mark up rate 3 - Value - Crypto to fiat conversion'],
-            'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': row['RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee'],
-            'Mark up rate 2 - Value - Withdrawal transasaction & gas fee': row['Mark up rate 2 - Value - Withdrawal transasaction & gas fee'],
-            'RC_Mark up rate 1 - Value - Gold price fluctuation': row['RC_Mark up rate 1 - Value - Gold price fluctuation'],
-            'Mark up rate 1 - Value - Gold price fluctuation': row['Mark up rate 1 - Value - Gold price fluctuation']
-        }
+deposit_file = st.file_uploader("Upload Deposit CSV, Parquet or Feather file", type=INPUT_TYPES)
 
-        results.append(result)
-    
-    return pd.DataFrame(results)
+# Step 2: Recalculation, validation, and comparison logic lives in validation.py
 
 # Step 3: Read and validate the deposit CSV file
 if deposit_file is not None:
+    # Times each stage of this run; the Performance expander below shows the breakdown
+    recorder, profiler = perf.start_page_run('deposit')
     try:
-        deposit_df = pd.read_csv(deposit_file)
+        # Streaming mode validates the file in chunks and keeps only the invalid rows
+        with st.sidebar.expander("Large Files", expanded=False):
+            streaming = st.checkbox("Streaming mode (validate in chunks)", value=False)
+            chunk_rows = st.number_input("Rows per chunk", min_value=1000, value=CHUNK_ROWS, step=10000)
+
+        # Missing columns are reported before any parsing; the file itself is read by a background job
+        digest, header = cached_read_header(deposit_file)
+        DEPOSIT_SCHEMA.check(header)
         st.write("Deposits")
-        st.write(deposit_df.head())
+        st.write(next(read_chunks(deposit_file, 5)))
+        deposit_file.seek(0)
+        # Currency, day and network columns the mismatch report groups by, when the export has them
+        dimensions = report_columns(header)
         
         # Streamlit widgets for tolerance inputs
         with st.sidebar.expander("Set Tolerances", expanded=True):
@@ -114,8 +55,7 @@ if deposit_file is not None:
 
         # Allow user to select additional columns to display
         with st.sidebar.expander("Select Additional Columns to Display", expanded=True):
-            all_columns = deposit_df.columns.tolist()
-            selected_columns = st.multiselect("Additional Columns", all_columns)
+            selected_columns = st.multiselect("Additional Columns", header)
 
         # Define tolerances dictionary based on user inputs
         custom_tolerances = {
@@ -131,17 +71,51 @@ if deposit_file is not None:
             'RC_Mark up rate 1 - Value - Gold price fluctuation': tolerance_rc_mark_up_rate_1
         }
 
-        deposit_results = recalculate_and_validate_deposits(deposit_df, tolerances=custom_tolerances)
+        # Validation runs in the background; a rerun with the same file and settings rejoins it
+        if streaming:
+            summary = page_job('deposit', ('deposit', digest, tuple(custom_tolerances.items()), int(chunk_rows),
+                                           tuple(selected_columns)), lambda job: validate_deposits_chunked(
+                upload_copy(deposit_file), tolerances=custom_tolerances, chunksize=int(chunk_rows),
+                keep_columns=selected_columns,
+                read_csv_kwargs=DEPOSIT_SCHEMA.read_csv_kwargs(selected_columns + list(dimensions.values())),
+                report_columns=dimensions, progress=job.progress, partial=job.publish), show_summary)
+            invalid_count = summary.invalid_count
+            report = summary.report
+        else:
+            # RC_ columns depend only on the file and formulas; a tolerance change reruns just the comparison
+            rc_key = (digest, formulas_key(DEPOSIT_RECALCULATIONS))
+
+            def load(job):
+                # Only the columns the formulas need, parsed once per upload with pinned dtypes
+                _, _, df = cached_read_schema(upload_copy(deposit_file), DEPOSIT_SCHEMA)
+                job.checkpoint()
+                return df, CACHE.get_or_compute(('rc',) + rc_key, lambda: recalculate_deposits(df, checkpoint=job.checkpoint))
+            deposit_df, recalculated = page_job('deposit', ('deposit',) + rc_key, load)
+
+            # Per-session validator; a tolerance change only revisits rows near the old and new thresholds
+            validator_key, validator = st.session_state.get('deposit_validator', (None, None))
+            if validator_key != rc_key:
+                validator = ToleranceValidator(deposit_df, recalculated, (deposit_df['Amount Dc'] <= 0).to_numpy())
+                st.session_state['deposit_validator'] = (rc_key, validator)
+            deposit_results = validator.validate(custom_tolerances)
+            invalid_count = deposit_results.invalid_count
+            # Dimension columns are read as text, as a chunked run reads them
+            report = MismatchReport(list(deposit_results.mismatch_counts()), dimensions)
+            report.add_results(deposit_results, cached_read_columns(deposit_file, digest, list(dimensions.values()),
+                                                                    as_text=True) if dimensions else deposit_df)
         
-        # Display results
+        # Display results; counts come from the results, not from a rendered table
         st.subheader("Validation Results")
-        
-        # Convert discrepancies list to a readable format for display
-        display_results = deposit_results.copy()
-        display_results['Discrepancies'] = display_results['Discrepancies'].apply(lambda x: ', '.join([f"{item['Column']}: Expected {item['Expected']}, Actual {item['Actual']}" for item in x]))
+        mismatch_counts = summary.mismatch_counts if streaming else deposit_results.mismatch_counts()
+        if streaming:
+            st.write(f"Rows processed: {summary.total_rows:,}. Only invalid transactions are kept.")
+        st.write("Mismatch Breakdown:")
+        st.write(pd.DataFrame({'Column': list(mismatch_counts), 'Mismatches': list(mismatch_counts.values())}))
+        if streaming and summary.truncated:
+            st.warning(f"Only the first {summary.max_offending_rows:,} invalid transactions were kept.")
 
         # Include selected additional columns in display
-        display_columns = [
+        display_columns = list(dict.fromkeys([
             'Transaction ID', 'Status', 'Discrepancies',
             'RC_CLEO.Lit Sell GDR/USD - Reference', 'CLEO.Lit Sell GDR/USD - Reference',
             'RC_Deposit Amount USD', 'Deposit Amount USD',
@@ -153,14 +127,42 @@ if deposit_file is not None:
             'RC_Mark up rate 3 - Value - Crypto to fiat conversion', 'Mark up rate 3 - Value - Crypto to fiat conversion',
             'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee', 'Mark up rate 2 - Value - Withdrawal transasaction & gas fee',
             'RC_Mark up rate 1 - Value - Gold price fluctuation', 'Mark up rate 1 - Value - Gold price fluctuation'
-        ] + selected_columns
-
-        display_results = display_results[display_columns]
-
-        st.write(display_results)
+        ] + selected_columns))
+
+        # Rows are filtered and sorted by position; only the current page is built and sent to the browser
+        if streaming:
+            # Offending rows from the chunked run already carry readable discrepancies
+            offending = summary.offending_rows
+            rows = result_rows(np.ones(len(offending), dtype=bool), lambda rows: discrepancy_magnitude(
+                {col: offending[col].to_numpy() for col in custom_tolerances},
+                {col: offending[col.replace('RC_', '')].to_numpy() for col in custom_tolerances}, rows),
+                'deposit', filterable=False)
+
+            def results_frame(rows):
+                return offending.iloc[rows].reset_index(drop=True)[display_columns]
+        else:
+            rows = result_rows(deposit_results.invalid, deposit_results.magnitude, 'deposit')
+
+            def results_frame(rows):
+                frame = deposit_results.to_frame(rows)
+                # Source columns not in the results are read from the upload on demand
+                extra_columns = [col for col in selected_columns if col not in frame.columns]
+                if extra_columns:
+                    extra = cached_read_columns(deposit_file, digest, extra_columns).iloc[rows].reset_index(drop=True)
+                    frame = pd.concat([frame, extra], axis=1)
+                return frame[display_columns]
+
+        with perf.stage(perf.DISPLAY):
+            st.dataframe(results_frame(paginate(rows, 'deposit', "transactions")))
+        export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+        if export_format != "None":
+            # Exports every listed row, in the order shown
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.download_button(f"Download results ({export_format})", frame_to_bytes(results_frame(rows), export_format),
+                               file_name=f"deposit_results.{extension}", mime=mime)
+        report_expander(report, results_frame, 'deposit')
         
         # Check for any invalid transactions
-        invalid_count = (deposit_results['Status'] != 'Valid').sum()
         if invalid_count > 0:
             st.error(f"There are {invalid_count} invalid transactions. Please check details.")
         else:
@@ -168,6 +170,9 @@ if deposit_file is not None:
     
     except Exception as e:
         st.error(f"Error: {e}")
+    perf.performance_expander(recorder, profiler, 'deposit', page='deposit')
+else:
+    release_page_job('deposit')
 
 # Collapsible section for app description
 with st.expander("About This App", expanded=True):
@@ -179,6 +184,8 @@ with st.expander("About This App", expanded=True):
     3. **Tolerances**: Provides options to set tolerances for each recalculated column to account for numerical discrepancies.
     4. **Additional Columns**: Allows users to select additional columns from the CSV to display alongside validation results.
     5. **Recalculation Logic**: Displays the formulas used to recalculate each derived column based on the uploaded data.
+    6. **Streaming Mode**: For very large exports, validates the file in chunks with a progress bar and keeps only the invalid transactions, so memory stays flat.
+    7. **File Formats**: Reads CSV, Parquet and Feather/Arrow files, and exports the results as CSV, Parquet or Feather.
 
     The app ensures transaction validity by checking for discrepancies in recalculated values compared to original data, providing detailed status and discrepancies for each transaction.
 
@@ -187,57 +194,5 @@ with st.expander("About This App", expanded=True):
 
 # Collapsible section for recalculation logic
 with st.expander("Recalculation Logic", expanded=True):
-    st.markdown("""
-    ### Recalculation Formulas
-
-    - **RC_CLEO.Lit Sell GDR/USD - Reference**:
-      ```
-      RC_CLEO.Lit Sell GDR/USD - Reference = CLEO.Lit Buy GDR/USD - Reference * (100 + Total Markup - For Referrence) / 100
-      ```
-
-    - **RC_Deposit Amount USD**:
-      ```
-      RC_Deposit Amount USD = Deposit Amount OC * CLEO.lit Buy Token/USD Reference
-      ```
-
-    - **RC_GDR Client Receive**:
-      ```
-      RC_GDR Client Receive = RC_Deposit Amount USD / RC_CLEO.Lit Sell GDR/USD - Reference
-      ```
-
-    - **RC_COGs**:
-      ```
-      RC_COGs = GDR Client Receive * CLEO.Lit Buy GDR/USD - Reference
-      ```
-
-    - **RC_Revenue**:
-      ```
-      RC_Revenue = GDR Client Receive * RC_CLEO.Lit Sell GDR/USD - Reference
-      ```
-
-    - **RC_Mark up rate 5 - Value - Transfer transasaction & gas fee**:
-      ```
-      RC_Mark up rate 5 - Value - Transfer transasaction & gas fee = Mark up rate 5 - Transfer transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)
-      ```
-
-    - **RC_Mark up rate 4 - Value - Business risk reserve**:
-      ```
-      RC_Mark up rate 4 - Value - Business risk reserve = Mark up rate 4 - Business risk reserve / Total Markup - For Referrence * (Revenue - COGs)
-      ```
-
-    - **RC_Mark up rate 3 - Value - Crypto to fiat conversion**:
-      ```
-      RC_Mark up rate 3 - Value - Crypto to fiat conversion = Mark up rate 3 - Crypto to fiat conversion / Total Markup - For Referrence * (Revenue - COGs)
-      ```
-
-    - **RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee**:
-      ```
-      RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee = Mark up rate 2 - Withdrawal transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)
-      ```
-
-    - **RC_Mark up rate 1 - Value - Gold price fluctuation**:
-      ```
-      RC_Mark up rate 1 - Value - Gold price fluctuation = Mark up rate 1 - Gold Price Fluctuation / Total Markup - For Referrence * (Revenue - COGs)
-      ```
-    """)
+    st.markdown(formulas_markdown(DEPOSIT_FORMULAS))
 
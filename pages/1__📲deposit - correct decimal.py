@@ -1,66 +1,36 @@
 import streamlit as st
 import pandas as pd
-from decimal import Decimal, getcontext, ROUND_DOWN, InvalidOperation
+from decimal import Decimal, getcontext, localcontext
+
+import perf
+from cache import CACHE, cached_read_columns, cached_read_header, cached_read_schema, formulas_key
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from formulas import XAU_BACKUP_DEPOSIT_FORMULAS, formulas_markdown
+from jobs import page_job, release_page_job, upload_copy
+from pagination import paginate, result_rows
+from report import MismatchReport, report_columns, report_expander
+from schema import XAU_BACKUP_DEPOSIT_SCHEMA, MissingColumnsError
+from validation import (XAU_BACKUP_DEPOSIT_RECALCULATIONS, parse_deposits_exact, recalculate_deposits_decimal,
+                        recalculate_deposits_exact, truncation_decimals, validate_recalculated_deposits_decimal,
+                        validate_recalculated_deposits_exact)
 
 # Set the precision level
 getcontext().prec = 18
 
 st.title('Cryptocurrency Deposit Transaction Validator')
 
-# Helper function to truncate numbers
-def truncate(number, decimals=2):
-    factor = Decimal(10) ** -decimals
-    return number.quantize(factor, rounding=ROUND_DOWN)
-
-def recalculate_and_validate_deposits(df, truncations):
-    recalculations = {
-        'RC_CLEO.Lit Sell GDR/USD - Reference': lambda row: truncate(Decimal(row['CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference']) * (Decimal('100') + Decimal(row['Total Markup - For Referrence'])) / Decimal('100'), truncations['RC_CLEO.Lit Sell GDR/USD - Reference']),
-        'RC_Deposit Amount USD': lambda row: truncate(Decimal(row['Deposit Amount OC']) * Decimal(row['CLEO.lit Buy Token/USD Reference']), truncations['RC_Deposit Amount USD']),
-        'RC_GDR Client Receive': lambda row: truncate(Decimal(row['RC_Deposit Amount USD']) / Decimal(row['RC_CLEO.Lit Sell GDR/USD - Reference']), truncations['RC_GDR Client Receive']),
-        'RC_COGs': lambda row: truncate(Decimal(row['GDR Client Receive']) * Decimal(row['CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference']), truncations['RC_COGs']),
-        'RC_Revenue': lambda row: truncate(Decimal(row['GDR Client Receive']) * Decimal(row['RC_CLEO.Lit Sell GDR/USD - Reference']), truncations['RC_Revenue']),
-        'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': lambda row: truncate(Decimal(row['Mark up rate 5 - Transfer transasaction & gas fee']) / Decimal(row['Total Markup - For Referrence']) * (Decimal(row['Revenue']) - Decimal(row['COGs'])), truncations['RC_Mark up rate 5 - Value - Transfer transasaction & gas fee']),
-        'RC_Mark up rate 4 - Value - Business risk reserve': lambda row: truncate(Decimal(row['Mark up rate 4 - Business risk reserve']) / Decimal(row['Total Markup - For Referrence']) * (Decimal(row['Revenue']) - Decimal(row['COGs'])), truncations['RC_Mark up rate 4 - Value - Business risk reserve']),
-        'RC_Mark up rate 3 - Value - Crypto to fiat conversion': lambda row: truncate(Decimal(row['Mark up rate 3 - Crypto to fiat conversion']) / Decimal(row['Total Markup - For Referrence']) * (Decimal(row['Revenue']) - Decimal(row['COGs'])), truncations['RC_Mark up rate 3 - Value - Crypto to fiat conversion']),
-        'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': lambda row: truncate(Decimal(row['Mark up rate 2 - Withdrawal transasaction & gas fee']) / Decimal(row['Total Markup - For Referrence']) * (Decimal(row['Revenue']) - Decimal(row['COGs'])), truncations['RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee']),
-        'RC_Mark up rate 1 - Value - Gold price fluctuation': lambda row: truncate(Decimal(row['Mark up rate 1 - Gold Price Fluctuation']) / Decimal(row['Total Markup - For Referrence']) * (Decimal(row['Revenue']) - Decimal(row['COGs'])), truncations['RC_Mark up rate 1 - Value - Gold price fluctuation'])
-    }
-
-    for col, func in recalculations.items():
-        df[col] = df.apply(func, axis=1)
-
-    results = []
-    for _, row in df.iterrows():
-        status = "Valid" if row['Amount Dc'] > 0 else "Invalid - Amount should be positive"
-        discrepancies = []
-        for col_name, tolerance in truncations.items():
-            original_col = col_name.replace('RC_', '')
-            if abs(Decimal(row[col_name]) - Decimal(row[original_col])) > tolerance:
-                status = f"Invalid - Discrepancy in {original_col}"
-                discrepancies.append({
-                    'Column': original_col,
-                    'Expected': row[col_name],
-                    'Actual': row[original_col]
-                })
-        
-        result = {
-            'Transaction ID': row['Transaction ID'], 
-            'Status': status, 
-            'Discrepancies': discrepancies
-        }
-        for col_name in truncations.keys():
-            original_col = col_name.replace('RC_', '')
-            result[col_name] = row[col_name]
-            result[original_col] = row[original_col]
-        results.append(result)
-    
-    return pd.DataFrame(results)
-
-deposit_file = st.file_uploader("Upload Deposit CSV", type=["csv"])
+deposit_file = st.file_uploader("Upload Deposit CSV, Parquet or Feather file", type=INPUT_TYPES)
 
 if deposit_file:
-    deposit_df = pd.read_csv(deposit_file)
-    st.write("Deposits", deposit_df.head())
+    recorder, profiler = perf.start_page_run('decimal_deposit')
+    # Missing columns are reported before any parsing; the file itself is read by a background job
+    try:
+        digest, header = cached_read_header(deposit_file)
+        XAU_BACKUP_DEPOSIT_SCHEMA.check(header)
+    except MissingColumnsError as e:
+        st.error(str(e))
+        perf.performance_expander(recorder, profiler, 'decimal_deposit', page='decimal_deposit')
+        st.stop()
     
     tolerance_inputs = {
         'RC_CLEO.Lit Sell GDR/USD - Reference': Decimal('0.01'),
@@ -76,33 +46,98 @@ if deposit_file:
     }
 
     with st.sidebar.expander("Set Truncations", expanded=True):
-        truncations = {col: st.number_input(f"Truncate for {col}", min_value=0.0, format="%e", value=val, step=1e-15) 
+        truncations = {col: st.number_input(f"Truncate for {col}", min_value=0.0, format="%e", value=float(val), step=1e-15) 
                       for col, val in tolerance_inputs.items()}
 
-    selected_columns = st.sidebar.multiselect("Additional Columns to Display", deposit_df.columns.tolist())
+    arithmetic = st.sidebar.radio("Arithmetic", ["Fixed-point (fast)", "Decimal (reference)"],
+                                  help="Both give identical results; fixed-point runs as integer array operations.")
+
+    selected_columns = st.sidebar.multiselect("Additional Columns to Display", header)
+
+    if arithmetic == "Fixed-point (fast)":
+        def parsed(df, checkpoint):
+            # Parsed once per upload, for both the recalculation and the comparison
+            return CACHE.get_or_compute(('exact_columns', digest, formulas_key(XAU_BACKUP_DEPOSIT_RECALCULATIONS)),
+                                        lambda: parse_deposits_exact(df, tolerance_inputs, checkpoint=checkpoint))
+
+        def recalculate(df, truncations, checkpoint):
+            return recalculate_deposits_exact(df, truncations, parsed=parsed(df, checkpoint), checkpoint=checkpoint)
 
-    deposit_results = recalculate_and_validate_deposits(deposit_df, truncations)
+        def validate(df, recalculated, truncations, checkpoint):
+            return validate_recalculated_deposits_exact(df, recalculated, truncations, parsed(df, checkpoint))
+    else:
+        recalculate, validate = recalculate_deposits_decimal, validate_recalculated_deposits_decimal
+
+    # Recalculation is keyed by truncation places, the comparison by the truncations themselves
+    places = tuple((col, truncation_decimals(val)) for col, val in truncations.items())
+    rc_key = (arithmetic, digest, formulas_key(XAU_BACKUP_DEPOSIT_RECALCULATIONS), getcontext().prec)
+    precision = getcontext().prec
+
+    def load(job):
+        # Read amounts as text so they are parsed exactly, not through float; parsed once per upload
+        _, _, df = cached_read_schema(upload_copy(deposit_file), XAU_BACKUP_DEPOSIT_SCHEMA, as_text=True)
+        job.checkpoint()
+        # The decimal context is per thread; the job runs at the page's precision
+        with localcontext() as context:
+            context.prec = precision
+            recalculated = CACHE.get_or_compute(('rc',) + rc_key + (places,),
+                                                lambda: recalculate(df, truncations, checkpoint=job.checkpoint))
+            job.checkpoint()
+            return df, CACHE.get_or_compute(('results',) + rc_key + (tuple(truncations.items()),),
+                                            lambda: validate(df, recalculated, truncations,
+                                                             checkpoint=job.checkpoint))
+    deposit_df, deposit_results = page_job('decimal_deposit', ('decimal_deposit',) + rc_key + (
+        tuple(truncations.items()),), load)
+    st.write("Deposits", deposit_df.head())
     
     display_columns = ['Transaction ID', 'Status', 'Discrepancies']
     for col in truncations.keys():
         original_col = col.replace('RC_', '')
         display_columns.extend([original_col, col])
     display_columns.extend(selected_columns)
+    display_columns = list(dict.fromkeys(display_columns))
     
     st.subheader("Validation Results")
-    display_results = deposit_results.copy()
-    display_results['Discrepancies'] = display_results['Discrepancies'].apply(lambda x: ', '.join([f"{item['Column']}: Expected {item['Expected']}, Actual {item['Actual']}" for item in x]))
-    st.write(display_results[display_columns])
+
+    # Only the current page of rows is built and sent to the browser
+    rows = result_rows(deposit_results.invalid, deposit_results.magnitude, 'decimal_deposit')
+
+    def results_frame(rows):
+        frame = deposit_results.to_frame(rows)
+        extra_columns = [col for col in selected_columns if col not in frame.columns]
+        if extra_columns:
+            extra = cached_read_columns(deposit_file, digest, extra_columns, as_text=True).iloc[rows].reset_index(drop=True)
+            frame = pd.concat([frame, extra], axis=1)
+        return frame[display_columns]
+
+    with perf.stage(perf.DISPLAY):
+        st.dataframe(results_frame(paginate(rows, 'decimal_deposit', "transactions")))
+    export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+    if export_format != "None":
+        # Exports every listed row, in the order shown
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(f"Download results ({export_format})", frame_to_bytes(results_frame(rows), export_format),
+                           file_name=f"deposit_results.{extension}", mime=mime)
+
+    # Mismatch rates and discrepancy totals per currency, day and network, when the export has them
+    dimensions = report_columns(header)
+    report = MismatchReport(list(deposit_results.mismatch_counts()), dimensions)
+    report.add_results(deposit_results, cached_read_columns(deposit_file, digest, list(dimensions.values()), as_text=True)
+                       if dimensions else deposit_df)
+    report_expander(report, results_frame, 'decimal_deposit')
     
-    invalid_count = (deposit_results['Status'] != 'Valid').sum()
+    invalid_count = deposit_results.invalid_count
     st.write("Invalid transactions:" if invalid_count else "All transactions are valid.", invalid_count)
+    perf.performance_expander(recorder, profiler, 'decimal_deposit', page='decimal_deposit')
+else:
+    release_page_job('decimal_deposit')
 
 with st.expander("About This App", expanded=True):
     st.markdown("""
     This Streamlit app validates cryptocurrency deposit transactions based on uploaded CSV data. It performs the following steps:
     1. **Upload CSV**: Allows users to upload a CSV file containing deposit transaction data.
     2. **Recalculation and Validation**: Recalculates certain columns based on predefined formulas and compares them against expected values.
-    3. **Truncations**: Provides options to set truncations for each recalculated column to truncate to a specified number of decimal places.
+    3. **Truncations**: Provides options to set truncations for each recalculated column; each value is truncated to the decimal places of its tolerance (0.01 truncates to 2 places).
     4. **Additional Columns**: Allows users to select additional columns from the CSV to display alongside validation results.
     5. **Recalculation Logic**: Displays the formulas used to recalculate each derived column based on the uploaded data.
     The app ensures transaction validity by checking for discrepancies in recalculated values compared to original data, providing detailed status and discrepancies for each transaction.
@@ -110,16 +145,4 @@ with st.expander("About This App", expanded=True):
     """)
 
 with st.expander("Recalculation Logic", expanded=True):
-    st.markdown("""
-    ### Recalculation Formulas
-    - **RC_CLEO.Lit Sell GDR/USD - Reference**: `CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference * (100 + Total Markup - For Referrence) / 100`
-    - **RC_Deposit Amount USD**: `Deposit Amount OC * CLEO.lit Buy Token/USD Reference`
-    - **RC_GDR Client Receive**: `RC_Deposit Amount USD / RC_CLEO.Lit Sell GDR/USD - Reference`
-    - **RC_COGs**: `GDR Client Receive * CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference`
-    - **RC_Revenue**: `GDR Client Receive * RC_CLEO.Lit Sell GDR/USD - Reference`
-    - **RC_Mark up rate 5 - Value - Transfer transasaction & gas fee**: `Mark up rate 5 - Transfer transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 4 - Value - Business risk reserve**: `Mark up rate 4 - Business risk reserve / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 3 - Value - Crypto to fiat conversion**: `Mark up rate 3 - Crypto to fiat conversion / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee**: `Mark up rate 2 - Withdrawal transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 1 - Value - Gold price fluctuation**: `Mark up rate 1 - Gold Price Fluctuation / Total Markup - For Referrence * (Revenue - COGs)`
-    """)
+    st.markdown(formulas_markdown(XAU_BACKUP_DEPOSIT_FORMULAS))
@@ -1,70 +1,31 @@
 import streamlit as st
 import pandas as pd
 
-st.title('Cryptocurrency Deposit Transaction Validator')
-
-# Helper function to truncate numbers
-def truncate(number, tolerance):
-    str_tolerance = f"{tolerance:.15f}".rstrip('0')
-    if '.' in str_tolerance:
-        decimals = len(str_tolerance.split('.')[1])
-    else:
-        decimals = 0
-    factor = 10.0 ** decimals
-    return int(number * factor) / factor
-
-def recalculate_and_validate_deposits(df, tolerances):
-    recalculations = {
-        'RC_CLEO.Lit Sell GDR/USD - Reference': lambda row: row['CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference'] * (100 + row['Total Markup - For Referrence']) / 100,
-        'RC_Deposit Amount USD': lambda row: row['Deposit Amount OC'] * row['CLEO.lit Buy Token/USD Reference'],
-        'RC_GDR Client Receive': lambda row: row['RC_Deposit Amount USD'] / row['RC_CLEO.Lit Sell GDR/USD - Reference'],
-        'RC_COGs': lambda row: row['GDR Client Receive'] * row['CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference'],
-        'RC_Revenue': lambda row: row['GDR Client Receive'] * row['RC_CLEO.Lit Sell GDR/USD - Reference'],
-        'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': lambda row: row['Mark up rate 5 - Transfer transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 4 - Value - Business risk reserve': lambda row: row['Mark up rate 4 - Business risk reserve'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 3 - Value - Crypto to fiat conversion': lambda row: row['Mark up rate 3 - Crypto to fiat conversion'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': lambda row: row['Mark up rate 2 - Withdrawal transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
-        'RC_Mark up rate 1 - Value - Gold price fluctuation': lambda row: row['Mark up rate 1 - Gold Price Fluctuation'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs'])
-    }
-
-    for col, func in recalculations.items():
-        df[col] = df.apply(func, axis=1)
-        tolerance = tolerances.get(col, None)
-        if tolerance is not None:
-            df[col] = df[col].apply(lambda x: truncate(x, tolerance))
+import perf
+from cache import CACHE, cached_read_columns, cached_read_header, cached_read_schema, formulas_key
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from formulas import XAU_BACKUP_DEPOSIT_FORMULAS, formulas_markdown
+from jobs import page_job, release_page_job, upload_copy
+from pagination import paginate, result_rows
+from report import MismatchReport, report_columns, report_expander
+from schema import XAU_BACKUP_DEPOSIT_SCHEMA, MissingColumnsError
+from validation import (XAU_BACKUP_DEPOSIT_RECALCULATIONS, ToleranceValidator, amount_not_positive,
+                        recalculate_deposits_truncated, truncation_places)
 
-    results = []
-    for _, row in df.iterrows():
-        status = "Valid" if row['Amount Dc'] > 0 else "Invalid - Amount should be positive"
-        discrepancies = []
-        for col_name, tolerance in tolerances.items():
-            original_col = col_name.replace('RC_', '')
-            if abs(row[col_name] - row[original_col]) > tolerance:
-                status = f"Invalid - Discrepancy in {original_col}"
-                discrepancies.append({
-                    'Column': original_col,
-                    'Expected': row[col_name],
-                    'Actual': row[original_col]
-                })
-        
-        result = {
-            'Transaction ID': row['Transaction ID'], 
-            'Status': status, 
-            'Discrepancies': discrepancies
-        }
-        for col_name in tolerances.keys():
-            original_col = col_name.replace('RC_', '')
-            result[col_name] = row[col_name]
-            result[original_col] = row[original_col]
-        results.append(result)
-    
-    return pd.DataFrame(results)
+st.title('Cryptocurrency Deposit Transaction Validator')
 
-deposit_file = st.file_uploader("Upload Deposit CSV", type=["csv"])
+deposit_file = st.file_uploader("Upload Deposit CSV, Parquet or Feather file", type=INPUT_TYPES)
 
 if deposit_file:
-    deposit_df = pd.read_csv(deposit_file)
-    st.write("Deposits", deposit_df.head())
+    recorder, profiler = perf.start_page_run('float_deposit')
+    # Missing columns are reported before any parsing; the file itself is read by a background job
+    try:
+        digest, header = cached_read_header(deposit_file)
+        XAU_BACKUP_DEPOSIT_SCHEMA.check(header)
+    except MissingColumnsError as e:
+        st.error(str(e))
+        perf.performance_expander(recorder, profiler, 'float_deposit', page='float_deposit')
+        st.stop()
     
     tolerance_inputs = {
         'RC_CLEO.Lit Sell GDR/USD - Reference': 1e-2,
@@ -83,23 +44,75 @@ if deposit_file:
         tolerances = {col: st.number_input(f"Tolerance for {col}", min_value=0.0, format="%e", value=val, step=1e-15) 
                       for col, val in tolerance_inputs.items()}
 
-    selected_columns = st.sidebar.multiselect("Additional Columns to Display", deposit_df.columns.tolist())
+    selected_columns = st.sidebar.multiselect("Additional Columns to Display", header)
+
+    # Per-session state: RC_ values for the current truncation places and a validator that
+    # patches only the rows whose status a tolerance change can affect
+    places = {col: truncation_places(tolerance) for col, tolerance in tolerances.items()}
+    rc_key = (digest, formulas_key(XAU_BACKUP_DEPOSIT_RECALCULATIONS))
 
-    deposit_results = recalculate_and_validate_deposits(deposit_df, tolerances)
+    def load(job):
+        # Only the columns the formulas need, parsed once per upload; reruns reuse the cached frame
+        _, _, df = cached_read_schema(upload_copy(deposit_file), XAU_BACKUP_DEPOSIT_SCHEMA)
+        job.checkpoint()
+        return df, places, CACHE.get_or_compute(('rc',) + rc_key + (tuple(places.items()),),
+                                                lambda: recalculate_deposits_truncated(df, places, checkpoint=job.checkpoint))
+    # Sessions share the job, so its RC_ values may be at another session's places; they are patched below
+    deposit_df, job_places, job_recalculated = page_job('float_deposit', ('float_deposit',) + rc_key, load)
+    st.write("Deposits", deposit_df.head())
+
+    state_key, state_places, recalculated, validator = st.session_state.get('float_deposit_validator', (None, None, None, None))
+    if state_key != rc_key:
+        state_places, recalculated = job_places, job_recalculated
+        validator = ToleranceValidator(deposit_df, recalculated, amount_not_positive(deposit_df), expected_recalculated=True)
+    if state_places != places:
+        updated = recalculate_deposits_truncated(deposit_df, places, previous=recalculated, previous_places=state_places)
+        validator.update_recalculated({col: values for col, values in updated.items() if values is not recalculated[col]})
+        recalculated = updated
+    st.session_state['float_deposit_validator'] = (rc_key, places, recalculated, validator)
+    deposit_results = validator.validate(tolerances)
     
     display_columns = ['Transaction ID', 'Status', 'Discrepancies']
     for col in tolerances.keys():
         original_col = col.replace('RC_', '')
         display_columns.extend([original_col, col])
     display_columns.extend(selected_columns)
+    display_columns = list(dict.fromkeys(display_columns))
     
     st.subheader("Validation Results")
-    display_results = deposit_results.copy()
-    display_results['Discrepancies'] = display_results['Discrepancies'].apply(lambda x: ', '.join([f"{item['Column']}: Expected {item['Expected']}, Actual {item['Actual']}" for item in x]))
-    st.write(display_results[display_columns])
+
+    # Only the current page of rows is built and sent to the browser
+    rows = result_rows(deposit_results.invalid, deposit_results.magnitude, 'float_deposit')
+
+    def results_frame(rows):
+        frame = deposit_results.to_frame(rows)
+        extra_columns = [col for col in selected_columns if col not in frame.columns]
+        if extra_columns:
+            extra = cached_read_columns(deposit_file, digest, extra_columns).iloc[rows].reset_index(drop=True)
+            frame = pd.concat([frame, extra], axis=1)
+        return frame[display_columns]
+
+    with perf.stage(perf.DISPLAY):
+        st.dataframe(results_frame(paginate(rows, 'float_deposit', "transactions")))
+    export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+    if export_format != "None":
+        # Exports every listed row, in the order shown
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(f"Download results ({export_format})", frame_to_bytes(results_frame(rows), export_format),
+                           file_name=f"deposit_results.{extension}", mime=mime)
+
+    # Mismatch rates and discrepancy totals per currency, day and network, when the export has them
+    dimensions = report_columns(header)
+    report = MismatchReport(list(deposit_results.mismatch_counts()), dimensions)
+    report.add_results(deposit_results, cached_read_columns(deposit_file, digest, list(dimensions.values()), as_text=True)
+                       if dimensions else deposit_df)
+    report_expander(report, results_frame, 'float_deposit')
     
-    invalid_count = (deposit_results['Status'] != 'Valid').sum()
+    invalid_count = deposit_results.invalid_count
     st.write("Invalid transactions:" if invalid_count else "All transactions are valid.", invalid_count)
+    perf.performance_expander(recorder, profiler, 'float_deposit', page='float_deposit')
+else:
+    release_page_job('float_deposit')
 
 with st.expander("About This App", expanded=True):
     st.markdown("""
@@ -114,16 +127,4 @@ with st.expander("About This App", expanded=True):
     """)
 
 with st.expander("Recalculation Logic", expanded=True):
-    st.markdown("""
-    ### Recalculation Formulas
-    - **RC_CLEO.Lit Sell GDR/USD - Reference**: `CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference * (100 + Total Markup - For Referrence) / 100`
-    - **RC_Deposit Amount USD**: `Deposit Amount OC * CLEO.lit Buy Token/USD Reference`
-    - **RC_GDR Client Receive**: `RC_Deposit Amount USD / RC_CLEO.Lit Sell GDR/USD - Reference`
-    - **RC_COGs**: `GDR Client Receive * CLEO.Lit buy X% (backup rate GDR/XAU) XAU/USD - reference`
-    - **RC_Revenue**: `GDR Client Receive * RC_CLEO.Lit Sell GDR/USD - Reference`
-    - **RC_Mark up rate 5 - Value - Transfer transasaction & gas fee**: `Mark up rate 5 - Transfer transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 4 - Value - Business risk reserve**: `Mark up rate 4 - Business risk reserve / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 3 - Value - Crypto to fiat conversion**: `Mark up rate 3 - Crypto to fiat conversion / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee**: `Mark up rate 2 - Withdrawal transasaction & gas fee / Total Markup - For Referrence * (Revenue - COGs)`
-    - **RC_Mark up rate 1 - Value - Gold price fluctuation**: `Mark up rate 1 - Gold Price Fluctuation / Total Markup - For Referrence * (Revenue - COGs)`
-    """)
+    st.markdown(formulas_markdown(XAU_BACKUP_DEPOSIT_FORMULAS))
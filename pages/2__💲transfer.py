@@ -1,52 +1,122 @@
-import streamlit as st
-import pandas as pd
 import numpy as np
+import pandas as pd
+import streamlit as st
 
-def load_csv(file):
-    return pd.read_csv(file)
+import perf
+from cache import cached_read_columns, cached_read_header
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from jobs import page_job, release_page_job, show_summary, upload_copy
+from pagination import paginate, result_rows
+from report import MismatchReport, report_columns, report_expander
+from schema import TRANSFER_SCHEMA, MissingColumnsError
+from streaming import CHUNK_ROWS, TRANSFER_CHECKS, validate_transfers_chunked
+from validation import compare_transfers, recalculate_transfers
 
-def recalculate(df):
-    df['Recalculated Transaction Fee Oc'] = df['Transaction Fee - Rate'].astype(float) * df['Transfer Amount DC'].astype(float)
-    return df
+def load_csv(file, extra_columns=()):
+    # Only the columns the checks need plus the ones picked for display, with pinned dtypes
+    return TRANSFER_SCHEMA.read(file, extra_columns)
 
-def compare_results(df):
-    df['Transaction Fee Oc Matching'] = np.isclose(df['Transaction Fee Oc'].astype(float), 
-                                                   df['Recalculated Transaction Fee Oc'], 
-                                                   rtol=1e-5, atol=1e-8)
-    df['Transaction Fee Oc Difference'] = df['Transaction Fee Oc'].astype(float) - df['Recalculated Transaction Fee Oc']
-    df['Transfer Amount Matching'] = df['Transfer Amount DC'] == df['Destination Amount DC']
-    df['Currency Matching'] = df['Original Currency - OC'] == df['Destination Currency - DC']
-    df['All Matching'] = df['Transaction Fee Oc Matching'] & df['Transfer Amount Matching'] & df['Currency Matching']
-    return df
+def transfer_magnitude(results, rows):
+    # Worst of the fee and amount differences per record, for ranking non-matching records
+    fee = results['Transaction Fee Oc Difference'].to_numpy()[rows]
+    amount = (results['Transfer Amount DC'].to_numpy() - results['Destination Amount DC'].to_numpy())[rows]
+    return np.fmax(np.abs(fee), np.abs(amount))
+
+DEFAULT_COLUMNS = ['Record ID', 
+                   'Transaction Fee Oc', 'Recalculated Transaction Fee Oc', 'Transaction Fee Oc Matching', 'Transaction Fee Oc Difference',
+                   'Transfer Amount DC', 'Destination Amount DC', 'Transfer Amount Matching',
+                   'Original Currency - OC', 'Destination Currency - DC', 'Currency Matching',
+                   'All Matching']
 
 def main():
     st.title("Check Transfer Transaction")  # Updated title here
 
-    uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+    uploaded_file = st.file_uploader("Choose a CSV, Parquet or Feather file", type=INPUT_TYPES)
+    with st.sidebar.expander("Large Files", expanded=False):
+        streaming = st.checkbox("Streaming mode (validate in chunks)", value=False)
+        chunk_rows = st.number_input("Rows per chunk", min_value=1000, value=CHUNK_ROWS, step=10000)
+
     if uploaded_file is not None:
-        df = load_csv(uploaded_file)
-        st.write("Original Data:")
-        st.dataframe(df)
+        recorder, profiler = perf.start_page_run('transfer')
+        # Only the header is read up front, so missing columns are reported before any parsing
+        digest, columns = cached_read_header(uploaded_file)
+        try:
+            TRANSFER_SCHEMA.check(columns)
+        except MissingColumnsError as e:
+            st.error(str(e))
+            perf.performance_expander(recorder, profiler, 'transfer', page='transfer')
+            return
+        # Currency, day and network columns the mismatch report groups by, when the export has them
+        dimensions = report_columns(columns)
+        report_read = [col for col in dimensions.values() if col not in TRANSFER_SCHEMA.columns]
 
-        recalculated_df = recalculate(df)
-        comparison_results = compare_results(recalculated_df)
-        
-        default_columns = ['Record ID', 
-                           'Transaction Fee Oc', 'Recalculated Transaction Fee Oc', 'Transaction Fee Oc Matching', 'Transaction Fee Oc Difference',
-                           'Transfer Amount DC', 'Destination Amount DC', 'Transfer Amount Matching',
-                           'Original Currency - OC', 'Destination Currency - DC', 'Currency Matching',
-                           'All Matching']
-        
+    if uploaded_file is not None and streaming:
+        additional_columns = st.multiselect(
+            "Select additional columns to display in Non-matching Records:",
+            options=[col for col in columns if col not in DEFAULT_COLUMNS],
+            default=[]
+        )
+
+        # Validation runs in the background; a rerun with the same file and columns rejoins it
+        summary = page_job('transfer', ('transfer', digest, int(chunk_rows), tuple(additional_columns)),
+                           lambda job: validate_transfers_chunked(
+                               upload_copy(uploaded_file), chunksize=int(chunk_rows),
+                               read_csv_kwargs=TRANSFER_SCHEMA.read_csv_kwargs(additional_columns + report_read),
+                               report_columns=dimensions, progress=job.progress, partial=job.publish), show_summary)
+
+        st.write(f"Total Records: {summary.total_rows}")
+        st.write(f"Fully Matching Records: {summary.total_rows - summary.invalid_count}")
+        st.write(f"Non-matching Records: {summary.invalid_count}")
+
+        if summary.invalid_count > 0:
+            st.write("Non-matching Records:")
+            if summary.truncated:
+                st.warning(f"Showing the first {summary.max_offending_rows:,} non-matching records.")
+            offending = summary.offending_rows
+            rows = result_rows(np.ones(len(offending), dtype=bool), lambda rows: transfer_magnitude(offending, rows),
+                               'transfer', label="records", filterable=False)
+            display_columns = DEFAULT_COLUMNS + additional_columns
+            with perf.stage(perf.DISPLAY):
+                st.dataframe(offending.iloc[paginate(rows, 'transfer', "records")][display_columns])
+            export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+            if export_format != "None":
+                extension, mime = EXPORT_FORMATS[export_format]
+                st.download_button(f"Download results ({export_format})", frame_to_bytes(offending.iloc[rows][display_columns], export_format),
+                                   file_name=f"transfer_mismatches.{extension}", mime=mime)
+            report_expander(summary.report, lambda rows: offending.iloc[rows][display_columns], 'transfer')
+
+        st.write("Mismatch Breakdown:")
+        for name, count in summary.mismatch_counts.items():
+            st.write(f"{name} Mismatches: {count}")
+
+    elif uploaded_file is not None:
         additional_columns = st.multiselect(
             "Select additional columns to display in Comparison Results:",
-            options=[col for col in df.columns if col not in default_columns],
+            options=[col for col in columns if col not in DEFAULT_COLUMNS],
             default=[]
         )
+
+        # The checks depend only on the file. They read the schema columns with pinned dtypes;
+        # the whole upload is read once more, as is, to show it and the columns picked for display
+        def load(job):
+            original = cached_read_columns(upload_copy(uploaded_file), digest, columns)
+            job.checkpoint()
+            df = load_csv(upload_copy(uploaded_file), report_read)
+            job.checkpoint()
+            return original, compare_transfers(recalculate_transfers(df, job.checkpoint))
+        original, comparison_results = page_job('transfer', ('transfer', digest), load)
+        st.write("Original Data:")
+        st.dataframe(original.iloc[paginate(np.arange(len(original)), 'transfer_data', "records")])
         
-        display_columns = default_columns + additional_columns
-        
-        st.write("Comparison Results:")
-        st.dataframe(comparison_results[display_columns])
+        display_columns = DEFAULT_COLUMNS + additional_columns
+
+        def results_frame(rows):
+            # The listed records, with the picked columns taken from the original upload
+            frame = comparison_results.iloc[rows]
+            extra_columns = [col for col in additional_columns if col not in frame.columns]
+            if extra_columns:
+                frame = pd.concat([frame, original[extra_columns].iloc[rows].set_axis(frame.index)], axis=1)
+            return frame[display_columns]
 
         total_records = len(comparison_results)
         all_matching_records = comparison_results['All Matching'].sum()
@@ -56,14 +126,31 @@ def main():
         st.write(f"Fully Matching Records: {all_matching_records}")
         st.write(f"Non-matching Records: {non_matching_records}")
 
-        if non_matching_records > 0:
-            st.write("Non-matching Records:")
-            st.dataframe(comparison_results[~comparison_results['All Matching']][display_columns])
+        # Non-matching records by default, worst first; only the current page is sent to the browser
+        st.write("Comparison Results:")
+        rows = result_rows(~comparison_results['All Matching'].to_numpy(),
+                           lambda rows: transfer_magnitude(comparison_results, rows), 'transfer', label="records")
+        with perf.stage(perf.DISPLAY):
+            st.dataframe(results_frame(paginate(rows, 'transfer', "records")))
+        export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+        if export_format != "None":
+            # Exports every listed record, in the order shown
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.download_button(f"Download results ({export_format})", frame_to_bytes(results_frame(rows), export_format),
+                               file_name=f"transfer_results.{extension}", mime=mime)
+        report = MismatchReport(TRANSFER_CHECKS, dimensions)
+        report.add_transfers(comparison_results, TRANSFER_CHECKS)
+        report_expander(report, results_frame, 'transfer')
 
         st.write("Mismatch Breakdown:")
         st.write(f"Transaction Fee Oc Mismatches: {total_records - comparison_results['Transaction Fee Oc Matching'].sum()}")
         st.write(f"Transfer Amount Mismatches: {total_records - comparison_results['Transfer Amount Matching'].sum()}")
         st.write(f"Currency Mismatches: {total_records - comparison_results['Currency Matching'].sum()}")
 
+    if uploaded_file is not None:
+        perf.performance_expander(recorder, profiler, 'transfer', page='transfer')
+    else:
+        release_page_job('transfer')
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+import perf
+from cache import CACHE, cached_read_columns, cached_read_header, cached_read_schema, formulas_key
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from formulas import WITHDRAW_FORMULAS, formulas_markdown
+from jobs import page_job, release_page_job, show_summary, upload_copy
+from pagination import paginate, result_rows
+from report import MismatchReport, report_columns, report_expander
+from schema import WITHDRAW_SCHEMA, MissingColumnsError
+from streaming import CHUNK_ROWS, read_chunks, validate_withdrawals_chunked
+from validation import (WITHDRAW_AMOUNT, WITHDRAW_RECALCULATIONS, WITHDRAW_TOLERANCES, ToleranceValidator,
+                        amount_not_positive, discrepancy_magnitude, recalculate_withdrawals)
+
+# Shown next to the results by default when the export has them
+FLOW_COLUMNS = ['Network', 'Token Send', 'Token Receive']
+
+st.title('Cryptocurrency Withdraw Transaction Validator')
+
+withdraw_file = st.file_uploader("Upload Withdraw CSV, Parquet or Feather file", type=INPUT_TYPES)
+
+if withdraw_file:
+    recorder, profiler = perf.start_page_run('withdraw')
+    with st.sidebar.expander("Large Files", expanded=False):
+        streaming = st.checkbox("Streaming mode (validate in chunks)", value=False)
+        chunk_rows = st.number_input("Rows per chunk", min_value=1000, value=CHUNK_ROWS, step=10000)
+
+    # Missing columns are reported before any parsing; the file itself is read by a background job
+    try:
+        digest, header = cached_read_header(withdraw_file)
+        WITHDRAW_SCHEMA.check(header)
+    except MissingColumnsError as e:
+        st.error(str(e))
+        perf.performance_expander(recorder, profiler, 'withdraw', page='withdraw')
+        st.stop()
+    st.write("Withdrawals", next(read_chunks(withdraw_file, 5, **WITHDRAW_SCHEMA.read_csv_kwargs())))
+    withdraw_file.seek(0)
+
+    with st.sidebar.expander("Set Tolerances", expanded=True):
+        tolerances = {col: st.number_input(f"Tolerance for {col}", min_value=0.0, format="%e", value=val, step=1e-15)
+                      for col, val in WITHDRAW_TOLERANCES.items()}
+
+    selected_columns = st.sidebar.multiselect("Additional Columns to Display", header,
+                                              default=[col for col in FLOW_COLUMNS if col in header])
+
+    display_columns = ['Transaction ID', 'Status', 'Discrepancies']
+    for col in tolerances:
+        display_columns.extend([col.replace('RC_', ''), col])
+    display_columns.extend(selected_columns)
+    display_columns = list(dict.fromkeys(display_columns))
+    # Currency, day and network columns the mismatch report groups by, when the export has them
+    dimensions = report_columns(header)
+
+    # Validation runs in the background; a rerun with the same file and settings rejoins it
+    if streaming:
+        summary = page_job('withdraw', ('withdraw', digest, tuple(tolerances.items()), int(chunk_rows),
+                                        tuple(selected_columns)), lambda job: validate_withdrawals_chunked(
+            upload_copy(withdraw_file), tolerances, chunksize=int(chunk_rows), keep_columns=selected_columns,
+            report_columns=dimensions, progress=job.progress, partial=job.publish), show_summary)
+        invalid_count = summary.invalid_count
+        mismatch_counts = summary.mismatch_counts
+        report = summary.report
+    else:
+        # RC_ columns depend only on the file and formulas; a tolerance change reruns just the comparison
+        rc_key = (digest, formulas_key(WITHDRAW_RECALCULATIONS))
+
+        def load(job):
+            # Only the columns the formulas need, parsed once per upload; reruns reuse the cached frame
+            _, _, df = cached_read_schema(upload_copy(withdraw_file), WITHDRAW_SCHEMA)
+            job.checkpoint()
+            return df, CACHE.get_or_compute(('rc',) + rc_key, lambda: recalculate_withdrawals(df, checkpoint=job.checkpoint))
+        withdraw_df, recalculated = page_job('withdraw', ('withdraw',) + rc_key, load)
+        validator_key, validator = st.session_state.get('withdraw_validator', (None, None))
+        if validator_key != rc_key:
+            validator = ToleranceValidator(withdraw_df, recalculated, amount_not_positive(withdraw_df, WITHDRAW_AMOUNT),
+                                           expected_recalculated=True)
+            st.session_state['withdraw_validator'] = (rc_key, validator)
+        withdraw_results = validator.validate(tolerances)
+        invalid_count = withdraw_results.invalid_count
+        mismatch_counts = withdraw_results.mismatch_counts()
+        # Dimension columns are read as text, as a chunked run reads them
+        report = MismatchReport(list(mismatch_counts), dimensions)
+        report.add_results(withdraw_results, cached_read_columns(withdraw_file, digest, list(dimensions.values()),
+                                                                 as_text=True) if dimensions else withdraw_df)
+
+    st.subheader("Validation Results")
+    if streaming:
+        st.write(f"Rows processed: {summary.total_rows:,}. Only invalid transactions are kept.")
+    st.write("Mismatch Breakdown:")
+    st.write(pd.DataFrame({'Column': list(mismatch_counts), 'Mismatches': list(mismatch_counts.values())}))
+    if streaming and summary.truncated:
+        st.warning(f"Only the first {summary.max_offending_rows:,} invalid transactions were kept.")
+
+    # Rows are filtered and sorted by position; only the current page is built and sent to the browser
+    if streaming:
+        offending = summary.offending_rows
+        rows = result_rows(np.ones(len(offending), dtype=bool), lambda rows: discrepancy_magnitude(
+            {col: offending[col].to_numpy() for col in tolerances},
+            {col: offending[col.replace('RC_', '')].to_numpy() for col in tolerances}, rows),
+            'withdraw', filterable=False)
+
+        def results_frame(rows):
+            return offending.iloc[rows].reset_index(drop=True)[display_columns]
+    else:
+        rows = result_rows(withdraw_results.invalid, withdraw_results.magnitude, 'withdraw')
+
+        def results_frame(rows):
+            frame = withdraw_results.to_frame(rows)
+            extra_columns = [col for col in selected_columns if col not in frame.columns]
+            if extra_columns:
+                extra = cached_read_columns(withdraw_file, digest, extra_columns).iloc[rows].reset_index(drop=True)
+                frame = pd.concat([frame, extra], axis=1)
+            return frame[display_columns]
+
+    with perf.stage(perf.DISPLAY):
+        st.dataframe(results_frame(paginate(rows, 'withdraw', "transactions")))
+    export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+    if export_format != "None":
+        # Exports every listed row, in the order shown
+        extension, mime = EXPORT_FORMATS[export_format]
+        st.download_button(f"Download results ({export_format})", frame_to_bytes(results_frame(rows), export_format),
+                           file_name=f"withdraw_results.{extension}", mime=mime)
+    report_expander(report, results_frame, 'withdraw')
+
+    if invalid_count > 0:
+        st.error(f"There are {invalid_count} invalid transactions. Please check details.")
+    else:
+        st.success("All transactions are valid.")
+    perf.performance_expander(recorder, profiler, 'withdraw', page='withdraw')
+else:
+    release_page_job('withdraw')
+
+with st.expander("About This App", expanded=True):
+    st.markdown("""
+    This Streamlit app validates cryptocurrency withdraw transactions: the client sends GDR on a chosen network and receives a token such as USDC.
+    1. **Upload File**: Accepts a withdraw export as CSV, Parquet or Feather.
+    2. **Recalculation and Validation**: Recalculates the USD amount, the transaction and network fees and the amount the client receives, and compares them against the export.
+    3. **Amount Check**: Withdraw Amount OC must be above zero.
+    4. **Tolerances**: Sets an absolute tolerance for each recalculated column.
+    5. **Additional Columns**: Shows further export columns, such as the network and tokens, next to the results.
+    6. **Streaming Mode**: For very large exports, validates the file in chunks and keeps only the invalid transactions.
+    """)
+
+with st.expander("Recalculation Logic", expanded=True):
+    st.markdown(formulas_markdown(WITHDRAW_FORMULAS))
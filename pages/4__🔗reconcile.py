@@ -0,0 +1,106 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+import perf
+from cache import CACHE, cached_read_columns, cached_read_header
+from columnar import EXPORT_FORMATS, INPUT_TYPES, frame_to_bytes
+from pagination import paginate
+from reconcile import RECONCILE_COLUMNS, RECONCILE_LINKS, SHARED_KEYS, reconcile
+
+# Fields read as text (IDs, addresses, timestamps) and as numbers
+TEXT_FIELDS = ['key', 'wallet', 'counterparty', 'time']
+AMOUNT_FIELDS = ['amount', 'counter_amount']
+
+# Amount columns the links compare, per flow
+LINK_AMOUNTS = {name: [] for name in RECONCILE_COLUMNS}
+for flow, col, other, other_col in RECONCILE_LINKS:
+    LINK_AMOUNTS[flow].append(col)
+    LINK_AMOUNTS[other].append(other_col)
+
+st.title('Cross-Flow Reconciliation')
+
+uploads = {name: st.file_uploader(f"Upload {name.capitalize()} CSV, Parquet or Feather file", type=INPUT_TYPES,
+                                  key=f"reconcile_{name}")
+           for name in RECONCILE_COLUMNS}
+uploads = {name: file for name, file in uploads.items() if file}
+
+if uploads:
+    recorder, profiler = perf.start_page_run('reconcile')
+    flows, columns, digests = {}, {}, []
+    for name, file in uploads.items():
+        digest, header = cached_read_header(file)
+        with st.sidebar.expander(f"{name.capitalize()} Columns", expanded=False):
+            mapping = {}
+            for field, default in RECONCILE_COLUMNS[name].items():
+                options = ["None"] + list(header)
+                picked = st.selectbox(field.replace('_', ' ').capitalize(), options, key=f"reconcile_{name}_{field}",
+                                      index=options.index(default) if default in header else 0)
+                mapping[field] = None if picked == "None" else picked
+        columns[name] = mapping
+
+        # Only the mapped columns and the linked amounts are read, each once per upload
+        text = [mapping[f] for f in TEXT_FIELDS if mapping.get(f)]
+        amounts = [mapping[f] for f in AMOUNT_FIELDS if mapping.get(f)]
+        amounts += [col for col in LINK_AMOUNTS[name] if col in header]
+        text, amounts = list(dict.fromkeys(text)), [col for col in dict.fromkeys(amounts) if col not in text]
+        parts = [cached_read_columns(file, digest, cols, as_text=as_text)
+                 for cols, as_text in ((text, True), (amounts, False)) if cols]
+        flows[name] = pd.concat(parts, axis=1) if parts else pd.DataFrame(index=pd.RangeIndex(0))
+        digests.append((name, digest, tuple(mapping.items())))
+
+    tolerance = st.sidebar.number_input("Amount and balance tolerance", min_value=0.0, value=1e-2, format="%e", step=1e-3)
+
+    # Indexes, joins and balances depend only on the files, mappings and tolerance
+    result_key = ('reconcile', tuple(digests), tolerance)
+    result = CACHE.get_or_compute(result_key, lambda: reconcile(flows, columns, tolerance=tolerance))
+    wallets = CACHE.get_or_compute(result_key + ('wallets',), lambda: result.wallet_summary()
+                                   .sort_values('Lowest Balance', kind='stable').reset_index(drop=True))
+
+    st.subheader("Reconciliation Results")
+    counts = result.counts()
+    st.write(pd.DataFrame({'Check': list(counts), 'Count': list(counts.values())}))
+
+    export_format = st.sidebar.selectbox("Export Results As", ["None"] + list(EXPORT_FORMATS))
+    overdrawn_rows = np.flatnonzero(result.ledger['Balance'].to_numpy() < -tolerance)
+    sections = [
+        ("Duplicated Transactions", 'duplicates', len(result.duplicates), lambda rows: result.duplicates.iloc[rows]),
+        ("Orphaned Transactions", 'orphans', len(result.orphans), lambda rows: result.orphans.iloc[rows]),
+        ("Amount Mismatches", 'mismatches', len(result.mismatches), lambda rows: result.mismatches.iloc[rows]),
+        ("Overdrawn Movements", 'overdrawn', len(overdrawn_rows), lambda rows: result.movements(overdrawn_rows[rows])),
+        ("Wallet Balances", 'wallets', len(wallets), lambda rows: wallets.iloc[rows]),
+    ]
+    for title, key, size, frame in sections:
+        st.markdown(f"**{title}** ({size:,})")
+        if size == 0:
+            continue
+        # Only the current page is built and sent to the browser
+        with perf.stage(perf.DISPLAY):
+            st.dataframe(frame(paginate(np.arange(size), f"reconcile_{key}")).reset_index(drop=True))
+        if export_format != "None":
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.download_button(f"Download {title.lower()} ({export_format})",
+                               frame_to_bytes(frame(np.arange(size)).reset_index(drop=True), export_format),
+                               file_name=f"reconcile_{key}.{extension}", mime=mime)
+
+    issues = counts['Duplicated'] + counts['Orphaned'] + counts['Amount mismatches'] + counts['Overdrawn movements']
+    if issues > 0:
+        st.error(f"There are {issues} reconciliation issues. Please check details.")
+    else:
+        st.success("All flows reconcile.")
+    perf.performance_expander(recorder, profiler, 'reconcile', page='reconcile')
+
+with st.expander("About This Page", expanded=True):
+    links = "\n".join(f"    - Every {flow} needs a {other} with the same ID, and its {col} must match {other_col}."
+                      for flow, col, other, other_col in RECONCILE_LINKS)
+    shared = ", ".join(f"{a} and {b}" for a, b in SHARED_KEYS)
+    st.markdown(f"""
+    This Streamlit page reconciles deposit, withdraw and transfer exports against each other.
+    1. **Upload Files**: Accepts any of the three exports as CSV, Parquet or Feather.
+    2. **Column Mapping**: Picks the ID, wallet, amount and time columns of each export; unmapped fields skip the checks needing them.
+    3. **Duplicates**: IDs repeated within an export, or shared between {shared}.
+    4. **Orphans and Mismatches**:
+{links}
+    5. **Running Balances**: Orders every wallet movement by wallet and time and lists the movements after which a balance is below zero.
+    6. **Rows**: Row is the 0-based position of the transaction in its upload.
+    """)
@@ -0,0 +1,66 @@
+import math
+
+import numpy as np
+import streamlit as st
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+SORT_ORDERS = ["Largest discrepancy first", "File order"]
+
+
+def rank_rows(rows, magnitude):
+    """Order row positions by descending magnitude; NaN sorts last and ties keep file order."""
+    return rows[np.argsort(-magnitude, kind='stable')]
+
+
+def result_rows(invalid, magnitude, key, label="transactions", filterable=True):
+    """
+    Render the filter and sort controls of a results table and return the rows to page through.
+
+    Only invalid rows are listed unless the user asks for all of them.
+
+    Parameters:
+        invalid (ndarray): Boolean per row.
+        magnitude (callable): magnitude(rows) -> float per row, called only for the rows listed.
+        key (str): Widget key prefix, unique per table.
+        label (str): What a row is, for the control labels.
+        filterable (bool): False when every row is already invalid, e.g. streaming results.
+
+    Returns:
+        ndarray: Row positions in display order.
+    """
+    left, right = st.columns(2)
+    show_all = filterable and left.checkbox(f"Show valid {label} too", value=False, key=f"{key}_show_all")
+    order = right.selectbox("Sort", SORT_ORDERS, key=f"{key}_sort")
+    rows = np.arange(len(invalid)) if show_all else np.flatnonzero(invalid)
+    if order == SORT_ORDERS[0] and len(rows):
+        rows = rank_rows(rows, magnitude(rows))
+    return rows
+
+
+def paginate(rows, key, label="rows"):
+    """
+    Render page controls for a table and return the row positions on the current page.
+
+    Only the returned rows should be built and sent to the browser, so the cost of a rerun
+    does not grow with the size of the table.
+
+    Parameters:
+        rows (ndarray): Row positions in display order.
+        key (str): Widget key prefix, unique per table.
+        label (str): What a row is, for the caption.
+
+    Returns:
+        ndarray: At most one page of positions from rows.
+    """
+    left, right = st.columns(2)
+    page_size = left.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, math.ceil(len(rows) / page_size))
+    # A filter change can shrink the table below the page the user was on
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = right.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    stop = min(start + page_size, len(rows))
+    st.caption(f"{start + 1 if len(rows) else 0:,}–{stop:,} of {len(rows):,} {label}")
+    return rows[start:stop]
@@ -0,0 +1,448 @@
+"""
+Per-stage wall time and memory of a validation run.
+
+Library code marks its stages with perf.stage(name) or @perf.timed(name); they cost one
+context lookup unless a Recorder is active. A page or batch run activates one Recorder around
+its work and reads the totals back as a table, JSON or Prometheus text.
+"""
+import contextvars
+import cProfile
+import importlib.util
+import io
+import json
+import marshal
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+# Stage names shared by the pages, the CLI and the library
+READ = 'read'
+RECALCULATE = 'recalculate'
+TOLERANCE_INDEX = 'tolerance index'
+COMPARE = 'compare'
+RESULTS_FRAME = 'results frame'
+RECONCILE = 'reconcile'
+STORE = 'store'
+REPORT = 'report'
+DISPLAY = 'display'
+EXPORT = 'export'
+
+PROFILERS = ['cProfile', 'pyinstrument']
+
+_ACTIVE = contextvars.ContextVar('perf_recorder', default=None)
+_PROFILER = contextvars.ContextVar('perf_profiler', default=None)
+
+# Recorders running in this process (sessions, background jobs); RSS is shared by all of them.
+# Weak, so a page run a Streamlit rerun abandons before stop() drops out once collected.
+_RUNNING = weakref.WeakSet()
+_RUNNING_LOCK = threading.Lock()
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read cheaply."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def peak_rss_bytes():
+    """Resident set high-water mark since the last reset_peak_rss (or process start)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the high-water mark (Linux); returns False where the platform cannot.
+
+    The mark belongs to the whole process, so this also resets it for every other reader.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Recorder:
+    """
+    Totals per stage name: calls, wall seconds, peak RSS and the RSS growth above the level
+    the stage started at. Repeated stages (e.g. one read per chunk) add up their time and keep
+    their worst memory.
+
+    RSS figures are process-wide: stages running at the same time in other threads (other
+    sessions, background jobs) count towards them. Where the RSS high-water mark can be reset
+    (Linux) and no other Recorder is running, peaks are exact per stage; otherwise RSS is
+    sampled when stages start and end, and the high-water mark is left alone so overlapping
+    runs do not reset each other's peaks. With trace_python, tracemalloc also reports the
+    Python-level allocation peak per stage; it slows allocation-heavy code noticeably.
+
+    A stage entered while a stage of the same name is open (a timed function calling another)
+    counts once. Time not inside any stage shows as 'other' in frame().
+    """
+
+    def __init__(self, trace_python=False):
+        self.trace_python = trace_python
+        self.stages = {}
+        self.seconds = 0.0
+        self._open = []
+        self._covered = 0.0
+        self._start = None
+        self._token = None
+        self._exact_peaks = False
+        self._started_tracing = False
+
+    def start(self):
+        with _RUNNING_LOCK:
+            _RUNNING.add(self)
+            self._exact_peaks = len(_RUNNING) == 1 and reset_peak_rss()
+        if self.trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _ACTIVE.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._start is None:
+            return self
+        self.seconds += time.perf_counter() - self._start
+        self._start = None
+        with _RUNNING_LOCK:
+            _RUNNING.discard(self)
+        try:
+            _ACTIVE.reset(self._token)
+        except (ValueError, RuntimeError):
+            # Stopped from another context, e.g. after a Streamlit rerun
+            _ACTIVE.set(None)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _checkpoint(self):
+        # Fold the memory peaks since the last checkpoint into every open stage, then reset them
+        with _RUNNING_LOCK:
+            # Once another Recorder has started, the high-water mark may hold its peaks too
+            self._exact_peaks = self._exact_peaks and len(_RUNNING) == 1
+            if self._exact_peaks:
+                peak = peak_rss_bytes()
+                reset_peak_rss()
+        if not self._exact_peaks:
+            peak = rss_bytes() or 0
+        python_peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        for entry in self._open:
+            entry['peak'] = max(entry['peak'], peak)
+            entry['python_peak'] = max(entry['python_peak'], python_peak)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name):
+        if any(entry['name'] == name for entry in self._open):
+            yield
+            return
+        self._checkpoint()
+        # Listed in the order stages are first entered, outer before inner
+        self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_rss_bytes': 0, 'rss_growth_bytes': 0,
+                                      'python_growth_bytes': None})
+        rss = rss_bytes() or 0
+        python = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        entry = {'name': name, 'rss': rss, 'peak': rss, 'python': python, 'python_peak': python}
+        self._open.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._checkpoint()
+            self._open.pop()
+            if not self._open:
+                self._covered += seconds
+            self._add(name, 1, seconds, entry['peak'], entry['peak'] - entry['rss'],
+                      entry['python_peak'] - entry['python'] if tracemalloc.is_tracing() else None)
+
+    def _add(self, name, calls, seconds, peak_rss, rss_growth, python_growth):
+        stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_rss_bytes': 0, 'rss_growth_bytes': 0,
+                                              'python_growth_bytes': None})
+        stats['calls'] += calls
+        stats['seconds'] += seconds
+        stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'], peak_rss)
+        stats['rss_growth_bytes'] = max(stats['rss_growth_bytes'], rss_growth)
+        if python_growth is not None:
+            stats['python_growth_bytes'] = max(stats['python_growth_bytes'] or 0, python_growth)
+
+    def snapshot(self):
+        """Picklable totals, e.g. to return from a worker process and merge into a parent."""
+        return {'stages': {name: dict(stats) for name, stats in self.stages.items()}, 'covered': self._covered}
+
+    def merge(self, snapshot):
+        """Add a snapshot's stages; its time counts as covered, not as run time."""
+        for name, stats in snapshot['stages'].items():
+            self._add(name, stats['calls'], stats['seconds'], stats['peak_rss_bytes'], stats['rss_growth_bytes'],
+                      stats['python_growth_bytes'])
+        self._covered += snapshot['covered']
+        return self
+
+    @property
+    def total_seconds(self):
+        running = time.perf_counter() - self._start if self._start is not None else 0.0
+        return self.seconds + running
+
+    def records(self):
+        """One dict per stage in first-entered order, plus 'other' for time outside every stage."""
+        total = self.total_seconds
+        records = [dict(stats, stage=name) for name, stats in self.stages.items()]
+        if total > self._covered:
+            records.append({'stage': 'other', 'calls': 1, 'seconds': total - self._covered, 'peak_rss_bytes': None,
+                            'rss_growth_bytes': None, 'python_growth_bytes': None})
+        return records
+
+    def frame(self):
+        """Stages as a display table: seconds, share of the run and memory in MiB."""
+        total = self.total_seconds or 1.0
+        mib = 1024 ** 2
+        rows = []
+        for record in self.records():
+            row = {'Stage': record['stage'], 'Calls': record['calls'], 'Seconds': record['seconds'],
+                   'Share': f"{record['seconds'] / total:.0%}",
+                   'Peak RSS MiB': None if record['peak_rss_bytes'] is None else record['peak_rss_bytes'] / mib,
+                   'RSS Growth MiB': None if record['rss_growth_bytes'] is None else record['rss_growth_bytes'] / mib}
+            if self.trace_python:
+                growth = record['python_growth_bytes']
+                row['Python Peak MiB'] = None if growth is None else growth / mib
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def to_json(self, **labels):
+        return json.dumps({'total_seconds': self.total_seconds, 'labels': labels, 'stages': self.records()}, indent=2)
+
+    def to_prometheus(self, prefix='validator', **labels):
+        """Prometheus text exposition format, one sample per stage and metric."""
+        def label_text(stage):
+            pairs = dict(labels, stage=stage) if stage is not None else labels
+            escaped = {key: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                       for key, value in pairs.items()}
+            return '{' + ','.join(f'{key}="{value}"' for key, value in escaped.items()) + '}' if escaped else ''
+
+        metrics = [
+            ('stage_seconds_total', 'counter', 'Wall time spent in each validation stage.', 'seconds'),
+            ('stage_calls_total', 'counter', 'Times each validation stage ran.', 'calls'),
+            ('stage_peak_rss_bytes', 'gauge', 'Peak resident set size during each stage.', 'peak_rss_bytes'),
+            ('stage_rss_growth_bytes', 'gauge', 'Largest RSS growth within one run of each stage.', 'rss_growth_bytes'),
+            ('stage_python_growth_bytes', 'gauge', 'Largest traced Python allocation growth in each stage.',
+             'python_growth_bytes'),
+        ]
+        lines = [f"# HELP {prefix}_run_seconds Wall time of the whole run.", f"# TYPE {prefix}_run_seconds gauge",
+                 f"{prefix}_run_seconds{label_text(None)} {self.total_seconds}"]
+        records = self.records()
+        for name, kind, text, field in metrics:
+            samples = [(record['stage'], record[field]) for record in records if record[field] is not None]
+            if not samples:
+                continue
+            lines += [f"# HELP {prefix}_{name} {text}", f"# TYPE {prefix}_{name} {kind}"]
+            lines += [f"{prefix}_{name}{label_text(stage)} {value}" for stage, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+def active():
+    """The Recorder of the current run, or None."""
+    return _ACTIVE.get()
+
+
+def active_profiler():
+    """The Profiler of the current run, or None."""
+    return _PROFILER.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a stage of the active Recorder; does nothing when none is active."""
+    recorder = _ACTIVE.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.stage(name):
+        yield
+
+
+def timed(name):
+    """Decorator form of stage."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _ACTIVE.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            with recorder.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def available_profilers():
+    """PROFILERS that can be imported here; pyinstrument is optional."""
+    return [tool for tool in PROFILERS if tool == 'cProfile' or importlib.util.find_spec(tool) is not None]
+
+
+class Profiler:
+    """
+    An opt-in profile of one run with cProfile (standard library) or pyinstrument (optional,
+    imported only when chosen).
+
+    Both profile only the thread that started them. Work a page hands to a background job is
+    profiled on the job's thread (jobs.Job.profile) and attached here as job.
+    """
+
+    def __init__(self, tool='cProfile'):
+        if tool not in PROFILERS:
+            raise ValueError(f"Unknown profiler {tool!r}; expected one of {PROFILERS}")
+        self.tool = tool
+        if tool == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler as SamplingProfiler
+            except ImportError as e:
+                raise ImportError("pyinstrument is not installed; install it or profile with cProfile") from e
+            self._profiler = SamplingProfiler()
+        else:
+            self._profiler = cProfile.Profile()
+        self.job = None
+        self._token = None
+
+    def start(self):
+        if self.tool == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        self._token = _PROFILER.set(self)
+        return self
+
+    def stop(self):
+        if self.tool == 'pyinstrument':
+            if self._profiler.is_running:
+                self._profiler.stop()
+        else:
+            self._profiler.disable()
+        if self._token is not None:
+            try:
+                _PROFILER.reset(self._token)
+            except (ValueError, RuntimeError):
+                _PROFILER.set(None)
+            self._token = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def report(self, limit=40):
+        """Plain-text report: the top functions by cumulative time, or pyinstrument's call tree."""
+        if self.tool == 'pyinstrument':
+            return self._profiler.output_text()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def data(self):
+        """
+        The full profile as a file.
+
+        Returns:
+            tuple: (bytes, file extension, MIME type); a .prof loads in pstats or snakeviz,
+                the .html is pyinstrument's interactive report.
+        """
+        if self.tool == 'pyinstrument':
+            return self._profiler.output_html().encode(), 'html', 'text/html'
+        self._profiler.create_stats()
+        return marshal.dumps(self._profiler.stats), 'prof', 'application/octet-stream'
+
+    def dump(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data()[0])
+
+
+def merge_profiles(paths, output):
+    """Combine cProfile dumps (e.g. one per worker process) into one file."""
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(output)
+
+
+def performance_options(key):
+    """
+    Sidebar controls for a page's Performance expander.
+
+    Returns:
+        tuple: (trace_python, profiler tool or None).
+    """
+    import streamlit as st
+
+    with st.sidebar.expander("Performance", expanded=False):
+        trace_python = st.checkbox("Trace Python allocations (slower)", value=False, key=f"{key}_trace_python")
+        tool = st.selectbox("Profile this run", ["Off"] + available_profilers(), key=f"{key}_profiler")
+    return trace_python, None if tool == "Off" else tool
+
+
+def start_page_run(key):
+    """
+    Render the Performance options and start recording (and profiling, if chosen) a page run.
+
+    Returns:
+        tuple: (Recorder, Profiler or None), for performance_expander at the end of the page.
+    """
+    trace_python, tool = performance_options(key)
+    profiler = Profiler(tool).start() if tool else None
+    return Recorder(trace_python).start(), profiler
+
+
+def performance_expander(recorder, profiler=None, key='perf', **labels):
+    """Stop a page run and show its stages, metric downloads and profile in a collapsed expander."""
+    import streamlit as st
+
+    recorder.stop()
+    if profiler is not None:
+        profiler.stop()
+    with st.expander("Performance", expanded=False):
+        st.caption(f"Run took {recorder.total_seconds:.3f} s. Cached steps do not appear.")
+        st.dataframe(recorder.frame())
+        st.download_button("Metrics (JSON)", recorder.to_json(**labels), file_name=f"{key}_metrics.json",
+                           mime='application/json', key=f"{key}_metrics_json")
+        st.download_button("Metrics (Prometheus)", recorder.to_prometheus(**labels), file_name=f"{key}_metrics.prom",
+                           mime='text/plain', key=f"{key}_metrics_prom")
+        if profiler is not None:
+            # The validation ran on a job's thread; the page's own thread only waited for it
+            if profiler.job is not None:
+                profiler = profiler.job
+                st.caption("Profile of the background validation job.")
+            data, extension, mime = profiler.data()
+            st.download_button(f"Profile ({profiler.tool})", data, file_name=f"{key}_profile.{extension}", mime=mime,
+                               key=f"{key}_profile")
+            st.text(profiler.report())
@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+
+import perf
+
+# Export columns each flow is reconciled on; the reconciliation page lets users map others.
+# amount is what the flow credits (deposit) or debits (withdraw, transfer source) in GDR;
+# a transfer also credits counter_amount to its counterparty wallet.
+RECONCILE_COLUMNS = {
+    'deposit': {'key': 'Transaction ID', 'wallet': 'Wallet Address', 'amount': 'GDR Client Receive',
+                'time': 'Created At'},
+    'withdraw': {'key': 'Transaction ID', 'wallet': 'Wallet Address', 'amount': 'Withdraw Amount OC',
+                 'time': 'Created At'},
+    'transfer': {'key': 'Record ID', 'wallet': 'Source Wallet Address', 'amount': 'Transfer Amount DC',
+                 'counterparty': 'Destination Wallet Address', 'counter_amount': 'Destination Amount DC',
+                 'time': 'Created At'},
+}
+
+# Ledger direction per flow: +1 credits the wallet, -1 debits it
+FLOW_SIGNS = {'deposit': 1, 'withdraw': -1, 'transfer': -1}
+
+# (flow, amount column, other flow, other amount column): every row of flow must have a row with
+# the same key in other flow, and the two amounts must agree. A transfer lands as a deposit.
+RECONCILE_LINKS = [
+    ('transfer', 'Destination Amount DC', 'deposit', 'Deposit Amount OC'),
+]
+
+# Flows that share one ID namespace, so the same key in both is a collision
+SHARED_KEYS = [('deposit', 'withdraw')]
+
+
+def key_index(keys):
+    """
+    One hash index over the keys of several flows, so equal IDs get equal codes in every flow.
+
+    Parameters:
+        keys (dict): Flow -> array of keys. Missing keys (None/NaN) get code -1.
+
+    Returns:
+        tuple: (flow -> int64 code array, number of distinct keys, distinct keys).
+    """
+    names = list(keys)
+    codes, uniques = pd.factorize(np.concatenate([np.asarray(keys[name], dtype=object) for name in names]))
+    bounds = np.cumsum([0] + [len(keys[name]) for name in names])
+    return {name: codes[bounds[i]:bounds[i + 1]] for i, name in enumerate(names)}, len(uniques), uniques
+
+
+def _column(df, mapping, field):
+    # The mapped column for a field, or None when unmapped or not in this export
+    col = mapping.get(field)
+    return col if col and col in df.columns else None
+
+
+def _counts(codes, n):
+    return np.bincount(codes[codes >= 0], minlength=n)
+
+
+def _first_position(codes, n):
+    # Row of the first occurrence of each key code, -1 where the key does not occur
+    position = np.full(n, -1, dtype=np.int64)
+    present = np.flatnonzero(codes >= 0)[::-1]
+    position[codes[present]] = present
+    return position
+
+
+def _as_float(values):
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+
+def _as_time(values):
+    # Nanoseconds since the epoch; unparseable or missing times sort first
+    times = pd.to_datetime(pd.Series(values), errors='coerce', utc=True, format='ISO8601')
+    return np.where(times.isna(), np.iinfo(np.int64).min, times.to_numpy(dtype='datetime64[ns]').view(np.int64))
+
+
+def ledger_entries(flows, columns):
+    """
+    Every wallet movement of the given flows as one table: a row per deposit and withdrawal,
+    and two per transfer (source debit, counterparty credit).
+
+    Returns:
+        DataFrame: Wallet and Flow (categorical), Row, Key, Time (int64 ns), Amount (signed).
+    """
+    legs = []
+    for name, df in flows.items():
+        mapping = columns[name]
+        field = {f: _column(df, mapping, f) for f in ['key', 'wallet', 'amount', 'counterparty', 'counter_amount', 'time']}
+        if not field['wallet'] or not field['amount']:
+            continue
+        time = _as_time(df[field['time']]) if field['time'] else np.zeros(len(df), dtype=np.int64)
+        key = df[field['key']].to_numpy(dtype=object) if field['key'] else np.full(len(df), None, dtype=object)
+        sides = [(field['wallet'], field['amount'], FLOW_SIGNS[name])]
+        if field['counterparty'] and field['counter_amount']:
+            sides.append((field['counterparty'], field['counter_amount'], 1))
+        for wallet, amount, sign in sides:
+            legs.append((name, df[wallet].to_numpy(dtype=object), key, time, sign * _as_float(df[amount])))
+
+    names = list(dict.fromkeys(leg[0] for leg in legs))
+    # Wallets are factorized once for all flows, so grouping and sorting work on integer codes
+    wallet_codes, wallets = pd.factorize(np.concatenate([leg[1] for leg in legs]) if legs else np.array([], dtype=object))
+    flow_codes = np.concatenate([np.full(len(leg[2]), names.index(leg[0]), dtype=np.int8) for leg in legs]) if legs else []
+    return pd.DataFrame({
+        'Wallet': pd.Categorical.from_codes(wallet_codes, wallets),
+        'Flow': pd.Categorical.from_codes(flow_codes, names),
+        'Row': np.concatenate([np.arange(len(leg[2])) for leg in legs]) if legs else np.array([], dtype=np.int64),
+        'Key': np.concatenate([leg[2] for leg in legs]) if legs else np.array([], dtype=object),
+        'Time': np.concatenate([leg[3] for leg in legs]) if legs else np.array([], dtype=np.int64),
+        'Amount': np.concatenate([leg[4] for leg in legs]) if legs else np.array([], dtype=float),
+    })
+
+
+def running_balances(entries):
+    """
+    Per-wallet running balances by a sorted group-wise cumulative sum.
+
+    Entries are ordered by wallet, then time, then credits before debits at the same time, then
+    input order (the sort is stable); each wallet's amounts are summed within the wallet only,
+    so the size of other wallets' balances never costs precision.
+
+    Returns:
+        DataFrame: entries in that order, with a Balance column after each movement.
+    """
+    wallet_codes = entries['Wallet'].cat.codes.to_numpy()
+    order = np.lexsort((entries['Amount'].to_numpy() < 0, entries['Time'].to_numpy(), wallet_codes))
+    ordered = entries.take(order).reset_index(drop=True)
+    ordered['Balance'] = ordered['Amount'].groupby(wallet_codes[order], sort=False).cumsum().to_numpy()
+    return ordered
+
+
+class Reconciliation:
+    """
+    Outcome of reconcile: issue tables, each with one row per offending transaction, and the
+    ordered ledger with running balances.
+
+    Attributes:
+        duplicates (DataFrame): Flow, Row, Key, Occurrences, Reason.
+        orphans (DataFrame): Flow, Row, Key, Missing In.
+        mismatches (DataFrame): Key, Flow, Row, Amount, Other Flow, Other Row, Other Amount, Difference.
+        ledger (DataFrame): running_balances of every wallet movement.
+        tolerance (float): Amount differences and negative balances up to this are accepted.
+    """
+
+    def __init__(self, duplicates, orphans, mismatches, ledger, tolerance):
+        self.duplicates = duplicates
+        self.orphans = orphans
+        self.mismatches = mismatches
+        self.ledger = ledger
+        self.tolerance = tolerance
+
+    @property
+    def overdrawn(self):
+        """Ledger movements after which the wallet's balance is below zero."""
+        return self.ledger[self.ledger['Balance'] < -self.tolerance]
+
+    def wallet_summary(self):
+        """Per wallet: movements, credits, debits, final and lowest balance."""
+        grouped = self.ledger.groupby('Wallet', sort=False, observed=True)
+        amount = self.ledger['Amount']
+        return pd.DataFrame({
+            'Entries': grouped.size(),
+            'Credits': amount.clip(lower=0).groupby(self.ledger['Wallet'], sort=False, observed=True).sum(),
+            'Debits': -amount.clip(upper=0).groupby(self.ledger['Wallet'], sort=False, observed=True).sum(),
+            'Balance': grouped['Balance'].last(),
+            'Lowest Balance': grouped['Balance'].min(),
+        }).reset_index()
+
+    def movements(self, rows):
+        """Ledger rows at the given positions, with Time as timestamps, for display."""
+        frame = self.ledger.iloc[rows].reset_index(drop=True)
+        time = frame['Time'].to_numpy()
+        frame['Time'] = pd.to_datetime(np.where(time == np.iinfo(np.int64).min, np.datetime64('NaT'),
+                                                time.astype('datetime64[ns]')), utc=True)
+        return frame
+
+    def counts(self):
+        return {
+            'Duplicated': len(self.duplicates),
+            'Orphaned': len(self.orphans),
+            'Amount mismatches': len(self.mismatches),
+            'Overdrawn movements': len(self.overdrawn),
+            'Wallets': len(self.ledger['Wallet'].cat.categories),
+        }
+
+    @property
+    def nbytes(self):
+        frames = [self.duplicates, self.orphans, self.mismatches, self.ledger]
+        return int(sum(frame.memory_usage(index=True, deep=False).sum() for frame in frames))
+
+
+@perf.timed(perf.RECONCILE)
+def reconcile(flows, columns=None, links=RECONCILE_LINKS, shared_keys=SHARED_KEYS, tolerance=1e-2):
+    """
+    Reconcile several exports against each other.
+
+    Keys of every flow go through one hash index (key_index), so duplicates, anti-joins and
+    amount comparisons are array lookups on integer codes rather than row-by-row VLOOKUPs.
+
+    Parameters:
+        flows (dict): Flow name ('deposit', 'withdraw', 'transfer') -> DataFrame. Any subset.
+        columns (dict): Flow -> column mapping as in RECONCILE_COLUMNS; a mapping entry that is
+            None or absent skips the checks needing it.
+        links (list): (flow, amount column, other flow, other amount column) requirements.
+        shared_keys (list): Pairs of flows whose keys must not collide.
+        tolerance (float): Accepted amount difference and negative balance.
+
+    Returns:
+        Reconciliation
+    """
+    columns = columns or RECONCILE_COLUMNS
+    keyed = {name: df[_column(df, columns[name], 'key')].to_numpy() for name, df in flows.items()
+             if _column(df, columns[name], 'key')}
+    codes, n, _ = key_index(keyed) if keyed else ({}, 0, None)
+    counts = {name: _counts(flow_codes, n) for name, flow_codes in codes.items()}
+
+    duplicates = []
+    for name, flow_codes in codes.items():
+        occurrences = counts[name][np.maximum(flow_codes, 0)]
+        rows = np.flatnonzero((flow_codes >= 0) & (occurrences > 1))
+        duplicates.append(pd.DataFrame({'Flow': name, 'Row': rows, 'Key': keyed[name][rows],
+                                        'Occurrences': occurrences[rows], 'Reason': f"repeated in {name}"}))
+    for name, other in shared_keys:
+        if name in codes and other in codes:
+            for flow, partner in ((name, other), (other, name)):
+                flow_codes = codes[flow]
+                rows = np.flatnonzero((flow_codes >= 0) & (counts[partner][np.maximum(flow_codes, 0)] > 0))
+                duplicates.append(pd.DataFrame({'Flow': flow, 'Row': rows, 'Key': keyed[flow][rows],
+                                                'Occurrences': counts[partner][flow_codes[rows]] + counts[flow][flow_codes[rows]],
+                                                'Reason': f"also in {partner}"}))
+
+    orphans, mismatches = [], []
+    for name, amount_col, other, other_amount_col in links:
+        if name not in codes or other not in codes:
+            continue
+        position = _first_position(codes[other], n)[np.maximum(codes[name], 0)]
+        position[codes[name] < 0] = -1
+        rows = np.flatnonzero(position < 0)
+        orphans.append(pd.DataFrame({'Flow': name, 'Row': rows, 'Key': keyed[name][rows], 'Missing In': other}))
+
+        if amount_col in flows[name] and other_amount_col in flows[other]:
+            matched = np.flatnonzero(position >= 0)
+            amount = _as_float(flows[name][amount_col])[matched]
+            other_amount = _as_float(flows[other][other_amount_col])[position[matched]]
+            difference = amount - other_amount
+            bad = ~(np.abs(difference) <= tolerance)
+            mismatches.append(pd.DataFrame({
+                'Key': keyed[name][matched[bad]], 'Flow': name, 'Row': matched[bad], 'Amount': amount[bad],
+                'Other Flow': other, 'Other Row': position[matched[bad]], 'Other Amount': other_amount[bad],
+                'Difference': difference[bad],
+            }))
+
+    def combine(frames, names):
+        frames = [frame for frame in frames if len(frame)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=names)
+
+    return Reconciliation(
+        combine(duplicates, ['Flow', 'Row', 'Key', 'Occurrences', 'Reason']),
+        combine(orphans, ['Flow', 'Row', 'Key', 'Missing In']),
+        combine(mismatches, ['Key', 'Flow', 'Row', 'Amount', 'Other Flow', 'Other Row', 'Other Amount', 'Difference']),
+        running_balances(ledger_entries(flows, columns)),
+        tolerance)
@@ -0,0 +1,266 @@
+"""
+Mismatch reports: rows, mismatch rates and discrepancy totals per currency, day and network.
+
+A report is built during validation in one vectorized pass per chunk. Every dimension is
+turned into categorical codes, the codes are combined into one group id per row, and the
+measures are summed per group with bincount; beyond the row count only invalid rows take part.
+The per-group partials of chunks, shards and files merge by adding them up. Each invalid row's
+group is kept too, so drilling down from a group to its offending rows is a lookup in an index
+built once, not a rescan of the export.
+
+Dimensions are the export columns in REPORT_DIMENSIONS that an export has; Day is the date
+part of the timestamp, as the export writes it. Each checked column (e.g. the five markup
+components) gets its own mismatch count and discrepancy total. USD Discrepancy is the total of
+the transaction type's USD amount (USD_AMOUNTS) alone: the other USD checks overlap it and each
+other (every markup is a share of Revenue - COGs), so adding them up would count one bad cell
+several times.
+"""
+import numpy as np
+import pandas as pd
+
+import perf
+
+# Report label -> export column; a dimension is used when the export has its column
+REPORT_DIMENSIONS = {
+    'Currency': 'Original Currency - OC',
+    'Day': 'Created At',
+    'Network': 'Network',
+}
+DAY = 'Day'
+
+# The checked USD amount of each transaction type, behind the USD Discrepancy total
+USD_AMOUNTS = ['Deposit Amount USD', 'Withdraw Amount USD']
+
+MISSING = '(missing)'
+TOTAL = 'All'
+
+
+def report_columns(header, dimensions=None):
+    """The dimensions whose column is in header, as label -> column."""
+    dimensions = REPORT_DIMENSIONS if dimensions is None else dimensions
+    return {label: col for label, col in dimensions.items() if col in header}
+
+
+def _categories(values):
+    # Codes and labels of one key column; missing values share one label
+    codes, uniques = pd.factorize(values)
+    labels = np.array([str(value) for value in uniques], dtype=object)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = np.append(labels, MISSING)
+    return codes, labels
+
+
+def _day_categories(values):
+    # The date as the export writes it (ISO 8601 text or timestamps); only distinct dates are parsed
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        codes, uniques = pd.factorize(values.dt.floor('D'))
+        dates = pd.Series(uniques)
+    else:
+        codes, uniques = pd.factorize(values.str[:10])
+        dates = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce', format='ISO8601')
+    # Missing and unparseable dates share one label
+    labels = np.append(dates.dt.strftime('%Y-%m-%d').fillna(MISSING).to_numpy(dtype=object), MISSING)
+    relabel, labels = pd.factorize(labels)
+    return relabel[codes], np.asarray(labels, dtype=object)
+
+
+def _sum(a, b):
+    levels = list(range(a.index.nlevels)) if a.index.nlevels > 1 else 0
+    total = pd.concat([a, b]).groupby(level=levels, sort=False).sum()
+    total.index.names = a.index.names
+    return total
+
+
+class MismatchReport:
+    """
+    Per-group partial sums of a validation, mergeable across chunks, shards and files.
+
+    Parameters:
+        checks (list): Checked column names (original, non RC_), in the order of the mismatch matrix.
+        dimensions (dict): Report label -> export column to group by, e.g. from report_columns.
+    """
+
+    def __init__(self, checks, dimensions=()):
+        self.checks = list(checks)
+        self.dimensions = dict(dimensions)
+        self.partials = None
+        self._offending = []
+        self._entries = None
+        self._indices = {}
+
+    @property
+    def labels(self):
+        return list(self.dimensions)
+
+    @perf.timed(perf.REPORT)
+    def add(self, frame, invalid, mismatch, differences, row_ids=None):
+        """
+        Fold in one chunk.
+
+        Parameters:
+            frame (DataFrame): The chunk's rows, carrying the dimension columns.
+            invalid (ndarray): Boolean per row.
+            mismatch (ndarray): Boolean matrix, rows x checks.
+            differences (callable): differences(j, rows) -> absolute discrepancy of check j at rows.
+            row_ids (ndarray): Drill-down id per invalid row, -1 for none; their row positions by default.
+        """
+        group = np.zeros(len(invalid), dtype=np.int64)
+        sizes, names = [], []
+        for label, col in self.dimensions.items():
+            codes, labels = (_day_categories if label == DAY else _categories)(frame[col])
+            group = group * len(labels) + codes
+            sizes.append(len(labels))
+            names.append(labels)
+        group, uniques = pd.factorize(group)
+        # Decode the combined codes back into one label per dimension
+        keys = []
+        for size, labels in zip(reversed(sizes), reversed(names)):
+            keys.insert(0, labels[uniques % size])
+            uniques = uniques // size
+        count = len(uniques)
+        if len(keys) > 1:
+            index = pd.MultiIndex.from_arrays(keys, names=self.labels)
+        else:
+            index = pd.Index(keys[0] if keys else [TOTAL] * count, name=self.labels[0] if keys else None)
+
+        positions = np.flatnonzero(invalid)
+        data = {'Rows': np.bincount(group, minlength=count),
+                'Invalid': np.bincount(group[positions], minlength=count)}
+        for j, check in enumerate(self.checks):
+            rows = positions[mismatch[positions, j]]
+            data[f"{check} Mismatches"] = np.bincount(group[rows], minlength=count)
+            data[f"{check} Discrepancy"] = np.bincount(group[rows], weights=np.nan_to_num(differences(j, rows)),
+                                                       minlength=count)
+        partial = pd.DataFrame(data, index=index)
+        self.partials = partial if self.partials is None else _sum(self.partials, partial)
+
+        entries = {label: labels[group[positions]] for label, labels in zip(self.labels, keys)}
+        entries['Row'] = positions if row_ids is None else np.asarray(row_ids)
+        self._offending.append(pd.DataFrame(entries))
+        self._entries = None
+        self._indices.clear()
+
+    def add_results(self, results, frame, row_ids=None):
+        """Fold in a ValidationResults; frame holds the dimension columns of the same rows."""
+        self.add(frame, results.invalid, results.mismatch,
+                 lambda j, rows: results.difference(results.columns[j], rows), row_ids)
+
+    def add_transfers(self, comparison, checks, row_ids=None):
+        """Fold in a compare_transfers frame; checks maps each check to its Matching column."""
+        fee = comparison['Transaction Fee Oc Difference'].to_numpy()
+        amount = comparison['Transfer Amount DC'].to_numpy() - comparison['Destination Amount DC'].to_numpy()
+        gaps = {'Transaction Fee Oc': fee, 'Transfer Amount': amount}
+        names = list(checks)
+
+        def differences(j, rows):
+            gap = gaps.get(names[j])
+            return np.zeros(len(rows)) if gap is None else np.abs(gap[rows])
+
+        mismatch = np.column_stack([~comparison[col].to_numpy(dtype=bool) for col in checks.values()])
+        self.add(comparison, ~comparison['All Matching'].to_numpy(dtype=bool), mismatch, differences, row_ids)
+
+    def merge(self, other, offset=0, limit=None):
+        """
+        Fold in another report (e.g. of a later shard) with the same checks and dimensions.
+
+        Its drill-down ids are shifted by offset; ids from limit on are dropped, as rows past
+        a summary's cap are not kept.
+        """
+        if other.partials is None:
+            return self
+        self.partials = other.partials.copy() if self.partials is None else _sum(self.partials, other.partials)
+        for entries in other._offending:
+            ids = entries['Row'].to_numpy()
+            ids = np.where(ids >= 0, ids + offset, -1)
+            if limit is not None:
+                ids[ids >= limit] = -1
+            self._offending.append(entries.assign(Row=ids))
+        self._entries = None
+        self._indices.clear()
+        return self
+
+    def table(self, by=None):
+        """
+        The report rolled up to the given dimensions (all by default; none gives one total row).
+
+        Returns:
+            DataFrame: One row per group: its keys, Rows, Invalid, Mismatch Rate, USD Discrepancy
+                (when a USD_AMOUNTS column is checked), then Mismatches and Discrepancy per check.
+        """
+        by = self.labels if by is None else list(by)
+        partials = self.partials if self.partials is not None else self._empty()
+        if by:
+            totals = partials.groupby(level=by, sort=True).sum()
+        else:
+            totals = partials.groupby(np.zeros(len(partials), dtype=int)).sum().reindex([0], fill_value=0)
+            totals.index = pd.Index([TOTAL], name='Group')
+        totals.insert(2, 'Mismatch Rate', totals['Invalid'] / totals['Rows'])
+        usd = [f"{check} Discrepancy" for check in self.checks if check in USD_AMOUNTS]
+        if usd:
+            totals.insert(3, 'USD Discrepancy', totals[usd[0]])
+        return totals.reset_index()
+
+    def _empty(self):
+        # Partials of a report nothing was added to, e.g. of an export without rows
+        columns = {'Rows': 0, 'Invalid': 0}
+        for check in self.checks:
+            columns[f"{check} Mismatches"] = 0
+            columns[f"{check} Discrepancy"] = 0.0
+        if len(self.labels) > 1:
+            index = pd.MultiIndex.from_arrays([[]] * len(self.labels), names=self.labels)
+        else:
+            index = pd.Index([], name=self.labels[0] if self.labels else None)
+        return pd.DataFrame({col: pd.Series(dtype=type(value)) for col, value in columns.items()}, index=index)
+
+    def rows(self, key=None, by=None):
+        """
+        Drill-down ids of the offending rows in one group of table(by).
+
+        Parameters:
+            key (tuple): The group's labels, one per dimension in by; ignored when by is empty.
+            by (list): Dimensions of the table the group comes from; all by default.
+
+        Returns:
+            ndarray: Row positions (or the ids given to add), in validation order.
+        """
+        by = self.labels if by is None else list(by)
+        if self._entries is None:
+            self._entries = pd.concat(self._offending, ignore_index=True) if self._offending else pd.DataFrame({'Row': []})
+        ids = self._entries['Row'].to_numpy(dtype=np.int64)
+        if by:
+            index = self._indices.get(tuple(by))
+            if index is None:
+                # One pass over the invalid rows, reused for every group of this table
+                index = {key if isinstance(key, tuple) else (key,): positions
+                         for key, positions in self._entries.groupby(by, sort=False).indices.items()}
+                self._indices[tuple(by)] = index
+            ids = ids[index.get(tuple(key), np.array([], dtype=np.int64))]
+        return ids[ids >= 0]
+
+
+def report_expander(report, results_frame, key):
+    """
+    Show a report in a collapsed expander: the breakdown by the chosen dimensions, a CSV
+    download, and the offending rows of one group through results_frame(rows).
+    """
+    import streamlit as st
+
+    from pagination import paginate
+
+    with st.expander("Mismatch Report", expanded=False):
+        by = st.multiselect("Group by", report.labels, default=report.labels, key=f"{key}_report_by")
+        with perf.stage(perf.REPORT):
+            table = report.table(by)
+        st.dataframe(table)
+        st.download_button("Report (CSV)", table.to_csv(index=False), file_name=f"{key}_report.csv", mime='text/csv',
+                           key=f"{key}_report_csv")
+        failing = table[table['Invalid'] > 0] if len(table) else table
+        if by and len(failing):
+            groups = list(failing[by].astype(str).itertuples(index=False, name=None))
+            group = st.selectbox("Offending rows of", range(len(groups)), format_func=lambda i: ' / '.join(groups[i]),
+                                 key=f"{key}_report_group")
+            rows = report.rows(groups[group], by)
+            with perf.stage(perf.DISPLAY):
+                st.dataframe(results_frame(paginate(rows, f"{key}_report", "transactions")))
@@ -0,0 +1,79 @@
+from decimal import Context, Decimal, ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP
+
+import numpy as np
+
+# Rounding modes round_places supports, named as in the decimal module
+ROUNDING_MODES = [ROUND_DOWN, ROUND_HALF_UP, ROUND_HALF_EVEN]
+
+# Largest places whose scale 10 ** places (and twice it) is an exact float
+MAX_PLACES = 22
+
+# Below this scaled magnitude a float's rounding interval is narrower than a tenth of the grid
+# step, so a grid point or tie that converts to the float is also its shortest decimal form
+_EXACT_LIMIT = 2.0 ** 48
+
+# Enough digits to quantize any finite float to MAX_PLACES
+_CONTEXT = Context(prec=400)
+
+
+def round_places(values, places, rounding=ROUND_DOWN):
+    """
+    Round every value to a number of decimal places, as Decimal would round its shortest text.
+
+    Each value is rounded like Decimal(repr(x)).quantize(Decimal(10) ** -places, rounding), so
+    0.29 truncates to 0.29 even though 0.29 * 100 is 28.999999999999996 in float.
+
+    Only a boundary (a grid point for ROUND_DOWN, a tie for the HALF modes) next to the scaled
+    value can be crossed by float error. If the boundary converts to exactly the value, the
+    value's decimal form is the boundary; otherwise it lies on the same side of the boundary as
+    the value. Both are decided with a few array operations per call. Values too large for
+    that (|x| * 10 ** places of 2 ** 48 or more) are rounded through Decimal.
+
+    Parameters:
+        values (ndarray): Floats; NaN and infinities are returned unchanged.
+        places (int): Decimal places to keep, 0 to MAX_PLACES.
+        rounding (str): One of ROUNDING_MODES.
+
+    Returns:
+        ndarray: Rounded float64 values.
+    """
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unsupported rounding mode {rounding!r}; expected one of {ROUNDING_MODES}")
+    if not 0 <= places <= MAX_PLACES:
+        raise ValueError(f"places must be between 0 and {MAX_PLACES}, got {places}")
+    values = np.asarray(values, dtype=float)
+
+    scale = 10.0 ** places
+    # Values too large to scale overflow to inf and are rounded through Decimal below
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = values * scale
+        if rounding == ROUND_DOWN:
+            nearest = np.rint(scaled)
+            boundary = nearest / scale
+            # Toward zero from just above or just below the nearest grid point
+            above = np.where(nearest >= 0, nearest, nearest + 1)
+            below = np.where(nearest > 0, nearest - 1, nearest)
+            rounded = np.where(values == boundary, nearest, np.where(values > boundary, above, below))
+        else:
+            doubled = np.rint(2 * scaled)
+            tie = np.abs(doubled) % 2 == 1
+            boundary = doubled / (2 * scale)
+            away = (np.abs(doubled) + 1) / 2
+            if rounding == ROUND_HALF_UP:
+                tied = away
+            else:
+                toward = away - 1
+                tied = np.where(toward % 2 == 0, toward, away)
+            tied = np.copysign(tied, doubled)
+            off_tie = np.where(values > boundary, doubled + 1, doubled - 1) / 2
+            rounded = np.where(tie, np.where(values == boundary, tied, off_tie), doubled / 2)
+        # Rounding never changes sign, so zeros keep the sign Decimal gives them
+        result = np.copysign(rounded, values) / scale
+        fallback = np.isfinite(values) & ~(np.abs(scaled) < _EXACT_LIMIT)
+
+    rows = np.flatnonzero(fallback)
+    if len(rows):
+        quantum = Decimal(1).scaleb(-places)
+        result[rows] = [float(Decimal(repr(x)).quantize(quantum, rounding=rounding, context=_CONTEXT))
+                        for x in values[rows].tolist()]
+    return result
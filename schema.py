@@ -0,0 +1,193 @@
+import difflib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+import perf
+from columnar import columnar_header, file_format, read_columnar_table
+from formulas import (DEPOSIT_FORMULAS, TRANSFER_FORMULAS, WITHDRAW_FORMULAS, XAU_BACKUP_DEPOSIT_FORMULAS,
+                      CompiledFormulas)
+
+FLOAT = 'float64'
+CATEGORY = 'category'
+
+# Arrow types the pyarrow reader converts to while parsing; pd.read_csv(engine='pyarrow') would
+# infer first and cast afterwards, which loses digits of text columns (e.g. '1.50' -> '1.5')
+_ARROW_TYPES = {
+    FLOAT: pa.float64(),
+    CATEGORY: pa.dictionary(pa.int32(), pa.string()),
+    str: pa.string(),
+}
+
+
+class MissingColumnsError(ValueError):
+    """An input's header lacks columns a schema requires; the message names close matches that were found."""
+
+    def __init__(self, schema_name, missing, header, source=None):
+        self.missing = list(missing)
+        items = []
+        for col in self.missing:
+            close = difflib.get_close_matches(col, header, n=1, cutoff=0.8)
+            items.append(f"'{col}'" + (f" (found '{close[0]}')" if close else ""))
+        name = f"{schema_name} file {source}" if source else f"{schema_name} file"
+        super().__init__(f"{name} is missing required columns: {', '.join(items)}")
+
+
+def read_header(source):
+    """Column names of a CSV, Parquet or Arrow path or file object. A file object is returned to its position."""
+    if file_format(source) != 'csv':
+        return columnar_header(source)
+    if isinstance(source, (str, os.PathLike)):
+        return pd.read_csv(source, nrows=0).columns.tolist()
+    position = source.tell()
+    source.seek(0)
+    header = pd.read_csv(source, nrows=0).columns.tolist()
+    source.seek(position)
+    return header
+
+
+def cast_columns(table, dtypes):
+    """Cast the columns of an Arrow table that dtypes names (FLOAT, CATEGORY or str) to those types."""
+    for col, dtype in dtypes.items():
+        i = table.schema.get_field_index(col)
+        if i >= 0 and table.schema.types[i] != _ARROW_TYPES[dtype]:
+            table = table.set_column(i, col, table.column(i).cast(_ARROW_TYPES[dtype]))
+    return table
+
+
+def read_arrow(source, columns, dtypes=None):
+    """
+    Read only the given columns of a CSV (with pyarrow's multithreaded parser), Parquet or
+    Arrow file. Columnar files are not parsed at all; their columns are cast where dtypes asks.
+
+    Parameters:
+        source (str or file): Path or file object; a file object is read from the start.
+        columns (list): Columns to read, returned in file order.
+        dtypes (dict): Column -> FLOAT, CATEGORY or str; other columns are inferred.
+
+    Returns:
+        DataFrame: Empty fields are missing values (NaN in numeric columns, None in text ones).
+    """
+    dtypes = dtypes or {}
+    if file_format(source) == 'csv':
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        options = pa_csv.ConvertOptions(include_columns=list(columns), strings_can_be_null=True,
+                                        column_types={col: _ARROW_TYPES[dtype] for col, dtype in dtypes.items()})
+        table = pa_csv.read_csv(source, convert_options=options)
+    else:
+        table = cast_columns(read_columnar_table(source, columns), dtypes)
+    df = table.to_pandas()
+    header = read_header(source)
+    return df[[col for col in header if col in df.columns]]
+
+
+@perf.timed(perf.READ)
+def read_columns(source, columns, as_text=False):
+    """Read only the given columns of an input file, as inferred types or as text."""
+    return read_arrow(source, columns, dict.fromkeys(columns, str) if as_text else None)
+
+
+class Schema:
+    """
+    The columns one transaction type's validation reads, and the dtype each is parsed as.
+
+    Pinning dtypes skips pandas' type inference, and reading only these columns (plus any
+    the user asks to display) skips the rest of a wide export. Categorical columns share
+    one set of categories, so they compare directly (e.g. source and destination currency).
+
+    Parameters:
+        name (str): Transaction type, used in error messages.
+        dtypes (dict): Column -> FLOAT, CATEGORY or str.
+    """
+
+    def __init__(self, name, dtypes):
+        self.name = name
+        self.dtypes = dict(dtypes)
+
+    @property
+    def columns(self):
+        return list(self.dtypes)
+
+    def missing(self, header):
+        return [col for col in self.dtypes if col not in header]
+
+    def check(self, header, source=None):
+        """Raise MissingColumnsError unless every schema column is in header; source names the file."""
+        missing = self.missing(header)
+        if missing:
+            raise MissingColumnsError(self.name, missing, list(header), source)
+
+    def _usecols(self, extra_columns):
+        return list(dict.fromkeys(self.columns + list(extra_columns)))
+
+    def read_csv_kwargs(self, extra_columns=(), as_text=False):
+        """
+        pd.read_csv options for chunked reads (the pyarrow engine cannot read in chunks).
+
+        Floats are parsed round-trip exact, as the pyarrow reader does, so a chunked run and a
+        whole-file read see the same values. Categoricals are read as text, since categories
+        inferred per chunk would not line up.
+        """
+        if as_text:
+            return {'usecols': self._usecols(extra_columns), 'dtype': str}
+        dtypes = {col: str if dtype == CATEGORY else dtype for col, dtype in self.dtypes.items()}
+        return {'usecols': self._usecols(extra_columns), 'dtype': dtypes, 'float_precision': 'round_trip'}
+
+    @perf.timed(perf.READ)
+    def read(self, source, extra_columns=(), as_text=False):
+        """
+        Read the schema columns plus extra_columns from a CSV, Parquet or Arrow file.
+
+        Parameters:
+            source (str or file): Path or file object.
+            extra_columns (list): Further columns to read with inferred dtypes.
+            as_text (bool): Read every column as str, for exact decimal parsing.
+
+        Returns:
+            DataFrame: Columns in file order.
+
+        Raises:
+            MissingColumnsError: Before any parsing, if a schema column is absent.
+        """
+        self.check(read_header(source))
+        usecols = self._usecols(extra_columns)
+        df = read_arrow(source, usecols, dict.fromkeys(usecols, str) if as_text else self.dtypes)
+
+        categorical = [col for col, dtype in self.dtypes.items() if dtype == CATEGORY]
+        if categorical and not as_text:
+            categories = pd.api.types.union_categoricals([df[col] for col in categorical], sort_categories=True).categories
+            for col in categorical:
+                df[col] = df[col].cat.set_categories(categories)
+        return df
+
+
+def recalculation_schema(name, formulas, amount_column):
+    """Schema for a formula registry: ID, amount, every formula input and every checked column."""
+    dtypes = {'Transaction ID': str, amount_column: FLOAT}
+    dtypes.update(dict.fromkeys(CompiledFormulas(formulas).inputs, FLOAT))
+    dtypes.update(dict.fromkeys((col.replace('RC_', '') for col in formulas), FLOAT))
+    return Schema(name, dtypes)
+
+
+def deposit_schema(formulas, name='Deposit'):
+    """Schema for a deposit formula registry, whose amount check reads Amount Dc."""
+    return recalculation_schema(name, formulas, 'Amount Dc')
+
+
+# main.py (GDR/USD rate) and the deposit pages (XAU backup rate)
+DEPOSIT_SCHEMA = deposit_schema(DEPOSIT_FORMULAS)
+XAU_BACKUP_DEPOSIT_SCHEMA = deposit_schema(XAU_BACKUP_DEPOSIT_FORMULAS)
+
+WITHDRAW_SCHEMA = recalculation_schema('Withdraw', WITHDRAW_FORMULAS, 'Withdraw Amount OC')
+
+TRANSFER_SCHEMA = Schema('Transfer', {
+    'Record ID': str,
+    **dict.fromkeys(CompiledFormulas(TRANSFER_FORMULAS).inputs, FLOAT),
+    'Transaction Fee Oc': FLOAT,
+    'Destination Amount DC': FLOAT,
+    'Original Currency - OC': CATEGORY,
+    'Destination Currency - DC': CATEGORY
+})
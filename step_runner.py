@@ -0,0 +1,328 @@
+"""
+Event-driven runner for the testGen step lists (stepDicts in testGen.ipynb).
+
+Instead of sleeping a fixed sleepTime after every step, the runner polls the screen for the
+template the step needs and acts as soon as it appears. Polls start every POLL_INTERVAL and
+back off up to MAX_POLL_INTERVAL while the screen stays unchanged. A step that does not
+appear within its timeout is retried (re-clicking the previous button when it is still on
+screen, since that click was likely lost) and then fails with StepTimeout. Every step
+leaves a latency record; run_many runs generated transactions back to back.
+
+Steps are the notebook's dicts. One action key each:
+    {"clickImage": "IMGtemplate/wd1-withdraw.png"}  wait for the template, then click its centre
+    {"wait": "IMGtemplate/wd2-popup.png"}           wait for the template
+    {"type": "usdc"}                                type text
+    {"transactionValue": ...}                       type the transaction's value
+    {"scrolldown": -300}                            scroll
+plus optional "timeout" (seconds), "retries" and "settle" (seconds to pause after acting).
+"sleepTime" is ignored. A type, transactionValue or scrolldown step right after a click waits
+for the screen to change first (at most CHANGE_TIMEOUT, or its "timeout"), since typing
+before the clicked field reacts loses keys.
+
+The screen is any object with grab(); the input device any object with click(position),
+type(text) and scroll(clicks). DesktopScreen drives the real desktop through pyautogui
+(imported on first use); ReplayScreen replays recorded frames headlessly.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from template_matcher import TemplateMatcher, load_image, template_name, to_gray
+
+# Seconds
+STEP_TIMEOUT = 10.0
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+POLL_BACKOFF = 1.5
+STEP_RETRIES = 1
+
+# An input step after a click first waits up to CHANGE_TIMEOUT for the screen to change, so
+# keys are not typed before the UI reacts; a change is CHANGED_PIXELS pixels moving by more
+# than CHANGE_LEVEL gray levels
+CHANGE_TIMEOUT = 2.0
+CHANGE_LEVEL = 16
+CHANGED_PIXELS = 20
+
+# Polls look for a button only at the page's current zoom, except every FULL_SEARCH_EVERY-th
+# poll and the last one, which try every scale
+FULL_SEARCH_EVERY = 4
+
+ACTIONS = ['clickImage', 'wait', 'type', 'transactionValue', 'scrolldown']
+
+
+class StepTimeout(RuntimeError):
+    """A step's template did not appear within its timeout, after every retry."""
+
+    def __init__(self, transaction, step, template, seconds):
+        self.transaction = transaction
+        self.step = step
+        self.template = template
+        super().__init__(f"Transaction {transaction}, step {step}: {template} did not appear within {seconds:.1f} s")
+
+
+def step_action(step):
+    """The action key of a step dict."""
+    actions = [key for key in ACTIONS if key in step]
+    if len(actions) != 1:
+        raise ValueError(f"A step needs exactly one of {ACTIONS}, got {step}")
+    return actions[0]
+
+
+class DesktopScreen:
+    """The real screen, mouse and keyboard, through pyautogui."""
+
+    def __init__(self):
+        try:
+            import pyautogui
+        except ImportError as e:
+            raise ImportError("pyautogui is not installed; install it to drive the desktop") from e
+        self._pyautogui = pyautogui
+
+    def grab(self):
+        return self._pyautogui.screenshot()
+
+    def click(self, position):
+        self._pyautogui.click(position)
+
+    def type(self, text):
+        self._pyautogui.typewrite(text)
+
+    def scroll(self, clicks):
+        self._pyautogui.scroll(clicks)
+
+
+class ReplayScreen:
+    """
+    A recorded frame sequence standing in for the screen and input devices, for headless runs.
+
+    Every click, type or scroll moves to the next frame once `latency` seconds have passed,
+    like a UI responding to input; after the last frame it starts over, so a recording of
+    one transaction replays any number of them. Actions are kept in `actions`.
+
+    Parameters:
+        frames (list): Frames as arrays or image paths.
+        latency (float or list): Seconds before each frame appears, per action or for all.
+        clock (callable): Monotonic time source.
+    """
+
+    def __init__(self, frames, latency=0.2, clock=time.monotonic):
+        self.frames = [load_image(frame) if isinstance(frame, str) else frame for frame in frames]
+        self.latency = latency
+        self.clock = clock
+        self.actions = []
+        self._shown = 0
+        self._next = None
+
+    @classmethod
+    def from_directory(cls, directory, latency=0.2, clock=time.monotonic):
+        """Frames are the directory's PNGs in name order; timeline.json, if any, lists per-action latencies."""
+        names = sorted(name for name in os.listdir(directory) if name.lower().endswith('.png'))
+        timeline = os.path.join(directory, 'timeline.json')
+        if os.path.exists(timeline):
+            with open(timeline) as f:
+                latency = json.load(f)
+        return cls([os.path.join(directory, name) for name in names], latency, clock)
+
+    def grab(self):
+        if self._next is not None and self.clock() >= self._next[1]:
+            self._shown, self._next = self._next[0], None
+        return self.frames[self._shown]
+
+    def _advance(self, action):
+        self.actions.append(action)
+        current = self._next[0] if self._next is not None else self._shown
+        latency = self.latency[current % len(self.latency)] if isinstance(self.latency, list) else self.latency
+        self._next = ((current + 1) % len(self.frames), self.clock() + latency)
+
+    def click(self, position):
+        self._advance(('click', tuple(position)))
+
+    def type(self, text):
+        self._advance(('type', text))
+
+    def scroll(self, clicks):
+        self._advance(('scroll', clicks))
+
+
+class StepRunner:
+    """
+    Run a step list against a screen, waiting on templates instead of fixed sleeps.
+
+    Parameters:
+        steps (list): Step dicts, as in the notebook.
+        matcher (TemplateMatcher): Finds the templates; defaults to one over IMGtemplate.
+        screen: Source of frames and input device; defaults to DesktopScreen().
+        timeout (float): Seconds a step waits for its template unless it sets "timeout".
+        retries (int): Extra attempts per step unless it sets "retries".
+        log (str): Optional JSON Lines file receiving every step record as it finishes.
+        clock, sleep (callable): Time source and sleep, replaceable for tests.
+    """
+
+    def __init__(self, steps, matcher=None, screen=None, timeout=STEP_TIMEOUT, retries=STEP_RETRIES, log=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        for step in steps:
+            step_action(step)
+        self.steps = steps
+        self.matcher = matcher or TemplateMatcher()
+        self.screen = screen or DesktopScreen()
+        self.timeout = timeout
+        self.retries = retries
+        self.log = log
+        self.clock = clock
+        self.sleep = sleep
+        self.records = []
+        self.frame = None
+
+    def wait_for(self, template, timeout):
+        """
+        Poll until template is on screen, backing off while it is not.
+
+        Returns:
+            tuple: (Match or None on timeout, number of frames grabbed).
+        """
+        deadline = self.clock() + timeout
+        interval, polls, last = POLL_INTERVAL, 0, False
+        while True:
+            polls += 1
+            full = last or polls % FULL_SEARCH_EVERY == 0
+            # Kept as the screen a following click acts on
+            self.frame = self.screen.grab()
+            match = self.matcher.locate(template, self.frame, scales=None if full else [self.matcher.zoom])
+            if match is not None:
+                return match, polls
+            if last:
+                return None, polls
+            remaining = deadline - self.clock()
+            # The last poll before the deadline tries every scale
+            last = remaining <= interval
+            if remaining > 0:
+                self.sleep(min(interval, remaining))
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+
+    def wait_for_change(self, before, timeout):
+        """
+        Poll until the screen differs from `before`, backing off while it does not.
+
+        Returns:
+            tuple: (True if it changed, False on timeout, number of frames grabbed).
+        """
+        before = to_gray(before).astype(np.int16)
+        deadline = self.clock() + timeout
+        interval, polls = POLL_INTERVAL, 0
+        while True:
+            polls += 1
+            difference = np.abs(to_gray(self.screen.grab()) - before)
+            if np.count_nonzero(difference > CHANGE_LEVEL) >= CHANGED_PIXELS:
+                return True, polls
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return False, polls
+            self.sleep(min(interval, remaining))
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+
+    def run(self, value=None, transaction=0):
+        """
+        Run every step once; value is typed by transactionValue steps.
+
+        Returns:
+            list: This transaction's step records, also appended to self.records.
+
+        Raises:
+            StepTimeout: When a step's template never appears.
+        """
+        # clicked is the frame a click acted on, until the screen is seen to react
+        first, previous_click, clicked = len(self.records), None, None
+        for index, step in enumerate(self.steps):
+            action = step_action(step)
+            record = {'transaction': transaction, 'step': index, 'action': action, 'template': None,
+                      'wait_seconds': 0.0, 'act_seconds': 0.0, 'polls': 0, 'attempts': 1, 'confidence': None,
+                      'position': None, 'status': 'ok'}
+            start = self.clock()
+            match = None
+            if action in ('clickImage', 'wait'):
+                template = step[action]
+                record['template'] = template_name(template)
+                timeout = step.get('timeout', self.timeout)
+                for attempt in range(1, step.get('retries', self.retries) + 2):
+                    record['attempts'] = attempt
+                    match, polls = self.wait_for(template, timeout)
+                    record['polls'] += polls
+                    if match is not None:
+                        break
+                    # The previous button still on screen means its click was lost
+                    lost = previous_click and self.matcher.locate(previous_click, self.screen.grab())
+                    if lost:
+                        self.screen.click(lost.center)
+                record['wait_seconds'] = self.clock() - start
+                if match is None:
+                    record['status'] = 'timeout'
+                    self._record(record)
+                    raise StepTimeout(transaction, index, template, record['wait_seconds'])
+                record['confidence'] = match.confidence
+                record['position'] = match.center
+                clicked = None
+            elif clicked is not None:
+                changed, record['polls'] = self.wait_for_change(clicked, step.get('timeout', CHANGE_TIMEOUT))
+                record['wait_seconds'] = self.clock() - start
+                record['status'] = 'ok' if changed else 'unchanged'
+                clicked = None
+
+            acted = self.clock()
+            if action == 'clickImage':
+                self.screen.click(match.center)
+                previous_click, clicked = step[action], self.frame
+            elif action == 'type':
+                self.screen.type(step['type'])
+            elif action == 'transactionValue':
+                self.screen.type(str(value))
+            elif action == 'scrolldown':
+                self.screen.scroll(step['scrolldown'])
+            if step.get('settle'):
+                self.sleep(step['settle'])
+            record['act_seconds'] = self.clock() - acted
+            self._record(record)
+        return self.records[first:]
+
+    def run_many(self, values, keep_going=False):
+        """
+        Run one transaction per value, back to back.
+
+        Parameters:
+            values (iterable): Transaction values, e.g. the notebook's random amounts.
+            keep_going (bool): Log a timed-out transaction and continue instead of raising.
+
+        Returns:
+            list: Every step record, in order.
+        """
+        first = len(self.records)
+        for transaction, value in enumerate(values):
+            try:
+                self.run(value, transaction)
+            except StepTimeout:
+                if not keep_going:
+                    raise
+                # A failed transaction can leave any screen up; search the whole frame again
+                self.matcher.forget()
+        return self.records[first:]
+
+    def _record(self, record):
+        self.records.append(record)
+        if self.log:
+            with open(self.log, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+def latency_frame(records):
+    """Per-step latency summary of step records: count, median, p95 and max wait, and timeouts."""
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    grouped = df.groupby(['step', 'action'], sort=True, dropna=False)
+    summary = grouped['wait_seconds'].agg(['count', 'median', lambda s: s.quantile(0.95), 'max'])
+    summary.columns = ['Runs', 'Median Wait s', 'P95 Wait s', 'Max Wait s']
+    summary['Template'] = grouped['template'].first()
+    summary['Timeouts'] = grouped['status'].agg(lambda s: int((s == 'timeout').sum()))
+    return summary.reset_index()
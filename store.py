@@ -0,0 +1,338 @@
+"""
+On-disk store of deposit validation outcomes, so cumulative exports only validate their delta.
+
+Every row is keyed by a 64-bit hash of its content under a version that hashes the engine,
+the formulas and the tolerances. A CSV row is keyed by its line text (salted with the header),
+so rows already in the store are never parsed; Parquet and Arrow rows by their values. Each
+chunk looks up only its own keys, in batches of primary-key probes, so a run's memory and
+time follow the export, not the store's history. Only rows that are new or changed are parsed and recalculated,
+plus rows that failed before (so their discrepancies and values can be shown again); rows
+stored as valid are only counted. New rows are written with the run that first saw them,
+which answers "when did this transaction first fail" without rescanning old exports.
+
+A change to any column of a row, or to the file's column layout, counts as a new row.
+Changing a formula or a tolerance starts a new version, and the first run under it validates
+everything again. CSV fields must not contain embedded newlines. The store is one SQLite
+file (stdlib sqlite3); one run writes at a time.
+
+Usage:
+    python store.py validated.sqlite                  list runs
+    python store.py validated.sqlite TX-000123        history of one transaction
+"""
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import perf
+from columnar import file_format
+from formulas import DEPOSIT_FORMULAS
+from streaming import CHUNK_ROWS, MAX_OFFENDING_ROWS, ValidationSummary, read_chunks, source_size
+from validation import DEFAULT_TOLERANCES, VALID, recalculate_and_validate_deposits
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version_id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    version_id INTEGER NOT NULL REFERENCES versions (version_id),
+    started TEXT NOT NULL,
+    source TEXT,
+    total_rows INTEGER,
+    new_rows INTEGER,
+    recalculated_rows INTEGER,
+    invalid_count INTEGER,
+    seconds REAL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    version_id INTEGER NOT NULL,
+    row_key INTEGER NOT NULL,
+    transaction_id TEXT,
+    code INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    discrepancies TEXT,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    PRIMARY KEY (version_id, row_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS outcomes_transaction ON outcomes (transaction_id, run_id);
+"""
+
+# Row keys per lookup query, below SQLite's limit on bound parameters
+LOOKUP_BATCH = 500
+
+
+def version_description(engine, tolerances, formulas):
+    """What a version digest covers, stored next to it for people reading the history."""
+    return {
+        'engine': f"{engine.__module__}.{engine.__qualname__}",
+        'formulas': dict(formulas),
+        'tolerances': {col: repr(value) for col, value in tolerances.items()},
+    }
+
+
+def row_keys(chunk):
+    """
+    64-bit content hash per row over every column, independent of column order.
+
+    Returns:
+        ndarray: int64 keys (SQLite integers are signed).
+    """
+    columns = sorted(chunk.columns)
+    return pd.util.hash_pandas_object(chunk[columns], index=False).to_numpy().view(np.int64)
+
+
+def line_keys(lines, header):
+    """64-bit hash per CSV line (bytes, with line ending), salted with the header so a layout change rekeys every row."""
+    salt = hashlib.sha256(header).hexdigest()[:16]
+    return pd.util.hash_array(np.array(lines, dtype=object), hash_key=salt, categorize=False).view(np.int64)
+
+
+def keyed_chunks(source, chunksize=CHUNK_ROWS, progress=None, **read_csv_kwargs):
+    """
+    Yield (keys, rows) per chunk of at most chunksize rows, where rows(positions) returns
+    those rows as a DataFrame. CSV lines are only parsed when rows asks for them.
+
+    Parameters as for streaming.read_chunks.
+    """
+    if file_format(source) != 'csv':
+        for chunk in read_chunks(source, chunksize, progress, **read_csv_kwargs):
+            with perf.stage(perf.STORE):
+                keys = row_keys(chunk)
+            yield keys, lambda positions, chunk=chunk: chunk.iloc[positions].reset_index(drop=True)
+        return
+
+    def parse(header, lines):
+        with perf.stage(perf.READ):
+            return pd.read_csv(io.BytesIO(header + b''.join(lines)), **read_csv_kwargs)
+
+    total_bytes = (source_size(source) or 1) if progress is not None else None
+    handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        header = handle.readline()
+        rows_done = 0
+        while True:
+            with perf.stage(perf.READ):
+                lines = list(itertools.islice(handle, chunksize))
+            if not lines:
+                break
+            # Blank lines are not rows; the last line of a file that later grows gains its newline
+            lines = [line for line in lines if not line.isspace()]
+            if lines and not lines[-1].endswith(b'\n'):
+                lines[-1] += b'\n'
+            with perf.stage(perf.STORE):
+                keys = line_keys(lines, header)
+            yield keys, lambda positions, lines=lines: parse(header, [lines[i] for i in positions])
+            rows_done += len(lines)
+            if progress is not None:
+                progress(rows_done, min(handle.tell() / total_bytes, 1.0))
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+class ValidationStore:
+    """
+    Validation outcomes and run history in one SQLite file.
+
+    Parameters:
+        path (str): Database file, created on first use; ':memory:' for a throwaway store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def version(self, engine, tolerances, formulas):
+        """Id of the version for this engine, tolerances and formulas, added on first use."""
+        description = json.dumps(version_description(engine, tolerances, formulas), sort_keys=True)
+        digest = hashlib.sha256(description.encode()).hexdigest()
+        with self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO versions (digest, description) VALUES (?, ?)',
+                                    (digest, description))
+        return self.connection.execute('SELECT version_id FROM versions WHERE digest = ?', (digest,)).fetchone()[0]
+
+    def begin_run(self, version_id, source=None):
+        """Start a run; its outcomes and totals are committed together by finish_run."""
+        started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        cursor = self.connection.execute('INSERT INTO runs (version_id, started, source) VALUES (?, ?, ?)',
+                                         (version_id, started, source))
+        return cursor.lastrowid
+
+    def finish_run(self, run_id, total_rows, new_rows, recalculated_rows, invalid_count, seconds):
+        self.connection.execute(
+            'UPDATE runs SET total_rows = ?, new_rows = ?, recalculated_rows = ?, invalid_count = ?, seconds = ? '
+            'WHERE run_id = ?', (total_rows, new_rows, recalculated_rows, invalid_count, seconds, run_id))
+        self.connection.commit()
+
+    def abort_run(self):
+        self.connection.rollback()
+
+    @perf.timed(perf.STORE)
+    def lookup(self, version_id, keys):
+        """
+        Which of a chunk's row keys are stored under a version, and which of those failed.
+
+        Only the given keys are read, as probes of the (version_id, row_key) primary key in
+        key order, so the cost follows the chunk rather than every key the version holds.
+
+        Returns:
+            tuple: (bool per key: stored, bool per key: stored as invalid).
+        """
+        unique = np.unique(keys)
+        found = []
+        for start in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[start:start + LOOKUP_BATCH].tolist()
+            found.extend(self.connection.execute(
+                f"SELECT row_key, code FROM outcomes WHERE version_id = ? AND row_key IN ({', '.join('?' * len(batch))})",
+                [version_id, *batch]))
+        found = np.array(found, dtype=np.int64).reshape(-1, 2)
+        return np.isin(keys, found[:, 0]), np.isin(keys, found[found[:, 1] != 0, 0])
+
+    @perf.timed(perf.STORE)
+    def record(self, version_id, run_id, keys, transaction_ids, codes, statuses, discrepancies):
+        """Store the outcome of rows seen for the first time; rows already stored are left as they are."""
+        # Inserting in key order keeps the primary key B-tree writes local
+        order = np.argsort(keys)
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO outcomes (version_id, row_key, transaction_id, code, status, discrepancies, run_id) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            zip(itertools.repeat(version_id), keys[order].tolist(), transaction_ids[order].tolist(),
+                codes[order].tolist(), [statuses[i] for i in order], [discrepancies[i] for i in order],
+                itertools.repeat(run_id)))
+
+    def runs(self):
+        """Every run, oldest first, with its totals."""
+        return pd.read_sql_query('SELECT * FROM runs ORDER BY run_id', self.connection)
+
+    def history(self, transaction_id):
+        """
+        Every stored outcome of one transaction, in the order its contents were first seen.
+
+        A transaction appears once per version and per distinct content (e.g. after its export
+        row was corrected), with the run and time that first saw it.
+        """
+        return pd.read_sql_query(
+            'SELECT o.transaction_id, o.status, o.discrepancies, o.version_id, o.run_id, r.started, r.source '
+            'FROM outcomes AS o JOIN runs AS r USING (run_id) WHERE o.transaction_id = ? ORDER BY o.run_id',
+            self.connection, params=(str(transaction_id),))
+
+    def first_failure(self, transaction_id):
+        """The earliest history row of a transaction that failed validation, or None."""
+        history = self.history(transaction_id)
+        failed = history[history['status'] != VALID]
+        return None if failed.empty else failed.iloc[0]
+
+
+def validate_deposits_incremental(source, store, tolerances=None, chunksize=CHUNK_ROWS, progress=None,
+                                  keep_columns=(), max_offending_rows=MAX_OFFENDING_ROWS,
+                                  engine=recalculate_and_validate_deposits, read_csv_kwargs=None,
+                                  formulas=DEPOSIT_FORMULAS, source_name=None):
+    """
+    validate_deposits_chunked that skips rows the store already holds as valid.
+
+    Parameters:
+        source (str or file): Deposit CSV, Parquet or Arrow path or file object.
+        store (ValidationStore): Receives the new rows' outcomes and one run record.
+        formulas (dict): The formula registry the engine evaluates; part of the version.
+        source_name (str): Recorded with the run; defaults to source when it is a path.
+        Other parameters as for validate_deposits_chunked.
+
+    Returns:
+        ValidationSummary: The same counts and offending rows as validate_deposits_chunked.
+            summary.run_id is the store's run.
+    """
+    if tolerances is None:
+        tolerances = DEFAULT_TOLERANCES
+    summary = ValidationSummary([col.replace('RC_', '') for col in tolerances], max_offending_rows)
+    version_id = store.version(engine, tolerances, formulas)
+    run_id = store.begin_run(version_id, source_name or (source if isinstance(source, str) else None))
+    start = time.perf_counter()
+    new_rows = recalculated_rows = 0
+    try:
+        for keys, read_rows in keyed_chunks(source, chunksize, progress, **(read_csv_kwargs or {})):
+            summary.total_rows += len(keys)
+            known, failed = store.lookup(version_id, keys)
+            new = ~known
+            # Rows stored as valid are done; new, changed and previously invalid rows are recalculated
+            todo = np.flatnonzero(new | failed)
+            if not len(todo):
+                continue
+            rows = read_rows(todo)
+            results = engine(rows, tolerances)
+            recalculated_rows += len(todo)
+
+            invalid = np.flatnonzero(results.invalid)
+            summary.invalid_count += len(invalid)
+            for name, count in results.mismatch_counts().items():
+                summary.mismatch_counts[name] += count
+
+            new = np.flatnonzero(new[todo])
+            new_rows += len(new)
+            if len(new):
+                status = results.status[new].astype(str).tolist()
+                text = results.discrepancy_text(new)
+                store.record(version_id, run_id, keys[todo[new]], rows['Transaction ID'].to_numpy()[new],
+                             results.codes[new], status, [value or None for value in text.tolist()])
+
+            kept = invalid[:max(summary.room, 0) + 1]
+            offending = results.to_frame(kept)
+            for col in keep_columns:
+                if col not in offending.columns:
+                    offending[col] = rows[col].to_numpy()[kept]
+            summary.add_offending(offending)
+    except BaseException:
+        store.abort_run()
+        raise
+    store.finish_run(run_id, summary.total_rows, new_rows, recalculated_rows, summary.invalid_count,
+                     time.perf_counter() - start)
+    summary.run_id = run_id
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('database')
+    parser.add_argument('transaction_id', nargs='?', help="Show this transaction's history instead of the runs")
+    args = parser.parse_args(argv)
+
+    with ValidationStore(args.database) as store:
+        if args.transaction_id is None:
+            print(store.runs().to_string(index=False))
+            return 0
+        history = store.history(args.transaction_id)
+        if history.empty:
+            print(f"{args.transaction_id} is not in {args.database}", file=sys.stderr)
+            return 1
+        print(history.to_string(index=False))
+        failure = store.first_failure(args.transaction_id)
+        if failure is not None:
+            print(f"\nFirst failed in run {failure['run_id']} at {failure['started']} ({failure['source']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
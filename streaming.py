@@ -0,0 +1,282 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import perf
+from columnar import file_format, iter_columnar_batches
+from report import MismatchReport
+from schema import WITHDRAW_SCHEMA, cast_columns, read_header
+from validation import (DEFAULT_TOLERANCES, WITHDRAW_TOLERANCES, compare_transfers, recalculate_and_validate_deposits,
+                        recalculate_and_validate_withdrawals, recalculate_transfers)
+
+# Rows parsed per chunk; peak memory is a small multiple of one chunk, not of the file
+CHUNK_ROWS = 50_000
+
+# Offending rows kept for display; counters keep counting past this
+MAX_OFFENDING_ROWS = 100_000
+
+TRANSFER_CHECKS = {
+    'Transaction Fee Oc': 'Transaction Fee Oc Matching',
+    'Transfer Amount': 'Transfer Amount Matching',
+    'Currency': 'Currency Matching'
+}
+
+
+class ValidationSummary:
+    """
+    Running totals of a chunked validation.
+
+    Only counters and the offending rows are kept, so memory does not grow with the number
+    of valid rows. Once max_offending_rows rows are stored, further offending rows are still
+    counted but no longer kept (truncated is set). report, when set, is a MismatchReport whose
+    drill-down ids are positions in offending_rows.
+    """
+
+    def __init__(self, checks, max_offending_rows=MAX_OFFENDING_ROWS, report=None):
+        self.report = report
+        self.total_rows = 0
+        self.invalid_count = 0
+        self.mismatch_counts = dict.fromkeys(checks, 0)
+        self.max_offending_rows = max_offending_rows
+        self.truncated = False
+        self._offending = []
+        self._kept = 0
+
+    @property
+    def room(self):
+        """How many more offending rows will be kept."""
+        return self.max_offending_rows - self._kept
+
+    def add_offending(self, rows):
+        room = self.room
+        if len(rows) > room:
+            rows = rows.iloc[:room]
+            self.truncated = True
+        # An empty first frame keeps the column layout when nothing is invalid
+        if len(rows) or not self._offending:
+            self._offending.append(rows)
+            self._kept += len(rows)
+
+    def merge(self, other):
+        """Fold another summary (e.g. from a shard validated elsewhere) into this one."""
+        self.total_rows += other.total_rows
+        self.invalid_count += other.invalid_count
+        for name, count in other.mismatch_counts.items():
+            self.mismatch_counts[name] = self.mismatch_counts.get(name, 0) + count
+        self.truncated = self.truncated or other.truncated
+        if other.report is not None:
+            if self.report is None:
+                self.report = MismatchReport(other.report.checks, other.report.dimensions)
+            self.report.merge(other.report, self._kept, self.max_offending_rows)
+        for rows in other._offending:
+            self.add_offending(rows)
+        return self
+
+    @property
+    def offending_rows(self):
+        if not self._offending:
+            return pd.DataFrame()
+        return pd.concat(self._offending, ignore_index=True)
+
+    def snapshot(self, max_offending_rows):
+        """
+        A copy of the counters and the first max_offending_rows offending rows, without the report.
+
+        Cheap to take after every chunk, and safe to read on another thread while this summary
+        keeps growing.
+        """
+        copy = ValidationSummary(self.mismatch_counts, max_offending_rows)
+        copy.total_rows = self.total_rows
+        copy.invalid_count = self.invalid_count
+        copy.mismatch_counts = dict(self.mismatch_counts)
+        copy.truncated = self.truncated
+        for rows in self._offending:
+            if copy.room <= 0 and copy._offending:
+                break
+            copy.add_offending(rows.iloc[:copy.room].copy())
+        return copy
+
+
+def _offending_ids(summary, count):
+    # Positions the next count offending rows will take in summary.offending_rows, -1 past the cap
+    ids = summary.max_offending_rows - summary.room + np.arange(count)
+    ids[ids >= summary.max_offending_rows] = -1
+    return ids
+
+
+def source_size(source):
+    """Size in bytes of a path or seekable file object, used to turn read position into progress."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def read_chunks(source, chunksize=CHUNK_ROWS, progress=None, **read_csv_kwargs):
+    """
+    Yield a CSV, Parquet or Arrow file in DataFrames of at most chunksize rows.
+
+    Parameters:
+        source (str or file): Path or file object (e.g. a Streamlit UploadedFile).
+        chunksize (int): Rows per chunk.
+        progress (callable): Optional progress(rows_done, fraction) called after each chunk;
+            for a CSV, fraction is estimated from the read position in the file.
+        read_csv_kwargs: Passed through to pd.read_csv. For columnar files only usecols and
+            dtype apply, as column projection and casts.
+
+    Yields:
+        DataFrame: The next chunk.
+    """
+    if file_format(source) != 'csv':
+        yield from _read_columnar_chunks(source, chunksize, progress, read_csv_kwargs.get('usecols'),
+                                         read_csv_kwargs.get('dtype'))
+        return
+
+    total_bytes = (source_size(source) or 1) if progress is not None else None
+    handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        rows_done = 0
+        with pd.read_csv(handle, chunksize=chunksize, **read_csv_kwargs) as reader:
+            while True:
+                # Only parsing counts as reading; the caller's work on a chunk happens between yields
+                with perf.stage(perf.READ):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                yield chunk
+                rows_done += len(chunk)
+                if progress is not None:
+                    progress(rows_done, min(handle.tell() / total_bytes, 1.0))
+    finally:
+        if handle is not source:
+            handle.close()
+
+
+def _read_columnar_chunks(source, chunksize, progress, usecols, dtype):
+    if dtype is not None and not isinstance(dtype, dict):
+        dtype = dict.fromkeys(usecols or read_header(source), dtype)
+    total_rows, tables = iter_columnar_batches(source, usecols, chunksize)
+    rows_done = 0
+    while True:
+        with perf.stage(perf.READ):
+            table = next(tables, None)
+            chunk = None if table is None else cast_columns(table, dtype or {}).to_pandas()
+        if chunk is None:
+            break
+        yield chunk
+        rows_done += len(chunk)
+        if progress is not None:
+            progress(rows_done, rows_done / max(total_rows, 1))
+
+
+def validate_deposits_chunked(source, tolerances=None, chunksize=CHUNK_ROWS, progress=None, keep_columns=(),
+                              max_offending_rows=MAX_OFFENDING_ROWS, engine=recalculate_and_validate_deposits,
+                              read_csv_kwargs=None, report_columns=None, partial=None):
+    """
+    Validate a deposit CSV chunk by chunk.
+
+    Parameters:
+        source (str or file): Deposit CSV, Parquet or Arrow path or file object.
+        tolerances (dict): Absolute tolerance per RC_ column. Defaults to DEFAULT_TOLERANCES.
+        chunksize (int): Rows per chunk.
+        progress (callable): Optional progress(rows_done, fraction).
+        keep_columns (list): Extra source columns carried into the offending rows.
+        max_offending_rows (int): Cap on offending rows kept for display.
+        engine (callable): engine(chunk, tolerances) -> ValidationResults, e.g.
+            recalculate_and_validate_deposits (default) or recalculate_and_validate_deposits_exact.
+        read_csv_kwargs (dict): Passed to pd.read_csv, e.g. a schema's read_csv_kwargs(as_text=True)
+            for the exact engine.
+        report_columns (dict): Report dimensions (label -> column, see report.report_columns) to
+            build summary.report over; the columns must be read.
+        partial (callable): Optional partial(summary) called with the running summary after each
+            chunk, e.g. to show counts so far.
+
+    Returns:
+        ValidationSummary: mismatch_counts is keyed by the original (non RC_) column name.
+            Offending rows carry Discrepancies as display text.
+    """
+    if tolerances is None:
+        tolerances = DEFAULT_TOLERANCES
+    checks = [col.replace('RC_', '') for col in tolerances]
+    summary = ValidationSummary(checks, max_offending_rows,
+                                None if report_columns is None else MismatchReport(checks, report_columns))
+
+    for chunk in read_chunks(source, chunksize, progress, **(read_csv_kwargs or {})):
+        results = engine(chunk, tolerances)
+        invalid = np.flatnonzero(results.invalid)
+        summary.total_rows += len(results)
+        summary.invalid_count += len(invalid)
+        for name, count in results.mismatch_counts().items():
+            summary.mismatch_counts[name] += count
+        if summary.report is not None:
+            summary.report.add_results(results, chunk, _offending_ids(summary, len(invalid)))
+
+        # Discrepancy text is only built for rows that will be kept (one extra marks truncation)
+        invalid = invalid[:max(summary.room, 0) + 1]
+        offending = results.to_frame(invalid)
+        for col in keep_columns:
+            if col not in offending.columns:
+                offending[col] = chunk[col].to_numpy()[invalid]
+        summary.add_offending(offending)
+        if partial is not None:
+            partial(summary)
+
+    return summary
+
+
+def validate_withdrawals_chunked(source, tolerances=None, chunksize=CHUNK_ROWS, progress=None, keep_columns=(),
+                                 max_offending_rows=MAX_OFFENDING_ROWS, read_csv_kwargs=None, report_columns=None,
+                                 partial=None):
+    """
+    Validate a withdraw export chunk by chunk with recalculate_and_validate_withdrawals.
+
+    Arguments are as for validate_deposits_chunked; tolerances default to WITHDRAW_TOLERANCES
+    and chunks are read through WITHDRAW_SCHEMA plus keep_columns.
+
+    Returns:
+        ValidationSummary: mismatch_counts is keyed by the original (non RC_) column name.
+    """
+    if read_csv_kwargs is None:
+        read_csv_kwargs = WITHDRAW_SCHEMA.read_csv_kwargs(list(keep_columns) + list((report_columns or {}).values()))
+    return validate_deposits_chunked(source, tolerances or WITHDRAW_TOLERANCES, chunksize, progress, keep_columns,
+                                     max_offending_rows, recalculate_and_validate_withdrawals, read_csv_kwargs,
+                                     report_columns, partial)
+
+
+def validate_transfers_chunked(source, chunksize=CHUNK_ROWS, progress=None, max_offending_rows=MAX_OFFENDING_ROWS,
+                               read_csv_kwargs=None, report_columns=None, partial=None):
+    """
+    Validate a transfer CSV chunk by chunk with recalculate_transfers and compare_transfers.
+
+    Parameters:
+        source (str or file): Transfer CSV, Parquet or Arrow path or file object.
+        chunksize (int): Rows per chunk.
+        progress (callable): Optional progress(rows_done, fraction).
+        max_offending_rows (int): Cap on non-matching rows kept for display.
+        read_csv_kwargs (dict): Passed to pd.read_csv.
+        report_columns (dict): Report dimensions to build summary.report over.
+        partial (callable): Optional partial(summary) called after each chunk.
+
+    Returns:
+        ValidationSummary: mismatch_counts is keyed by the names in TRANSFER_CHECKS.
+    """
+    summary = ValidationSummary(TRANSFER_CHECKS, max_offending_rows,
+                                None if report_columns is None else MismatchReport(TRANSFER_CHECKS, report_columns))
+
+    for chunk in read_chunks(source, chunksize, progress, **(read_csv_kwargs or {})):
+        comparison = compare_transfers(recalculate_transfers(chunk))
+        summary.total_rows += len(comparison)
+        summary.invalid_count += int((~comparison['All Matching']).sum())
+        for name, col in TRANSFER_CHECKS.items():
+            summary.mismatch_counts[name] += int((~comparison[col]).sum())
+        if summary.report is not None:
+            invalid_count = len(comparison) - int(comparison['All Matching'].sum())
+            summary.report.add_transfers(comparison, TRANSFER_CHECKS, _offending_ids(summary, invalid_count))
+        summary.add_offending(comparison[~comparison['All Matching']])
+        if partial is not None:
+            partial(summary)
+
+    return summary
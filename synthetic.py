@@ -0,0 +1,286 @@
+"""
+Seeded synthetic deposit, withdraw and transfer exports with discrepancies at known rows.
+
+Usage:
+    python synthetic.py deposit deposits.csv --rows 1000000 --injected injected.csv
+    python synthetic.py deposit deposits.parquet --engine truncated --rows 50000000
+    python synthetic.py withdraw withdrawals.csv --rows 100000 --rate 0.001
+    python synthetic.py transfer transfers.feather --rows 100000 --seed 7
+
+Exported columns are filled through the same formula registries the pages validate with, so
+every row is valid except the injected ones; --injected lists those rows (0-based position,
+ID and the column that was changed). Rows are generated and written in chunks, so the size
+is bounded by disk, not memory. The same kind, engine, rows, seed, rate and chunk size always
+give the same file. The output format follows the extension (.csv, .parquet, .feather, .arrow).
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from formulas import GDR_BUY_RATE, TOKEN_SELL_RATE, XAU_BACKUP_BUY_RATE
+from rounding import ROUND_DOWN, ROUND_HALF_UP, round_places
+from validation import (DEPOSIT_RECALCULATIONS, WITHDRAW_RECALCULATIONS, XAU_BACKUP_DEPOSIT_RECALCULATIONS,
+                        recalculate_transfers)
+
+KINDS = ['deposit', 'withdraw', 'transfer']
+
+# Deposit engines as in cli.py: 'main' exports full-precision floats with the GDR/USD rate, the
+# deposit pages ('truncated', 'exact') read the XAU backup rate and values truncated to cents
+DEPOSIT_ENGINES = ['main', 'truncated', 'exact']
+
+# Rows generated and written at a time
+CHUNK_ROWS = 1_000_000
+
+# Added to an exported amount to make a discrepancy; above every default tolerance
+DISCREPANCY = 1.0
+
+# Page deposit rows whose untruncated values come within this many cents of a cent boundary are
+# redrawn: float and Decimal arithmetic could truncate them to different cents
+# (79.6 * 102.5 / 100 is 81.59 in Decimal but 81.58999999999999 in float)
+BOUNDARY_MARGIN = 1e-6
+
+MARKUP_RATES = [
+    'Mark up rate 1 - Gold Price Fluctuation',
+    'Mark up rate 2 - Withdrawal transasaction & gas fee',
+    'Mark up rate 3 - Crypto to fiat conversion',
+    'Mark up rate 4 - Business risk reserve',
+    'Mark up rate 5 - Transfer transasaction & gas fee',
+]
+
+NETWORKS = {'Polygon': 0.01, 'Polygon Amoy': 0.0, 'Ethereum': 2.5, 'Arbitrum': 0.05}
+
+TOKENS = ['USDC', 'USDT']
+
+
+def id_column(kind):
+    return 'Record ID' if kind == 'transfer' else 'Transaction ID'
+
+
+def _ids(prefix, start, rows):
+    return [f"{prefix}{i:010d}" for i in range(start, start + rows)]
+
+
+def _decimals(rng, low, high, rows, places):
+    # Exports carry a fixed number of decimals; draw values already on that grid
+    return np.round(rng.uniform(low, high, rows), places)
+
+
+def _settle(df, recalculations, recalculate=None):
+    # Formulas read exported columns other formulas produce (e.g. RC_COGs reads GDR Client Receive),
+    # so fill the exports from the RC_ values until they stop changing
+    recalculate = recalculate or recalculations.evaluate
+    for col in recalculations.formulas:
+        df[col.replace('RC_', '')] = np.nan
+    for _ in range(10):
+        recalculated = recalculate(df)
+        changed = False
+        for col, values in recalculated.items():
+            exported = col.replace('RC_', '')
+            if not np.array_equal(df[exported].to_numpy(), values, equal_nan=True):
+                df[exported] = values
+                changed = True
+        if not changed:
+            return df
+    raise RuntimeError("Exported columns did not settle")
+
+
+def _settle_truncated(df):
+    # Settle to cents truncated like the deposit pages; returns the frame and the rows too close
+    # to a cent boundary for float and Decimal to agree
+    near = np.zeros(len(df), dtype=bool)
+
+    def finalize(col, values):
+        scaled = values * 100
+        near[np.abs(scaled - np.rint(scaled)) < BOUNDARY_MARGIN] = True
+        return round_places(values, 2, ROUND_DOWN)
+
+    def recalculate(df):
+        near[:] = False
+        return XAU_BACKUP_DEPOSIT_RECALCULATIONS.evaluate(df, finalize=finalize)
+
+    # The last pass changes nothing, so near describes the settled values
+    return _settle(df, XAU_BACKUP_DEPOSIT_RECALCULATIONS, recalculate), near
+
+
+def _deposit_inputs(rng, rows, rate_column):
+    df = pd.DataFrame({
+        'Amount Dc': _decimals(rng, 1, 1000, rows, 2),
+        'Deposit Amount OC': _decimals(rng, 1, 30000, rows, 2),
+        'CLEO.lit Buy Token/USD Reference': _decimals(rng, 0.99, 1.01, rows, 4),
+        rate_column: _decimals(rng, 60, 80, rows, 4),
+    })
+    for col in MARKUP_RATES:
+        df[col] = _decimals(rng, 0.01, 1, rows, 2)
+    df['Total Markup - For Referrence'] = np.round(df[MARKUP_RATES].sum(axis=1), 2)
+    return df
+
+
+def _deposits(rng, start, rows, engine):
+    if engine == 'main':
+        df = _settle(_deposit_inputs(rng, rows, GDR_BUY_RATE), DEPOSIT_RECALCULATIONS)
+    else:
+        df, near = _settle_truncated(_deposit_inputs(rng, rows, XAU_BACKUP_BUY_RATE))
+        # A few rows per million; redraw just those until none is ambiguous
+        while near.any():
+            redraw = np.flatnonzero(near)
+            replacement, replacement_near = _settle_truncated(_deposit_inputs(rng, len(redraw), XAU_BACKUP_BUY_RATE))
+            df.iloc[redraw] = replacement.to_numpy()
+            near[:] = False
+            near[redraw[replacement_near]] = True
+    df.insert(0, 'Transaction ID', _ids('DP', start, rows))
+    return df
+
+
+def _withdrawals(rng, start, rows):
+    network = rng.choice(list(NETWORKS), rows)
+    df = pd.DataFrame({
+        'Transaction ID': _ids('WD', start, rows),
+        'Network': network,
+        'Token Send': 'GDR',
+        'Token Receive': rng.choice(TOKENS, rows),
+        'Withdraw Amount OC': _decimals(rng, 1, 500, rows, 2),
+        GDR_BUY_RATE: _decimals(rng, 60, 80, rows, 4),
+        TOKEN_SELL_RATE: _decimals(rng, 0.99, 1.01, rows, 4),
+        'Transaction Fee - Rate': rng.choice([0.001, 0.0025, 0.005], rows),
+        'Network Fee DC': pd.Series(network).map(NETWORKS).to_numpy(),
+    })
+    # Withdraw exports carry cents, rounded half up
+    return _settle(df, WITHDRAW_RECALCULATIONS, lambda df: {
+        col: round_places(values, 2, ROUND_HALF_UP) for col, values in WITHDRAW_RECALCULATIONS.evaluate(df).items()})
+
+
+def _transfers(rng, start, rows):
+    currency = rng.choice(TOKENS, rows)
+    df = pd.DataFrame({
+        'Record ID': _ids('TR', start, rows),
+        'Transfer Amount DC': _decimals(rng, 1, 10000, rows, 2),
+        'Transaction Fee - Rate': rng.choice([0.001, 0.0025, 0.005], rows),
+        'Original Currency - OC': currency,
+        'Destination Currency - DC': currency,
+    })
+    df['Transaction Fee Oc'] = recalculate_transfers(df.copy())['Recalculated Transaction Fee Oc'].to_numpy()
+    df['Destination Amount DC'] = df['Transfer Amount DC']
+    return df
+
+
+def _inject(rng, df, kind, engine, rate):
+    """Change one checked column on a random rate-sized subset of rows; returns (rows, columns)."""
+    rows = np.sort(rng.choice(len(df), int(round(len(df) * rate)), replace=False))
+    if kind == 'transfer':
+        targets = ['Transaction Fee Oc', 'Destination Amount DC', 'Destination Currency - DC']
+    else:
+        recalculations = {'deposit': DEPOSIT_RECALCULATIONS if engine == 'main' else XAU_BACKUP_DEPOSIT_RECALCULATIONS,
+                          'withdraw': WITHDRAW_RECALCULATIONS}[kind]
+        amount = 'Amount Dc' if kind == 'deposit' else 'Withdraw Amount OC'
+        targets = [amount] + [col.replace('RC_', '') for col in recalculations.formulas]
+    columns = rng.choice(targets, len(rows))
+
+    for col in targets:
+        hit = rows[columns == col]
+        if col == 'Destination Currency - DC':
+            values = df[col].to_numpy().copy()
+            values[hit] = np.where(values[hit] == TOKENS[0], TOKENS[1], TOKENS[0])
+            df[col] = values
+        elif col in ('Amount Dc', 'Withdraw Amount OC'):
+            df.loc[hit, col] = -df[col].to_numpy()[hit]
+        else:
+            df.loc[hit, col] = df[col].to_numpy()[hit] + DISCREPANCY
+    return rows, columns
+
+
+def generate(kind, rows, seed=0, discrepancy_rate=0.01, engine='main', start=0):
+    """
+    One in-memory export.
+
+    Parameters:
+        kind (str): One of KINDS.
+        rows (int): Rows to generate.
+        seed (int): Random seed; with start it fully determines the frame.
+        discrepancy_rate (float): Share of rows given a discrepancy.
+        engine (str): For deposits, the DEPOSIT_ENGINES name the export is valid for.
+        start (int): Position of the first row, used for IDs and injected positions.
+
+    Returns:
+        tuple: (DataFrame, injected DataFrame with Row, ID and Column per injected row).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {KINDS}")
+    if engine not in DEPOSIT_ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {DEPOSIT_ENGINES}")
+    rng = np.random.default_rng([seed, start])
+    if kind == 'deposit':
+        df = _deposits(rng, start, rows, engine)
+    elif kind == 'withdraw':
+        df = _withdrawals(rng, start, rows)
+    else:
+        df = _transfers(rng, start, rows)
+    injected, columns = _inject(rng, df, kind, engine, discrepancy_rate)
+    ids = id_column(kind)
+    return df, pd.DataFrame({'Row': injected + start, ids: df[ids].to_numpy()[injected], 'Column': columns})
+
+
+def generate_chunks(kind, rows, seed=0, discrepancy_rate=0.01, engine='main', chunk_rows=CHUNK_ROWS):
+    """Yield (frame, injected) pairs covering rows in order, each at most chunk_rows long."""
+    for start in range(0, rows, chunk_rows):
+        yield generate(kind, min(chunk_rows, rows - start), seed, discrepancy_rate, engine, start)
+
+
+def _writer(path, schema):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension == 'parquet':
+        return pq.ParquetWriter(path, schema)
+    if extension in ('feather', 'arrow'):
+        return pa.ipc.new_file(path, schema)
+    return pa_csv.CSVWriter(path, schema)
+
+
+def write_export(kind, path, rows, seed=0, discrepancy_rate=0.01, engine='main', chunk_rows=CHUNK_ROWS):
+    """
+    Generate an export chunk by chunk straight to a file.
+
+    Returns:
+        DataFrame: The injected rows, as from generate, for the whole file.
+    """
+    writer = None
+    injected = []
+    try:
+        for df, chunk_injected in generate_chunks(kind, rows, seed, discrepancy_rate, engine, chunk_rows):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = _writer(path, table.schema)
+            writer.write_table(table)
+            injected.append(chunk_injected)
+    finally:
+        if writer is not None:
+            writer.close()
+    return pd.concat(injected, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=KINDS)
+    parser.add_argument('output')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rate', type=float, default=0.01, help="Share of rows given a discrepancy")
+    parser.add_argument('--engine', choices=DEPOSIT_ENGINES, default='main',
+                        help="Deposit engine the export is valid for; truncated and exact share one layout")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--injected', help="CSV listing the injected rows")
+    args = parser.parse_args(argv)
+
+    injected = write_export(args.kind, args.output, args.rows, args.seed, args.rate, args.engine, args.chunk_rows)
+    print(f"{args.output}: {args.rows} rows, {len(injected)} injected discrepancies")
+    if args.injected:
+        injected.to_csv(args.injected, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Template matching for the testGen UI automation: find a button on a screenshot.
+
+Templates are read and grayscaled once per TemplateMatcher. A lookup first searches the
+region where the template was last found, at the scale it was found at, and falls back to
+the whole frame. A whole-frame search is coarse to fine: each scale is matched on a
+downsampled image pyramid, and the best candidates are refined at full resolution; it stops
+at the first scale that matches unambiguously. Scales cover the browser zoom levels, so one
+template finds its button at any zoom (the *80.png copies are not needed). Matches carry the
+TM_CCOEFF_NORMED score, and a lookup below min_confidence returns None rather than a random
+spot.
+
+Frames are numpy arrays or PIL images: RGB from pyautogui.screenshot(), or a saved
+screenshot read with load_image, so matching can be tested offline. OpenCV (opencv-python)
+is imported on first use, so this module imports without it.
+"""
+import math
+import os
+
+import numpy as np
+
+# Templates the testGen notebook clicks
+TEMPLATE_DIR = 'IMGtemplate'
+
+# Screen size over template size; the ratios between browser zoom levels 67%-150%
+SCALES = (0.5, 0.67, 0.75, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5)
+
+MIN_CONFIDENCE = 0.8
+
+# A whole-frame search stops at the first scale scoring this; scales are tried nearest the
+# last scale matched first, since every button on a page shares its zoom
+SURE_CONFIDENCE = 0.95
+
+# Scales leaving a template under MIN_SIDE pixels on its short side are skipped; pyramid
+# levels are capped so it keeps COARSE_SIDE pixels there
+MIN_SIDE = 8
+COARSE_SIDE = 24
+MAX_LEVEL = 3
+
+# Coarse peaks per scale refined at full resolution, and the margin around a remembered match
+COARSE_PEAKS = 5
+ROI_MARGIN = 48
+
+
+def _cv2():
+    try:
+        import cv2
+    except ImportError as e:
+        raise ImportError("OpenCV is not installed; install opencv-python to match templates") from e
+    return cv2
+
+
+def template_name(template):
+    """'IMGtemplate/send80.png' -> 'send80'; names are the file stems."""
+    return os.path.splitext(os.path.basename(template))[0]
+
+
+def load_image(path):
+    """Read an image file as grayscale uint8, e.g. a template or a saved screenshot."""
+    cv2 = _cv2()
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"Cannot read image {path}")
+    return image
+
+
+def to_gray(frame):
+    """
+    Grayscale uint8 view of a frame.
+
+    Parameters:
+        frame: PIL image or numpy array; 3 or 4 channels are taken as RGB(A), as from pyautogui.
+
+    Returns:
+        numpy.ndarray: 2-D uint8 array.
+    """
+    cv2 = _cv2()
+    image = np.asarray(frame)
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    return np.ascontiguousarray(image, dtype=np.uint8)
+
+
+class Match:
+    """Where a template was found: its box on the frame, the scale it matched at and the score."""
+
+    def __init__(self, name, left, top, width, height, scale, confidence):
+        self.name = name
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.confidence = confidence
+
+    @property
+    def center(self):
+        return (self.left + self.width // 2, self.top + self.height // 2)
+
+    @property
+    def box(self):
+        return (self.left, self.top, self.width, self.height)
+
+    def __repr__(self):
+        return (f"Match({self.name!r}, center={self.center}, size={self.width}x{self.height}, "
+                f"scale={self.scale}, confidence={self.confidence:.3f})")
+
+
+class _Pyramid:
+    """A frame and its pyrDown levels, built on first use and shared by every template."""
+
+    def __init__(self, gray):
+        self.levels = [gray]
+
+    def __getitem__(self, level):
+        cv2 = _cv2()
+        while len(self.levels) <= level:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[level]
+
+
+class TemplateMatcher:
+    """
+    Find templates on frames, remembering where each was last found.
+
+    Parameters:
+        templates (str or dict): Directory of PNGs, or name -> path or grayscale array.
+        scales (tuple): Screen/template size ratios to search.
+        min_confidence (float): Lowest TM_CCOEFF_NORMED score returned as a match.
+        max_level (int): Deepest pyramid level for the coarse search.
+        roi_margin (int): Pixels around the last match searched before the whole frame.
+    """
+
+    def __init__(self, templates=TEMPLATE_DIR, scales=SCALES, min_confidence=MIN_CONFIDENCE, max_level=MAX_LEVEL,
+                 roi_margin=ROI_MARGIN):
+        cv2 = _cv2()
+        if isinstance(templates, str):
+            templates = {template_name(name): os.path.join(templates, name)
+                         for name in sorted(os.listdir(templates)) if name.lower().endswith('.png')}
+        self.min_confidence = min_confidence
+        self.roi_margin = roi_margin
+        self.templates = {}
+        # name -> [(scale, [template at each pyramid level])], built once
+        self._scaled = {}
+        self._last = {}
+        self._scale = 1.0
+        for name, template in templates.items():
+            gray = load_image(template) if isinstance(template, str) else to_gray(template)
+            self.templates[name] = gray
+            self._scaled[name] = []
+            for scale in scales:
+                height, width = round(gray.shape[0] * scale), round(gray.shape[1] * scale)
+                if min(height, width) < MIN_SIDE:
+                    continue
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                levels = [gray if scale == 1 else cv2.resize(gray, (width, height), interpolation=interpolation)]
+                depth = min(max_level, int(math.log2(min(height, width) / COARSE_SIDE)))
+                for _ in range(depth):
+                    levels.append(cv2.pyrDown(levels[-1]))
+                self._scaled[name].append((scale, levels))
+
+    @property
+    def names(self):
+        return list(self.templates)
+
+    @property
+    def zoom(self):
+        """Scale of the most recent whole-frame match; buttons on one page share it."""
+        return self._scale
+
+    def locate(self, template, frame, region=None, scales=None):
+        """
+        Find one template on a frame.
+
+        Parameters:
+            template (str): Template name, or its path as in the notebook steps.
+            frame: Screenshot as a PIL image or numpy array.
+            region (tuple): Optional (left, top, width, height) to search instead of the whole frame.
+            scales (list): Optional subset of the scales for the whole-frame search, e.g. [matcher.zoom].
+
+        Returns:
+            Match or None: The best match, or None below min_confidence.
+        """
+        return self._locate(self._name(template), _Pyramid(to_gray(frame)), region, scales)
+
+    def match_all(self, frame, templates=None, region=None, scales=None):
+        """
+        Find several templates on one frame, converting and downsampling the frame once.
+
+        Returns:
+            dict: name -> Match or None, for every template (default) or the given ones.
+        """
+        pyramid = _Pyramid(to_gray(frame))
+        names = self.names if templates is None else [self._name(template) for template in templates]
+        return {name: self._locate(name, pyramid, region, scales) for name in names}
+
+    def forget(self, template=None):
+        """Drop the remembered region of one template, or of all of them."""
+        if template is None:
+            self._last.clear()
+            self._scale = 1.0
+        else:
+            self._last.pop(self._name(template), None)
+
+    def _name(self, template):
+        name = template if template in self.templates else template_name(template)
+        if name not in self.templates:
+            raise ValueError(f"Unknown template {template!r}; expected one of {self.names}")
+        return name
+
+    def _locate(self, name, pyramid, region, scales):
+        bounds = _bounds(pyramid[0].shape, region)
+        last = self._last.get(name)
+        if last is not None:
+            # The remembered region at the remembered scale, at full resolution
+            margin = self.roi_margin
+            roi = _intersect(bounds, (last.left - margin, last.top - margin,
+                                      last.left + last.width + margin, last.top + last.height + margin))
+            levels = next(levels for scale, levels in self._scaled[name] if scale == last.scale)
+            match = self._best(name, pyramid[0], roi, last.scale, levels[0])
+            if match is not None and match.confidence >= self.min_confidence:
+                self._last[name] = match
+                return match
+
+        match = self._search(name, pyramid, bounds, scales)
+        if match is None or match.confidence < self.min_confidence:
+            return None
+        self._last[name] = match
+        self._scale = match.scale
+        return match
+
+    def _search(self, name, pyramid, bounds, scales=None):
+        # Coarse: a few peaks of every scale on its deepest pyramid level; a small template
+        # blurred by pyrDown often scores a lookalike above the real button there
+        best = None
+        candidates = [item for item in self._scaled[name] if scales is None or item[0] in scales]
+        for scale, levels in sorted(candidates, key=lambda item: abs(math.log(item[0] / self._scale))):
+            if best is not None and best.confidence >= SURE_CONFIDENCE:
+                break
+            level = len(levels) - 1
+            factor = 2 ** level
+            coarse = tuple(value // factor for value in bounds)
+            peaks = self._peaks(pyramid[level], coarse, levels[level]) if level else [None]
+            # Fine: each peak at full resolution, in a window around its coarse location
+            for peak in peaks:
+                window = bounds
+                if peak is not None:
+                    pad = 2 * factor + 2
+                    left, top = peak[0] * factor, peak[1] * factor
+                    window = _intersect(bounds, (left - pad, top - pad, left + levels[0].shape[1] + pad,
+                                                 top + levels[0].shape[0] + pad))
+                match = self._best(name, pyramid[0], window, scale, levels[0])
+                if match is not None and (best is None or match.confidence > best.confidence):
+                    best = match
+        return best
+
+    def _peaks(self, image, bounds, template):
+        # Top COARSE_PEAKS locations inside bounds, each suppressing a template-sized area around it
+        cv2 = _cv2()
+        scores = _scores(image, bounds, template)
+        if scores is None:
+            return []
+        height, width = template.shape
+        peaks = []
+        for _ in range(COARSE_PEAKS):
+            _, confidence, _, (x, y) = cv2.minMaxLoc(scores)
+            if not np.isfinite(confidence) or confidence <= -1:
+                break
+            peaks.append((bounds[0] + x, bounds[1] + y))
+            scores[max(0, y - height // 2):y + height // 2 + 1, max(0, x - width // 2):x + width // 2 + 1] = -1
+        return peaks
+
+    def _best(self, name, image, bounds, scale, template):
+        # Best TM_CCOEFF_NORMED location of template inside bounds (left, top, right, bottom) of image
+        cv2 = _cv2()
+        scores = _scores(image, bounds, template)
+        if scores is None:
+            return None
+        _, confidence, _, (x, y) = cv2.minMaxLoc(scores)
+        if not np.isfinite(confidence):
+            return None
+        height, width = template.shape
+        return Match(name, bounds[0] + x, bounds[1] + y, width, height, scale, float(confidence))
+
+
+def _scores(image, bounds, template):
+    # TM_CCOEFF_NORMED of template over image[bounds], or None when it does not fit
+    cv2 = _cv2()
+    left, top, right, bottom = bounds
+    height, width = template.shape
+    if right - left < width or bottom - top < height:
+        return None
+    return cv2.matchTemplate(image[top:bottom, left:right], template, cv2.TM_CCOEFF_NORMED)
+
+
+def _bounds(shape, region):
+    # (left, top, right, bottom) of a (left, top, width, height) region, clipped to the frame
+    full = (0, 0, shape[1], shape[0])
+    if region is None:
+        return full
+    left, top, width, height = region
+    return _intersect(full, (left, top, left + width, top + height))
+
+
+def _intersect(a, b):
+    return (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
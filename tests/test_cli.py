@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from cli import main, validate_files, write_reports
+from report import REPORT_DIMENSIONS
+from schema import DEPOSIT_SCHEMA, TRANSFER_SCHEMA, WITHDRAW_SCHEMA
+
+SCHEMAS = {'deposit': DEPOSIT_SCHEMA, 'withdraw': WITHDRAW_SCHEMA, 'transfer': TRANSFER_SCHEMA}
+
+
+def empty_export(tmp_path, kind):
+    # An export with its header but no rows, as a day without transactions gives
+    columns = SCHEMAS[kind].columns + [col for col in REPORT_DIMENSIONS.values() if col not in SCHEMAS[kind].columns]
+    path = tmp_path / f"{kind}.csv"
+    pd.DataFrame(columns=columns).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('kind', list(SCHEMAS))
+def test_empty_export_has_empty_report(tmp_path, kind):
+    path = empty_export(tmp_path, kind)
+    summary = validate_files(kind, [path], workers=1, report=True)[path]
+    assert summary.total_rows == 0
+    assert summary.invalid_count == 0
+    table = summary.report.table()
+    assert table.empty
+    assert list(table.columns[:len(REPORT_DIMENSIONS) + 2]) == [*REPORT_DIMENSIONS, 'Rows', 'Invalid']
+
+    total = summary.report.table(by=[])
+    assert total[['Rows', 'Invalid']].values.tolist() == [[0, 0]]
+
+
+@pytest.mark.parametrize('kind', list(SCHEMAS))
+def test_report_written_for_empty_export(tmp_path, kind):
+    path = empty_export(tmp_path, kind)
+    output = tmp_path / 'report.csv'
+    assert main([kind, path, '--workers', '1', '--report', str(output)]) == 0
+    report = pd.read_csv(output)
+    assert report.empty
+    assert list(report.columns[:5]) == ['File', *REPORT_DIMENSIONS, 'Rows']
+
+
+def test_report_of_empty_and_nonempty_exports(tmp_path):
+    empty = empty_export(tmp_path, 'transfer')
+    rows = pd.read_csv(empty)
+    rows.loc[0] = ['1'] * len(rows.columns)
+    rows['Created At'] = '2024-01-02T03:04:05Z'
+    other = str(tmp_path / 'rows.csv')
+    rows.to_csv(other, index=False)
+    summaries = validate_files('transfer', [empty, other], workers=1, report=True)
+    output = tmp_path / 'report.csv'
+    write_reports(summaries, str(output))
+    report = pd.read_csv(output)
+    assert report['File'].tolist() == [other]
+    assert report['Rows'].tolist() == [1]
@@ -0,0 +1,142 @@
+from decimal import ROUND_DOWN, ROUND_HALF_EVEN, Decimal, DivisionByZero, InvalidOperation, localcontext
+
+import numpy as np
+import pytest
+
+from fixed_point import PREC, FixedPointArray
+
+SEEDS = range(20)
+
+OPERATIONS = {
+    'add': lambda a, b: a + b,
+    'sub': lambda a, b: a - b,
+    'mul': lambda a, b: a * b,
+    'div': lambda a, b: a / b,
+}
+
+# Rounding and exponent boundaries: ties at the 19th digit, 99...9 carrying to 10**18, zeros of
+# both signs, exponents too far apart for the int64 path, over-long text, exponent notation, NaN
+EDGES = [
+    '0', '-0', '0.000', '-0.00', '1', '-1', '0.5', '2.5', '-2.5', '0.05',
+    '999999999999999999', '-999999999999999999', '99999999999999999.9', '0.999999999999999999',
+    '1000000000000000000', '100000000000000000.5', '123456789012345678', '0.000000000000000001',
+    '500000000000000000', '1.5', '3', '7', '9', '0.1', '0.3', '1E+30', '-1E-30', '1.23E+5', '4e-7',
+    '1234567890123456789012', '0.12345678901234567890123', 'NaN', '1E+18', '5E-19',
+]
+
+
+@pytest.fixture(autouse=True)
+def decimal_context():
+    with localcontext() as context:
+        context.prec = PREC
+        context.rounding = ROUND_HALF_EVEN
+        yield
+
+
+def values(seed, n=500):
+    # Plain decimal text as exports hold it, with the edge cases mixed in
+    rng = np.random.default_rng(seed)
+    digits = rng.integers(1, PREC + 1, n)
+    places = rng.integers(0, 12, n)
+    text = []
+    for d, p in zip(digits.tolist(), places.tolist()):
+        coef = str(rng.integers(1, 10)) + ''.join(map(str, rng.integers(0, 10, d - 1)))
+        if p:
+            coef = coef.rjust(p + 1, '0')
+            coef = coef[:-p] + '.' + coef[-p:]
+        text.append(('-' if rng.random() < 0.3 else '') + coef)
+    edges = rng.choice(EDGES, n // 5)
+    text[:len(edges)] = edges.tolist()
+    return np.array(rng.permutation(text), dtype=object)
+
+
+def assert_identical(result, expected):
+    # Same sign, digits and exponent, as Decimal.as_tuple() reports them
+    assert [value.as_tuple() for value in result.to_decimal()] == [value.as_tuple() for value in expected]
+
+
+def reference(op, a, b):
+    return [OPERATIONS[op](x, y) for x, y in zip(a, b)]
+
+
+@pytest.mark.parametrize('op', OPERATIONS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_arithmetic_matches_decimal(op, seed):
+    a, b = values(seed), values(seed + 1000)
+    if op == 'div':
+        # Division by zero raises, as Decimal does; it is checked separately
+        b = np.where([Decimal(x).is_zero() for x in b], '7', b)
+    expected = reference(op, [Decimal(x) for x in a], [Decimal(x) for x in b])
+    assert_identical(OPERATIONS[op](FixedPointArray.from_text(a), FixedPointArray.from_text(b)), expected)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_chained_arithmetic_matches_decimal(seed):
+    # Results of one operation, rounded to 18 digits, fed into the next, as the formulas do
+    a, b, c = values(seed), values(seed + 1000), values(seed + 2000)
+    c = np.where([Decimal(x).is_zero() for x in c], '3', c)
+    x, y, z = (FixedPointArray.from_text(v) for v in (a, b, c))
+    expected = [(p * q + p) / r - q for p, q, r in zip(*([Decimal(v) for v in col] for col in (a, b, c)))]
+    assert_identical((x * y + x) / z - y, expected)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_comparisons_and_signs_match_decimal(seed):
+    a, b = values(seed), values(seed + 1000)
+    x, y = FixedPointArray.from_text(a), FixedPointArray.from_text(b)
+    da, db = [Decimal(v) for v in a], [Decimal(v) for v in b]
+    numbers = [not (p.is_nan() or q.is_nan()) for p, q in zip(da, db)]
+    # Decimal raises on ordering NaN; only numbers are compared
+    x, y = x.take(np.flatnonzero(numbers)), y.take(np.flatnonzero(numbers))
+    da, db = [p for p, k in zip(da, numbers) if k], [q for q, k in zip(db, numbers) if k]
+    assert (x > y).tolist() == [p > q for p, q in zip(da, db)]
+    assert (x > 0).tolist() == [p > 0 for p in da]
+    assert_identical(-x, [-p for p in da])
+    assert_identical(abs(x), [abs(p) for p in da])
+
+
+@pytest.mark.parametrize('exponent', [-12, -10, -2, 0, 3])
+@pytest.mark.parametrize('seed', SEEDS)
+def test_quantize_down_matches_decimal(seed, exponent):
+    quantum = Decimal(f"1E{exponent}")
+    # Values Decimal can quantize (at most 18 digits afterwards) and no NaN
+    text = [v for v in values(seed) if not Decimal(v).is_nan() and Decimal(v).adjusted() - exponent < PREC]
+    expected = [Decimal(v).quantize(quantum, rounding=ROUND_DOWN) for v in text]
+    assert_identical(FixedPointArray.from_text(text).quantize_down(exponent), expected)
+
+
+def test_quantize_down_raises_as_decimal_does():
+    with pytest.raises(InvalidOperation):
+        Decimal('123456789012345678').quantize(Decimal('1E-2'), rounding=ROUND_DOWN)
+    with pytest.raises(InvalidOperation):
+        FixedPointArray.from_text(['1', '123456789012345678']).quantize_down(-2)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_to_strings_matches_decimal_format(seed):
+    text = values(seed)
+    x = FixedPointArray.from_text(text)
+    expected = [format(Decimal(v), 'f') for v in text]
+    assert x.to_strings().tolist() == expected
+    rows = np.arange(0, len(text), 7)
+    assert x.to_strings(rows).tolist() == [expected[i] for i in rows]
+    # The block formatter handles columns with one exponent
+    same = FixedPointArray.from_text([v for v in text if '.' not in v and 'E' not in v.upper() and v != 'NaN'])
+    assert same.to_strings().tolist() == [format(value, 'f') for value in same.to_decimal()]
+
+
+@pytest.mark.parametrize('numerator, error', [('1', DivisionByZero), ('-2.5', DivisionByZero), ('0', InvalidOperation)])
+def test_division_by_zero_raises_as_decimal_does(numerator, error):
+    with pytest.raises(error):
+        Decimal(numerator) / Decimal('0')
+    with pytest.raises(error):
+        FixedPointArray.from_text(['1', numerator]) / FixedPointArray.from_text(['3', '0.00'])
+
+
+def test_division_by_zero_without_traps_matches_decimal():
+    with localcontext() as context:
+        context.traps[DivisionByZero] = context.traps[InvalidOperation] = False
+        a, b = ['1', '-2.5', '0', '6'], ['0', '-0', '0.0', '4']
+        expected = [Decimal(x) / Decimal(y) for x, y in zip(a, b)]
+        result = FixedPointArray.from_text(a) / FixedPointArray.from_text(b)
+        assert [str(value) for value in result.to_decimal()] == [str(value) for value in expected]
@@ -0,0 +1,66 @@
+import pytest
+
+from jobs import CANCELLED, PARTIAL_ROWS, JobCancelled, JobPool
+from streaming import validate_deposits_chunked
+from synthetic import generate
+from validation import recalculate_deposits
+
+
+@pytest.fixture
+def pool():
+    return JobPool(workers=1)
+
+
+def test_publish_keeps_a_snapshot(tmp_path, pool):
+    path = tmp_path / 'deposits.csv'
+    df, _ = generate('deposit', 2000, discrepancy_rate=0.5)
+    df.to_csv(path, index=False)
+    published = []
+
+    def work(job):
+        def partial(summary):
+            job.publish(summary)
+            published.append((job.partial, summary.total_rows, summary.invalid_count))
+        return validate_deposits_chunked(str(path), chunksize=500, partial=partial)
+
+    job = pool.submit('deposits', work)
+    summary = job.result()
+    assert len(published) == 4
+    for snapshot, total_rows, invalid_count in published:
+        # Later chunks do not change what was published before them
+        assert snapshot is not summary
+        assert (snapshot.total_rows, snapshot.invalid_count) == (total_rows, invalid_count)
+        assert snapshot.mismatch_counts is not summary.mismatch_counts
+        assert len(snapshot.offending_rows) == min(invalid_count, PARTIAL_ROWS)
+        assert snapshot.report is None
+    assert published[-1][0].mismatch_counts == summary.mismatch_counts
+    assert published[-1][0].offending_rows.equals(summary.offending_rows.head(PARTIAL_ROWS))
+
+
+def test_whole_file_job_stops_between_formulas(pool):
+    df, _ = generate('deposit', 100)
+    steps = []
+
+    def work(job):
+        def checkpoint():
+            steps.append(1)
+            if len(steps) == 3:
+                job.cancel()
+            job.checkpoint()
+        return recalculate_deposits(df, checkpoint=checkpoint)
+
+    job = pool.submit('deposits', work)
+    job.wait()
+    assert job.state == CANCELLED
+    assert len(steps) == 3
+    with pytest.raises(JobCancelled):
+        job.result()
+
+
+def test_job_is_profiled_on_its_own_thread(pool):
+    df, _ = generate('deposit', 100)
+    job = pool.submit('deposits', lambda job: recalculate_deposits(df), profile='cProfile')
+    job.result()
+    assert job.profile.tool == 'cProfile'
+    assert 'recalculate_deposits' in job.profile.report()
+    assert pool.submit('other', lambda job: None).profile is None
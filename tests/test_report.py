@@ -0,0 +1,49 @@
+import pytest
+
+from report import TOTAL, MismatchReport
+from synthetic import generate
+from validation import recalculate_and_validate_deposits, recalculate_and_validate_withdrawals
+
+MARKUPS = [f"Mark up rate {n} - Value - {name}" for n, name in [
+    (1, 'Gold price fluctuation'), (2, 'Withdrawal transasaction & gas fee'), (3, 'Crypto to fiat conversion'),
+    (4, 'Business risk reserve'), (5, 'Transfer transasaction & gas fee')]]
+
+
+def total(results, frame):
+    report = MismatchReport(list(results.mismatch_counts()))
+    report.add_results(results, frame)
+    table = report.table(by=[])
+    assert table['Group'].tolist() == [TOTAL]
+    return table.iloc[0]
+
+
+def test_revenue_error_is_not_counted_in_usd_discrepancy():
+    df, _ = generate('deposit', 200, discrepancy_rate=0)
+    # The markups are shares of the exported Revenue - COGs, so one wrong Revenue fails all six
+    error = 5.0
+    df.loc[7, 'Revenue'] += error
+    row = total(recalculate_and_validate_deposits(df), df)
+    assert row['Invalid'] == 1
+    assert row['Revenue Mismatches'] == 1
+    assert row['Revenue Discrepancy'] == pytest.approx(error)
+    assert [row[f"{col} Mismatches"] for col in MARKUPS] == [1] * len(MARKUPS)
+    assert sum(row[f"{col} Discrepancy"] for col in MARKUPS) == pytest.approx(error)
+    assert row['USD Discrepancy'] == 0
+
+
+def test_usd_discrepancy_is_the_usd_amount():
+    df, _ = generate('deposit', 200, discrepancy_rate=0)
+    df.loc[[3, 11], 'Deposit Amount USD'] += [2.0, -0.5]
+    row = total(recalculate_and_validate_deposits(df), df)
+    assert row['Deposit Amount USD Mismatches'] == 2
+    assert row['USD Discrepancy'] == pytest.approx(2.5)
+    assert row['USD Discrepancy'] == row['Deposit Amount USD Discrepancy']
+
+    withdrawals, _ = generate('withdraw', 200, discrepancy_rate=0)
+    withdrawals.loc[5, 'Withdraw Amount USD'] += 1.25
+    withdrawals.loc[5, 'Transaction Fee USD'] += 1.0
+    row = total(recalculate_and_validate_withdrawals(withdrawals), withdrawals)
+    assert row['Transaction Fee USD Mismatches'] == 1
+    assert row['USD Discrepancy'] == row['Withdraw Amount USD Discrepancy']
+    # Withdraw amounts are exported in cents
+    assert row['USD Discrepancy'] == pytest.approx(1.25, abs=0.01)
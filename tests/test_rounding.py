@@ -0,0 +1,104 @@
+from decimal import Context, Decimal
+
+import numpy as np
+import pytest
+
+from rounding import MAX_PLACES, ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP, ROUNDING_MODES, round_places
+
+PLACES = range(16)
+
+
+def quantized(values, places, rounding):
+    # The reference: Decimal of each value's shortest text, quantized with enough precision
+    quantum = Decimal(1).scaleb(-places)
+    context = Context(prec=400)
+    return np.array([x if not np.isfinite(x) else float(Decimal(repr(x)).quantize(quantum, rounding=rounding,
+                                                                                  context=context))
+                     for x in np.asarray(values, dtype=float).tolist()])
+
+
+def assert_quantized(values, places, rounding):
+    expected = quantized(values, places, rounding)
+    result = round_places(values, places, rounding)
+    np.testing.assert_array_equal(result, expected)
+    # Zeros keep the sign Decimal gives them
+    np.testing.assert_array_equal(np.signbit(result), np.signbit(expected))
+
+
+def amounts(seed=0, rows=2000):
+    # Cent amounts, their products with rates, and arbitrary floats, as the deposit formulas produce
+    rng = np.random.default_rng(seed)
+    cents = rng.integers(1, 10 ** 7, rows) / 100
+    rates = rng.integers(1, 10 ** 4, rows) / 100
+    values = np.concatenate([cents, cents * rates / 100, rng.random(rows) * 1000, rng.random(rows) / 1000])
+    return np.concatenate([values, -values])
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+@pytest.mark.parametrize('places', PLACES)
+def test_matches_decimal_quantize(places, rounding):
+    assert_quantized(amounts(places), places, rounding)
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+@pytest.mark.parametrize('places', PLACES)
+def test_decimal_ties(places, rounding):
+    # Exact decimal ties such as 0.125 at two places, whether or not the float is exactly the tie
+    rng = np.random.default_rng(places)
+    grid = rng.integers(0, 10 ** 6, 500)
+    ties = np.array([float(f"{n}5E-{places + 1}") for n in grid.tolist()] + [0.5, 1.5, 2.5, 0.125, 0.285, 1.005])
+    assert_quantized(np.concatenate([ties, -ties]), places, rounding)
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+@pytest.mark.parametrize('places', PLACES)
+def test_grid_points(places, rounding):
+    # Values that are exactly on the grid in decimal but not in binary, e.g. 0.29
+    rng = np.random.default_rng(places)
+    points = np.array([float(f"{n}E-{places}") for n in rng.integers(0, 10 ** 8, 500).tolist()])
+    assert_quantized(np.concatenate([points, -points]), places, rounding)
+
+
+def test_known_values():
+    assert round_places(np.array([0.29, 1.1, -0.29]), 2, ROUND_DOWN).tolist() == [0.29, 1.1, -0.29]
+    assert round_places(np.array([2.5, 3.5, -2.5]), 0, ROUND_HALF_EVEN).tolist() == [2.0, 4.0, -2.0]
+    assert round_places(np.array([2.5, 3.5, -2.5]), 0, ROUND_HALF_UP).tolist() == [3.0, 4.0, -3.0]
+    assert round_places(np.array([1.005, 0.125]), 2, ROUND_HALF_UP).tolist() == [1.01, 0.13]
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+def test_negative_zero(rounding):
+    result = round_places(np.array([-0.001, -0.0, 0.0]), 2, rounding)
+    assert result.tolist() == [0.0, 0.0, 0.0]
+    assert np.signbit(result).tolist() == [True, True, False]
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+@pytest.mark.parametrize('places', [0, 2, MAX_PLACES])
+def test_non_finite_unchanged(places, rounding):
+    result = round_places(np.array([np.nan, np.inf, -np.inf, 1.0]), places, rounding)
+    assert np.isnan(result[0])
+    assert result[1:].tolist() == [np.inf, -np.inf, 1.0]
+
+
+@pytest.mark.parametrize('rounding', ROUNDING_MODES)
+@pytest.mark.parametrize('places', [0, 2, 8, 15])
+def test_large_magnitudes(places, rounding):
+    # Past 2 ** 48 after scaling, values are rounded through Decimal
+    values = np.array([2.0 ** 48, 2.0 ** 53 + 2, 123456789012.345, 98765432109876.54, 1e15 + 0.5, 1e17, 1e300,
+                       np.finfo(float).max, 281474976710655.5, 4503599627370495.5])
+    assert_quantized(np.concatenate([values, -values]), places, rounding)
+
+
+def test_scalar_and_list_input():
+    assert round_places([0.29], 2).tolist() == [0.29]
+    assert round_places(1.239, 2).tolist() == 1.23
+
+
+def test_rejects_unknown_mode_and_places():
+    with pytest.raises(ValueError):
+        round_places(np.array([1.0]), 2, 'ROUND_CEILING')
+    with pytest.raises(ValueError):
+        round_places(np.array([1.0]), -1)
+    with pytest.raises(ValueError):
+        round_places(np.array([1.0]), MAX_PLACES + 1)
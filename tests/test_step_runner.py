@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from step_runner import (FULL_SEARCH_EVERY, MAX_POLL_INTERVAL, POLL_INTERVAL, ReplayScreen, StepRunner, StepTimeout,
+                         step_action)
+from template_matcher import Match
+
+
+class FakeClock:
+    """Time that only moves when the runner sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeMatcher:
+    """Finds a template on a frame when the frame's number lists it; frames are tiny arrays numbered in [0, 0]."""
+
+    def __init__(self, visible):
+        self.visible = visible
+        self.zoom = 1.0
+        self.calls = []
+        self.forgotten = 0
+
+    def locate(self, template, frame, region=None, scales=None):
+        name = template.rsplit('/', 1)[-1].removesuffix('.png')
+        self.calls.append((name, scales))
+        if name in self.visible.get(int(frame[0, 0]), ()):
+            return Match(name, 10, 20, 30, 10, 1.0, 0.99)
+        return None
+
+    def forget(self, template=None):
+        self.forgotten += 1
+
+
+def frames(count):
+    return [np.full((4, 4), i, dtype=np.uint8) for i in range(count)]
+
+
+def make_runner(steps, visible, count, latency=0.3, **kwargs):
+    clock = FakeClock()
+    screen = ReplayScreen(frames(count), latency, clock=clock)
+    runner = StepRunner(steps, FakeMatcher(visible), screen, clock=clock, sleep=clock.sleep, **kwargs)
+    return runner, screen, clock
+
+
+def test_waits_for_the_next_screen_instead_of_sleeping():
+    steps = [{"clickImage": "IMGtemplate/a.png", "sleepTime": 6}, {"wait": "IMGtemplate/b.png", "sleepTime": 1}]
+    runner, screen, clock = make_runner(steps, {0: {'a'}, 1: {'b'}}, 2)
+    records = runner.run()
+    assert [record['status'] for record in records] == ['ok', 'ok']
+    assert screen.actions == [('click', (25, 25))]
+    # b appears 0.3 s after the click; the runner sees it within one poll interval
+    assert 0.3 <= records[1]['wait_seconds'] <= 0.3 + MAX_POLL_INTERVAL
+    assert records[1]['polls'] > 1 and records[1]['attempts'] == 1
+    assert clock.now < 1
+
+
+def test_polls_back_off_and_search_every_scale_periodically():
+    runner, _, clock = make_runner([{"wait": "never.png"}], {}, 1)
+    match, polls = runner.wait_for('never.png', 3.0)
+    assert match is None
+    assert clock.sleeps[0] == pytest.approx(POLL_INTERVAL)
+    assert all(b >= a for a, b in zip(clock.sleeps, clock.sleeps[1:-1]))
+    assert max(clock.sleeps) == pytest.approx(MAX_POLL_INTERVAL)
+    assert clock.now == pytest.approx(3.0)
+    scales = [scale for _, scale in runner.matcher.calls]
+    assert len(scales) == polls
+    # Every FULL_SEARCH_EVERY-th poll and the last one try every scale; the rest only the current zoom
+    for poll, scale in enumerate(scales, 1):
+        full = poll % FULL_SEARCH_EVERY == 0 or poll == polls
+        assert (scale is None) == full, poll
+
+
+def test_timeout_raises_after_every_retry():
+    steps = [{"wait": "IMGtemplate/never.png", "timeout": 1.0, "retries": 2}]
+    runner, _, clock = make_runner(steps, {}, 1)
+    with pytest.raises(StepTimeout) as raised:
+        runner.run(transaction=7)
+    assert (raised.value.transaction, raised.value.step, raised.value.template) == (7, 0, "IMGtemplate/never.png")
+    record = runner.records[-1]
+    assert record['status'] == 'timeout' and record['attempts'] == 3
+    assert 3.0 <= record['wait_seconds'] <= 3.0 + MAX_POLL_INTERVAL
+    assert clock.now == pytest.approx(record['wait_seconds'])
+
+
+def test_retry_clicks_a_lost_click_again():
+    steps = [{"clickImage": "a.png"}, {"wait": "b.png", "timeout": 1.0}]
+    # The first click is lost (its screen would take 100 s); the re-click gets a response
+    runner, screen, _ = make_runner(steps, {0: {'a'}, 1: {'b'}, 2: {'b'}}, 3, latency=[100.0, 0.1, 0.1])
+    records = runner.run()
+    assert records[1]['status'] == 'ok' and records[1]['attempts'] == 2
+    assert screen.actions == [('click', (25, 25)), ('click', (25, 25))]
+
+
+def test_no_retry_click_when_the_previous_button_is_gone():
+    steps = [{"clickImage": "a.png"}, {"wait": "b.png", "timeout": 0.5}]
+    runner, screen, _ = make_runner(steps, {0: {'a'}}, 2)
+    with pytest.raises(StepTimeout):
+        runner.run()
+    assert screen.actions == [('click', (25, 25))]
+
+
+def test_run_many_keeps_going_past_a_timeout():
+    steps = [{"clickImage": "a.png"}, {"wait": "b.png", "timeout": 0.5, "retries": 0}, {"transactionValue": "G"}]
+    # Frames a, b, value typed; the second transaction never sees b
+    runner, screen, _ = make_runner(steps, {0: {'a'}, 1: {'b'}, 2: {'a'}}, 4, latency=0.1)
+    records = runner.run_many([10, 20], keep_going=True)
+    assert [(record['transaction'], record['status']) for record in records] == [
+        (0, 'ok'), (0, 'ok'), (0, 'ok'), (1, 'ok'), (1, 'timeout')]
+    assert runner.matcher.forgotten == 1
+    assert ('type', '10') in screen.actions and ('type', '20') not in screen.actions
+    with pytest.raises(StepTimeout):
+        runner.run_many([30])
+
+
+def test_typing_after_a_click_waits_for_the_screen_to_change():
+    pytest.importorskip('cv2')
+    steps = [{"clickImage": "a.png"}, {"type": "usdc", "timeout": 1.0}]
+    changing = [np.zeros((40, 40), dtype=np.uint8), np.full((40, 40), 255, dtype=np.uint8)]
+    clock = FakeClock()
+    screen = ReplayScreen(changing, 0.2, clock=clock)
+    runner = StepRunner(steps, FakeMatcher({0: {'a'}}), screen, clock=clock, sleep=clock.sleep)
+    records = runner.run()
+    assert records[1]['status'] == 'ok' and 0.2 <= records[1]['wait_seconds'] <= 0.2 + MAX_POLL_INTERVAL
+    assert screen.actions[-1] == ('type', 'usdc')
+
+    # A screen that never reacts is typed into anyway after the timeout, marked unchanged
+    clock = FakeClock()
+    screen = ReplayScreen([changing[0]], 0.2, clock=clock)
+    runner = StepRunner(steps, FakeMatcher({0: {'a'}}), screen, clock=clock, sleep=clock.sleep)
+    records = runner.run()
+    assert records[1]['status'] == 'unchanged' and records[1]['wait_seconds'] == pytest.approx(1.0)
+
+
+def test_steps_need_exactly_one_action():
+    assert step_action({"wait": "a.png", "sleepTime": 1}) == 'wait'
+    with pytest.raises(ValueError):
+        step_action({"sleepTime": 1})
+    with pytest.raises(ValueError):
+        StepRunner([{"wait": "a.png", "type": "x"}], FakeMatcher({}), ReplayScreen(frames(1)))
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from formulas import DEPOSIT_FORMULAS
+from store import LOOKUP_BATCH, ValidationStore, validate_deposits_incremental
+from streaming import validate_deposits_chunked
+from synthetic import generate
+from validation import DEFAULT_TOLERANCES, VALID
+
+CHUNK = 700
+
+
+@pytest.fixture
+def store():
+    with ValidationStore(':memory:') as store:
+        yield store
+
+
+def write(df, path):
+    if str(path).endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(params=['csv', 'parquet'])
+def exports(request, tmp_path):
+    # A cumulative export: day 2 repeats day 1, corrects nothing, breaks one valid row and adds new rows
+    first, injected = generate('deposit', 1500, seed=1, discrepancy_rate=0.05)
+    later, _ = generate('deposit', 900, seed=1, discrepancy_rate=0.05, start=len(first))
+    second = pd.concat([first, later], ignore_index=True)
+    changed = int(np.setdiff1d(np.arange(len(first)), injected['Row'])[10])
+    second.loc[changed, 'COGs'] += 1.0
+    ext = request.param
+    return (write(first, tmp_path / f"day1.{ext}"), write(second, tmp_path / f"day2.{ext}"),
+            second.loc[changed, 'Transaction ID'], len(later))
+
+
+def assert_same_summary(incremental, path, tolerances=DEFAULT_TOLERANCES):
+    expected = validate_deposits_chunked(path, tolerances, chunksize=CHUNK)
+    assert incremental.total_rows == expected.total_rows
+    assert incremental.invalid_count == expected.invalid_count
+    assert incremental.mismatch_counts == expected.mismatch_counts
+    assert incremental.offending_rows['Transaction ID'].tolist() == expected.offending_rows['Transaction ID'].tolist()
+    return expected
+
+
+def run(store, path, tolerances=DEFAULT_TOLERANCES, formulas=DEPOSIT_FORMULAS):
+    summary = validate_deposits_incremental(path, store, tolerances, chunksize=CHUNK, formulas=formulas)
+    return summary, store.runs().set_index('run_id').loc[summary.run_id]
+
+
+def test_second_export_recalculates_only_its_delta(store, exports):
+    day1, day2, changed_id, added = exports
+    first, stats = run(store, day1)
+    expected = assert_same_summary(first, day1)
+    assert expected.invalid_count > 0
+    assert (stats['total_rows'], stats['new_rows'], stats['recalculated_rows']) == (1500, 1500, 1500)
+
+    second, stats = run(store, day2)
+    assert_same_summary(second, day2)
+    # New rows, the changed row, and the rows that failed before (to show them again)
+    assert stats['new_rows'] == added + 1
+    assert stats['recalculated_rows'] == added + 1 + first.invalid_count
+    assert stats['invalid_count'] == second.invalid_count
+
+    again, stats = run(store, day2)
+    assert_same_summary(again, day2)
+    assert stats['new_rows'] == 0
+    assert stats['recalculated_rows'] == second.invalid_count
+
+
+def test_changed_tolerances_or_formulas_start_a_new_version(store, exports):
+    day1, _, _, _ = exports
+    run(store, day1)
+    loose = dict(DEFAULT_TOLERANCES, **{'RC_COGs': 2.0})
+    summary, stats = run(store, day1, loose)
+    assert_same_summary(summary, day1, loose)
+    assert stats['recalculated_rows'] == stats['new_rows'] == 1500
+
+    formulas = dict(DEPOSIT_FORMULAS, **{'RC_COGs': DEPOSIT_FORMULAS['RC_COGs'] + ' * 1'})
+    _, stats = run(store, day1, formulas=formulas)
+    assert stats['recalculated_rows'] == stats['new_rows'] == 1500
+    assert store.runs()['version_id'].nunique() == 3
+
+
+def test_first_failure(store, exports):
+    day1, day2, changed_id, _ = exports
+    first, _ = run(store, day1)
+    failed_id = first.offending_rows['Transaction ID'].iloc[0]
+    second, _ = run(store, day2)
+    run(store, day2)
+
+    failure = store.first_failure(failed_id)
+    assert failure['run_id'] == first.run_id
+    assert len(store.history(failed_id)) == 1
+
+    # Valid on day 1, broken on day 2: one history row per content
+    history = store.history(changed_id)
+    assert history['status'].tolist()[0] == VALID
+    assert store.first_failure(changed_id)['run_id'] == second.run_id
+    assert store.first_failure('no such transaction') is None
+
+
+def test_lookup_reads_only_the_given_keys(store):
+    version = store.version(validate_deposits_chunked, DEFAULT_TOLERANCES, DEPOSIT_FORMULAS)
+    other = store.version(validate_deposits_chunked, {}, DEPOSIT_FORMULAS)
+    run_id = store.begin_run(version)
+    keys = np.arange(-LOOKUP_BATCH, 2 * LOOKUP_BATCH, dtype=np.int64) * 7919
+    codes = np.where(keys % 3 == 0, 2, 0)
+    store.record(version, run_id, keys, keys.astype(str).astype(object), codes,
+                 [VALID] * len(keys), [None] * len(keys))
+    probe = np.concatenate([keys[::5], keys[::5], [1, 2, 3]])
+    known, failed = store.lookup(version, probe)
+    assert known.tolist() == [True] * (2 * len(keys[::5])) + [False] * 3
+    assert failed.tolist() == (np.isin(probe, keys[codes != 0])).tolist()
+    assert not store.lookup(other, keys)[0].any()
+    assert [array.tolist() for array in store.lookup(version, keys[:0])] == [[], []]
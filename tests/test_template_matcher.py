@@ -0,0 +1,94 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from template_matcher import TEMPLATE_DIR, TemplateMatcher, load_image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'screens')
+
+# Allowed distance from the expected centre, in pixels
+TOLERANCE = 4
+
+
+def load_fixtures():
+    # Saved screenshots (800x450 grayscale; 100%, 80% and 125% zoom) and each template's centre on them
+    with open(os.path.join(FIXTURES, 'expected.json')) as f:
+        expected = json.load(f)
+    return [(name, load_image(os.path.join(FIXTURES, name)), {k: tuple(v) if v else None for k, v in centres.items()})
+            for name, centres in expected.items()]
+
+
+SCREENS = load_fixtures()
+NAMES = list(SCREENS[0][2])
+
+
+@pytest.fixture
+def matcher():
+    templates = {name: os.path.join(ROOT, TEMPLATE_DIR, f"{name}.png") for name in NAMES}
+    return TemplateMatcher(templates)
+
+
+def assert_found(found, expected):
+    for name, centre in expected.items():
+        match = found[name]
+        if centre is None:
+            assert match is None, f"{name} is absent but matched {match}"
+            continue
+        assert match is not None, f"{name} not found"
+        assert max(abs(match.center[0] - centre[0]), abs(match.center[1] - centre[1])) <= TOLERANCE, (name, match)
+
+
+@pytest.mark.parametrize('screen', range(len(SCREENS)))
+def test_finds_every_template(matcher, screen):
+    _, frame, expected = SCREENS[screen]
+    assert_found(matcher.match_all(frame), expected)
+
+
+@pytest.mark.parametrize('screen', range(len(SCREENS)))
+def test_remembered_region_gives_the_same_match(matcher, screen):
+    _, frame, expected = SCREENS[screen]
+    cold = matcher.match_all(frame)
+    warm = {name: matcher.locate(name, frame) for name in expected}
+    assert_found(warm, expected)
+    for name, match in cold.items():
+        assert (match is None) == (warm[name] is None)
+        if match is not None:
+            assert warm[name].box == match.box
+
+
+def test_zoom_follows_the_screenshot(matcher):
+    _, frame, _ = SCREENS[1]
+    matcher.match_all(frame)
+    assert matcher.zoom == 0.8
+    matcher.forget()
+    assert matcher.zoom == 1.0
+
+
+def test_rgb_frames_match_like_gray(matcher):
+    _, frame, expected = SCREENS[0]
+    rgb = np.repeat(frame[:, :, None], 3, axis=2)
+    assert_found(matcher.match_all(rgb), expected)
+
+
+def test_region_limits_the_search(matcher):
+    _, frame, expected = SCREENS[0]
+    cx, cy = expected['next']
+    assert matcher.locate('next', frame, region=(cx - 120, cy - 40, 240, 80)) is not None
+    matcher.forget()
+    # A strip of the screen beside the button finds nothing above min_confidence
+    width, height = frame.shape[1], frame.shape[0]
+    away = (0, 0, cx - 100, height) if cx > width // 2 else (cx + 100, 0, width - cx - 100, height)
+    assert matcher.locate('next', frame, region=away) is None
+
+
+def test_template_paths_and_unknown_names(matcher):
+    _, frame, expected = SCREENS[0]
+    match = matcher.locate(os.path.join(TEMPLATE_DIR, 'send.png'), frame)
+    assert match is not None and match.name == 'send'
+    with pytest.raises(ValueError):
+        matcher.locate('missing', frame)
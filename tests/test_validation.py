@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic import generate
+from validation import DEFAULT_TOLERANCES, recalculate_and_validate_deposits
+
+# The row-wise formulas and checks exactly as main.py had them before the columnar engine
+LEGACY_RECALCULATIONS = {
+    'RC_CLEO.Lit Sell GDR/USD - Reference': lambda row: row['CLEO.Lit Buy GDR/USD - Reference'] * (100 + row['Total Markup - For Referrence']) / 100,
+    'RC_Deposit Amount USD': lambda row: row['Deposit Amount OC'] * row['CLEO.lit Buy Token/USD Reference'],
+    'RC_GDR Client Receive': lambda row: row['RC_Deposit Amount USD'] / row['RC_CLEO.Lit Sell GDR/USD - Reference'],
+    'RC_COGs': lambda row: row['GDR Client Receive'] * row['CLEO.Lit Buy GDR/USD - Reference'],
+    'RC_Revenue': lambda row: row['GDR Client Receive'] * row['RC_CLEO.Lit Sell GDR/USD - Reference'],
+    'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': lambda row: row['Mark up rate 5 - Transfer transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 4 - Value - Business risk reserve': lambda row: row['Mark up rate 4 - Business risk reserve'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 3 - Value - Crypto to fiat conversion': lambda row: row['Mark up rate 3 - Crypto to fiat conversion'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': lambda row: row['Mark up rate 2 - Withdrawal transasaction & gas fee'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs']),
+    'RC_Mark up rate 1 - Value - Gold price fluctuation': lambda row: row['Mark up rate 1 - Gold Price Fluctuation'] / row['Total Markup - For Referrence'] * (row['Revenue'] - row['COGs'])
+}
+
+
+def legacy_recalculate_and_validate_deposits(df, tolerances):
+    for col, func in LEGACY_RECALCULATIONS.items():
+        df[col] = df.apply(func, axis=1)
+
+    results = []
+    for index, row in df.iterrows():
+        status = "Valid"
+        discrepancies = []
+        if row['Amount Dc'] <= 0:
+            status = "Invalid - Amount should be positive"
+        for col_name in tolerances:
+            if col_name in df.columns:
+                if abs(row[col_name] - row[col_name.replace('RC_', '')]) > tolerances[col_name]:
+                    status = f"Invalid - Discrepancy in {col_name.replace('RC_', '')}"
+                    discrepancies.append({
+                        'Column': col_name.replace('RC_', ''),
+                        'Expected': row[col_name.replace('RC_', '')],
+                        'Actual': row[col_name]
+                    })
+        result = {'Transaction ID': row['Transaction ID'], 'Status': status, 'Discrepancies': discrepancies}
+        for col_name in LEGACY_RECALCULATIONS:
+            result[col_name] = row[col_name]
+            result[col_name.replace('RC_', '')] = row[col_name.replace('RC_', '')]
+        results.append(result)
+    return pd.DataFrame(results)
+
+
+def deposits(seed, rows=1500):
+    # Discrepancies in every checked column, missing inputs and outputs, and non-positive amounts
+    df, _ = generate('deposit', rows, seed, discrepancy_rate=0.05)
+    rng = np.random.default_rng(seed)
+    inputs = ['Deposit Amount OC', 'CLEO.Lit Buy GDR/USD - Reference', 'Total Markup - For Referrence', 'COGs',
+              'Revenue', 'GDR Client Receive', 'Mark up rate 3 - Value - Crypto to fiat conversion']
+    for col in inputs:
+        df.loc[rng.random(rows) < 0.01, col] = np.nan
+    df.loc[rng.random(rows) < 0.03, 'Amount Dc'] = 0.0
+    df.loc[rng.random(rows) < 0.03, 'Amount Dc'] *= -1
+    return df
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('tolerances', [DEFAULT_TOLERANCES, dict.fromkeys(DEFAULT_TOLERANCES, 1e-2),
+                                        {'RC_COGs': 0.5, 'RC_Revenue': 1e-10}])
+def test_matches_row_wise_validation(seed, tolerances):
+    df = deposits(seed)
+    expected = legacy_recalculate_and_validate_deposits(df.copy(), tolerances)
+    results = recalculate_and_validate_deposits(df.copy(), tolerances)
+    assert (expected['Status'] != 'Valid').any() and (expected['Discrepancies'].str.len() > 0).any()
+
+    frame = results.to_frame(discrepancies='records').astype({'Status': object})
+    pd.testing.assert_frame_equal(frame, expected)
+    assert results.invalid_count == (expected['Status'] != 'Valid').sum()
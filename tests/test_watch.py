@@ -0,0 +1,49 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+import watch
+from schema import WITHDRAW_SCHEMA
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    pd.DataFrame(columns=WITHDRAW_SCHEMA.columns).to_csv(tmp_path / 'empty.csv', index=False)
+    return tmp_path
+
+
+def run_once(inbox):
+    watcher = watch.InboxWatcher(str(inbox), workers=1)
+    try:
+        runner = threading.Thread(target=watcher.run, kwargs={'once': True}, daemon=True)
+        runner.start()
+        runner.join(30)
+        assert not runner.is_alive(), "run(once=True) did not return"
+    finally:
+        watcher.close()
+    return watcher
+
+
+def summary(inbox, name):
+    with open(inbox / f"{name}.summary.json") as f:
+        return json.load(f)
+
+
+def test_empty_export(inbox):
+    watcher = run_once(inbox)
+    assert (watcher.files_done, watcher.files_failed) == (1, 0)
+    assert summary(inbox, 'empty')['error'] is None
+    assert pd.read_csv(inbox / 'empty.report.csv')['Rows'].tolist() == [0]
+
+
+def test_unexpected_error_is_recorded(inbox, monkeypatch):
+    def fail(summaries, output):
+        raise AttributeError('no report')
+
+    monkeypatch.setattr(watch, 'write_reports', fail)
+    watcher = run_once(inbox)
+    assert (watcher.files_done, watcher.files_failed) == (0, 1)
+    assert summary(inbox, 'empty')['error'] == 'AttributeError: no report'
+    assert watcher.status()['queue_depth'] == 0
@@ -0,0 +1,679 @@
+from decimal import Decimal, ROUND_DOWN
+
+import numpy as np
+import pandas as pd
+
+import perf
+from fixed_point import FixedPointArray
+from formulas import (DEPOSIT_FORMULAS, TRANSFER_FORMULAS, WITHDRAW_FORMULAS, XAU_BACKUP_DEPOSIT_FORMULAS,
+                      CompiledFormulas)
+from rounding import round_places
+
+# Default tolerances for each recalculated deposit column
+DEFAULT_TOLERANCES = {
+    'RC_CLEO.Lit Sell GDR/USD - Reference': 1e-15,
+    'RC_Deposit Amount USD': 1e-10,
+    'RC_GDR Client Receive': 1e-10,
+    'RC_COGs': 1e-10,
+    'RC_Revenue': 1e-10,
+    'RC_Mark up rate 5 - Value - Transfer transasaction & gas fee': 1e-10,
+    'RC_Mark up rate 4 - Value - Business risk reserve': 1e-10,
+    'RC_Mark up rate 3 - Value - Crypto to fiat conversion': 1e-10,
+    'RC_Mark up rate 2 - Value - Withdrawal transasaction & gas fee': 1e-10,
+    'RC_Mark up rate 1 - Value - Gold price fluctuation': 1e-10
+}
+
+DEPOSIT_RECALCULATIONS = CompiledFormulas(DEPOSIT_FORMULAS)
+XAU_BACKUP_DEPOSIT_RECALCULATIONS = CompiledFormulas(XAU_BACKUP_DEPOSIT_FORMULAS)
+TRANSFER_RECALCULATIONS = CompiledFormulas(TRANSFER_FORMULAS)
+WITHDRAW_RECALCULATIONS = CompiledFormulas(WITHDRAW_FORMULAS)
+
+# Withdraw exports carry amounts and fees in cents
+WITHDRAW_TOLERANCES = dict.fromkeys(WITHDRAW_FORMULAS, 1e-2)
+WITHDRAW_AMOUNT = 'Withdraw Amount OC'
+
+# Rows the row-by-row Decimal comparison checks between checkpoints
+CHECKPOINT_ROWS = 10_000
+
+VALID = "Valid"
+INVALID_AMOUNT = "Invalid - Amount should be positive"
+
+
+def status_codes(mismatch, invalid_amount):
+    """
+    Status category codes: 0 is Valid, 1 is the amount check, 2 + j a discrepancy in checked column j.
+
+    A row with several mismatches reports the last one in tolerance order, as the original
+    row loop did by overwriting its status.
+    """
+    codes = np.asarray(invalid_amount, dtype=np.int8).copy()
+    if mismatch.shape[1]:
+        last = mismatch.shape[1] - 1 - np.argmax(mismatch[:, ::-1], axis=1)
+        codes = np.where(mismatch.any(axis=1), 2 + last, codes).astype(np.int8)
+    return codes
+
+
+def _take(values, rows=None):
+    # FixedPointArray columns are formatted as exact decimal strings, for the requested rows only
+    if isinstance(values, FixedPointArray):
+        return values.to_strings(rows)
+    values = np.asarray(values)
+    return values if rows is None else values[rows]
+
+
+def _as_float(values, rows=None):
+    values = _take(values, rows)
+    # Decimal objects and exact decimal strings are approximated, which is enough to rank rows
+    if values.dtype == object:
+        return pd.to_numeric(values, errors='coerce').astype(float)
+    return values.astype(float, copy=False)
+
+
+def discrepancy_magnitude(recalculated, originals, rows=None):
+    """
+    Largest absolute difference between a recalculated value and the exported one, per row.
+
+    Parameters:
+        recalculated (dict): RC_ column -> values (float, Decimal, decimal strings or FixedPointArray).
+        originals (dict): RC_ column -> exported values.
+        rows (ndarray): Row positions to compute; all rows by default.
+
+    Returns:
+        ndarray: float per row; NaN where no value pair could be compared.
+    """
+    magnitude = None
+    for col_name, values in recalculated.items():
+        diff = np.abs(_as_float(values, rows) - _as_float(originals[col_name], rows))
+        magnitude = diff if magnitude is None else np.fmax(magnitude, diff)
+    return magnitude
+
+
+class ValidationResults:
+    """
+    Columnar outcome of a deposit validation.
+
+    Nothing is stored per row except one status code and one row of a boolean mismatch matrix;
+    the RC_ and exported values are the arrays the comparison used, not copies. Discrepancy
+    records and text are built on request, for the requested rows only.
+
+    Parameters:
+        transaction_ids (ndarray): Transaction ID per row.
+        columns (list): RC_ columns that were checked, in tolerance order.
+        mismatch (ndarray): Boolean matrix, rows x checked columns.
+        invalid_amount (ndarray): Rows failing the amount check.
+        recalculated (dict): RC_ column -> array (or FixedPointArray), in registry order.
+        originals (dict): RC_ column -> exported values of the matching original column.
+        expected_recalculated (bool): Report the RC_ value as 'Expected' and the exported value
+            as 'Actual' (deposit pages) instead of the other way round (main.py).
+        codes (ndarray): Precomputed status codes, see status_codes.
+    """
+
+    def __init__(self, transaction_ids, columns, mismatch, invalid_amount, recalculated, originals,
+                 expected_recalculated=False, codes=None):
+        self.transaction_ids = transaction_ids
+        self.columns = list(columns)
+        self.mismatch = mismatch
+        self.recalculated = recalculated
+        self.originals = originals
+        self.expected_recalculated = expected_recalculated
+        self.codes = status_codes(mismatch, invalid_amount) if codes is None else codes
+        self.categories = [VALID, INVALID_AMOUNT] + [f"Invalid - Discrepancy in {col.replace('RC_', '')}" for col in self.columns]
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def status(self):
+        return pd.Categorical.from_codes(self.codes, self.categories)
+
+    @property
+    def invalid(self):
+        return self.codes != 0
+
+    @property
+    def invalid_count(self):
+        return int(np.count_nonzero(self.codes))
+
+    def mismatch_counts(self):
+        """Mismatching rows per checked column, keyed by the original column name."""
+        counts = self.mismatch.sum(axis=0)
+        return {col.replace('RC_', ''): int(count) for col, count in zip(self.columns, counts)}
+
+    def magnitude(self, rows=None):
+        """discrepancy_magnitude of the given rows, for ranking the worst discrepancies first."""
+        return discrepancy_magnitude(self.recalculated, self.originals, None if rows is None else self._rows(rows))
+
+    def difference(self, col_name, rows=None):
+        """Absolute difference between the RC_ and exported values of one checked column, as float."""
+        return np.abs(_as_float(self.recalculated[col_name], rows) - _as_float(self.originals[col_name], rows))
+
+    def _rows(self, rows):
+        if rows is None:
+            return np.arange(len(self))
+        rows = np.asarray(rows)
+        return np.flatnonzero(rows) if rows.dtype == bool else rows
+
+    def frame(self, rows=None):
+        """
+        Transaction ID, Status and the RC_/original value pairs as a DataFrame.
+
+        With rows=None the value columns share memory with the stored arrays; FixedPointArray
+        columns are formatted, for the requested rows only.
+        """
+        rows = None if rows is None else self._rows(rows)
+        status = self.status
+        data = {'Transaction ID': _take(self.transaction_ids, rows), 'Status': status if rows is None else status[rows]}
+        for col_name, values in self.recalculated.items():
+            data[col_name] = _take(values, rows)
+            data[col_name.replace('RC_', '')] = _take(self.originals[col_name], rows)
+        return pd.DataFrame(data, copy=False)
+
+    def discrepancies(self, rows=None):
+        """
+        Discrepancy records for the given rows, as the former Discrepancies column held them.
+
+        Returns:
+            list: One list of {'Column', 'Expected', 'Actual'} dicts per row.
+        """
+        rows = self._rows(rows)
+        records = [[] for _ in range(len(rows))]
+        mismatch = self.mismatch[rows]
+        for j, col_name in enumerate(self.columns):
+            hit = np.flatnonzero(mismatch[:, j])
+            if not len(hit):
+                continue
+            original_col = col_name.replace('RC_', '')
+            values = _take(self.recalculated[col_name], rows[hit]).tolist()
+            originals = np.asarray(self.originals[col_name])[rows[hit]].tolist()
+            pairs = zip(values, originals) if self.expected_recalculated else zip(originals, values)
+            for i, (expected, actual) in zip(hit.tolist(), pairs):
+                records[i].append({
+                    'Column': original_col,
+                    'Expected': expected,
+                    'Actual': actual
+                })
+        return records
+
+    def discrepancy_text(self, rows=None):
+        """Human-readable discrepancies for the given rows; rows without any get an empty string."""
+        text = np.full(len(self._rows(rows)), '', dtype=object)
+        for i, items in enumerate(self.discrepancies(rows)):
+            if items:
+                text[i] = ', '.join([f"{item['Column']}: Expected {item['Expected']}, Actual {item['Actual']}" for item in items])
+        return text
+
+    @perf.timed(perf.RESULTS_FRAME)
+    def to_frame(self, rows=None, discrepancies='text'):
+        """
+        The classic results layout: Transaction ID, Status, Discrepancies, then value pairs.
+
+        Parameters:
+            rows (ndarray): Row positions or boolean mask to include; all rows by default.
+            discrepancies (str): 'text' for display strings or 'records' for lists of dicts.
+
+        Returns:
+            DataFrame: A new frame; only the requested rows pay for building discrepancies.
+        """
+        results = self.frame(rows)
+        if discrepancies == 'records':
+            results.insert(2, 'Discrepancies', self.discrepancies(rows))
+        else:
+            results.insert(2, 'Discrepancies', self.discrepancy_text(rows))
+        return results
+
+
+def recalculate_deposits(df, recalculations=DEPOSIT_RECALCULATIONS, checkpoint=None):
+    """
+    Evaluate the RC_ formulas over a deposit export without modifying it.
+
+    Parameters:
+        df (DataFrame): Deposit export.
+        recalculations (CompiledFormulas): Formula set to evaluate.
+        checkpoint (callable): Optional checkpoint() called between formula steps, e.g. Job.checkpoint.
+
+    Returns:
+        dict: RC_ column -> float array, in registry order.
+    """
+    return recalculations.evaluate(df, checkpoint=checkpoint)
+
+
+@perf.timed(perf.COMPARE)
+def validate_recalculated_deposits(df, recalculated, tolerances=None, invalid_amount=None, expected_recalculated=False):
+    """
+    Compare precomputed RC_ values against the exported values.
+
+    This is the cheap half of recalculate_and_validate_deposits: when only tolerances change,
+    the RC_ values from recalculate_deposits can be reused. Neither argument is modified.
+
+    Parameters:
+        df (DataFrame): Deposit export.
+        recalculated (dict): RC_ column -> array, as returned by recalculate_deposits.
+        tolerances (dict): Absolute tolerance per RC_ column. Defaults to DEFAULT_TOLERANCES.
+        invalid_amount (ndarray): Rows failing the amount check. Defaults to main.py's Amount Dc <= 0.
+        expected_recalculated (bool): Report the RC_ value as 'Expected', as the deposit pages do.
+
+    Returns:
+        ValidationResults: Status, mismatch matrix and the RC_/original value pairs.
+    """
+    if tolerances is None:
+        tolerances = DEFAULT_TOLERANCES
+    if invalid_amount is None:
+        invalid_amount = (df['Amount Dc'] <= 0).to_numpy()
+
+    # Comparison logic with custom tolerance for each recalculated column
+    columns = [col_name for col_name in tolerances if col_name in recalculated]
+    mismatch = np.zeros((len(df), len(columns)), dtype=bool)
+    originals = {}
+    for col_name in recalculated:
+        originals[col_name] = df[col_name.replace('RC_', '')].to_numpy()
+    for j, col_name in enumerate(columns):
+        mismatch[:, j] = np.abs(np.asarray(recalculated[col_name]) - originals[col_name]) > tolerances[col_name]
+
+    return ValidationResults(df['Transaction ID'].to_numpy(), columns, mismatch, invalid_amount,
+                             {col: np.asarray(values) for col, values in recalculated.items()}, originals,
+                             expected_recalculated)
+
+
+def recalculate_and_validate_deposits(df, tolerances=None):
+    """
+    Recalculate the RC_ columns and compare them against the exported values.
+
+    Every formula and comparison runs as whole-column arithmetic, and the result keeps a
+    boolean mismatch matrix rather than per-row discrepancy lists.
+
+    Parameters:
+        df (DataFrame): Deposit export. RC_ columns are added to it in place.
+        tolerances (dict): Absolute tolerance per RC_ column. Defaults to DEFAULT_TOLERANCES.
+
+    Returns:
+        ValidationResults: Status, mismatch matrix and the RC_/original value pairs.
+    """
+    recalculated = recalculate_deposits(df)
+    for col, values in recalculated.items():
+        df[col] = values
+    return validate_recalculated_deposits(df, recalculated, tolerances)
+
+
+def truncation_places(tolerance):
+    """Decimal places a float tolerance truncates to on the float deposit page, e.g. 0.01 -> 2."""
+    str_tolerance = f"{tolerance:.15f}".rstrip('0')
+    if '.' in str_tolerance:
+        return len(str_tolerance.split('.')[1])
+    return 0
+
+
+def recalculate_deposits_truncated(df, places, previous=None, previous_places=None,
+                                   recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS, checkpoint=None):
+    """
+    Evaluate the RC_ formulas in float, truncating each output to its decimal places.
+
+    Truncation is one array operation per column and cuts the shortest decimal form of each
+    float, as Decimal.quantize(..., ROUND_DOWN) would (0.29 stays 0.29, not 0.28).
+
+    Parameters:
+        df (DataFrame): Deposit export.
+        places (dict): Decimal places per RC_ column, from truncation_places.
+        previous (dict): Optional earlier result; with previous_places, only outputs whose places
+            changed (and the formulas that read them) are recalculated.
+        previous_places (dict): The places previous was computed with.
+        checkpoint (callable): Optional checkpoint() called between formula steps.
+
+    Returns:
+        dict: RC_ column -> float array.
+    """
+    def finalize(col, values):
+        if col not in places:
+            return values
+        return round_places(values, places[col], ROUND_DOWN)
+
+    changed = None
+    if previous is not None:
+        changed = [col for col in places if places[col] != previous_places.get(col)]
+    return recalculations.evaluate(df, finalize=finalize, previous=previous, changed=changed,
+                                   checkpoint=checkpoint)
+
+
+def amount_not_positive(df, column='Amount Dc'):
+    """Amount check of the deposit pages and withdrawals: only amounts above zero are valid (NaN is not)."""
+    return ~(df[column] > 0).to_numpy()
+
+
+def recalculate_and_validate_deposits_truncated(df, tolerances):
+    """
+    The float deposit page's validation: XAU backup rate, RC_ values truncated to the decimal
+    places of each tolerance, Expected reported from the RC_ value. df is not modified.
+    """
+    places = {col: truncation_places(tolerance) for col, tolerance in tolerances.items()}
+    recalculated = recalculate_deposits_truncated(df, places)
+    return validate_recalculated_deposits(df, recalculated, tolerances, invalid_amount=amount_not_positive(df),
+                                          expected_recalculated=True)
+
+
+class ToleranceValidator:
+    """
+    Validation state that is updated incrementally as tolerances change.
+
+    For every RC_ column the absolute differences to the exported values are sorted once, so
+    the rows outside a tolerance are a suffix of that order found by binary search. When one
+    tolerance moves, only the rows between its old and new cut points change state, and only
+    their status codes are recomputed.
+
+    Parameters:
+        df (DataFrame): Deposit export. Only read.
+        recalculated (dict): RC_ column -> float array, as returned by recalculate_deposits.
+        invalid_amount (ndarray): Rows failing the amount check.
+        expected_recalculated (bool): Passed through to ValidationResults.
+    """
+
+    @perf.timed(perf.TOLERANCE_INDEX)
+    def __init__(self, df, recalculated, invalid_amount, expected_recalculated=False):
+        self.n = len(df)
+        self.invalid_amount = np.asarray(invalid_amount, dtype=bool)
+        self.expected_recalculated = expected_recalculated
+        self.transaction_ids = df['Transaction ID'].to_numpy()
+        self._columns = None
+        self._values = {}
+        self._originals = {}
+        self._order = {}
+        self._sorted = {}
+        self._finite = {}
+
+        for col_name, values in recalculated.items():
+            self._originals[col_name] = df[col_name.replace('RC_', '')].to_numpy()
+            self._index(col_name, np.asarray(values))
+
+    def _index(self, col_name, values):
+        diff = np.abs(values - self._originals[col_name])
+        order = np.argsort(diff, kind='stable')
+        self._values[col_name] = values
+        self._order[col_name] = order
+        self._sorted[col_name] = diff[order]
+        # NaN differences sort last and never count as mismatches, as with a plain > comparison
+        self._finite[col_name] = int(np.count_nonzero(~np.isnan(diff)))
+
+    def _reset(self, columns):
+        self._columns = columns
+        self._tolerances = {}
+        self._cuts = {col: self._finite[col] for col in columns}
+        self._mismatch = np.zeros((self.n, len(columns)), dtype=bool)
+        self._codes = self.invalid_amount.astype(np.int8)
+
+    @perf.timed(perf.TOLERANCE_INDEX)
+    def update_recalculated(self, recalculated):
+        """
+        Replace some RC_ columns, e.g. after a truncation change. Their tolerances are
+        re-applied on the next validate call.
+        """
+        changed = []
+        for col_name, values in recalculated.items():
+            if self._columns is not None and col_name in self._columns:
+                j = self._columns.index(col_name)
+                rows = self._order[col_name][self._cuts[col_name]:self._finite[col_name]]
+                self._mismatch[rows, j] = False
+                changed.append(rows)
+                self._tolerances.pop(col_name, None)
+            self._index(col_name, np.asarray(values))
+            if self._columns is not None and col_name in self._columns:
+                self._cuts[col_name] = self._finite[col_name]
+        if changed:
+            self._patch(np.unique(np.concatenate(changed)))
+
+    @perf.timed(perf.COMPARE)
+    def validate(self, tolerances):
+        """
+        Apply tolerances, reusing the previous state for every column whose tolerance is unchanged.
+
+        Parameters:
+            tolerances (dict): Absolute tolerance per RC_ column.
+
+        Returns:
+            ValidationResults: A snapshot; later calls do not modify it.
+        """
+        columns = [col for col in tolerances if col in self._order]
+        if columns != self._columns:
+            self._reset(columns)
+
+        affected = []
+        for j, col_name in enumerate(columns):
+            tolerance = tolerances[col_name]
+            if self._tolerances.get(col_name) == tolerance:
+                continue
+            # Rows at or after the cut have a difference strictly greater than the tolerance
+            cut = int(np.searchsorted(self._sorted[col_name], tolerance, side='right'))
+            cut = min(cut, self._finite[col_name])
+            old_cut = self._cuts[col_name]
+            rows = self._order[col_name][min(cut, old_cut):max(cut, old_cut)]
+            self._mismatch[rows, j] = cut < old_cut
+            affected.append(rows)
+            self._cuts[col_name] = cut
+            self._tolerances[col_name] = tolerance
+
+        if affected:
+            self._patch(np.unique(np.concatenate(affected)))
+
+        return ValidationResults(self.transaction_ids, self._columns, self._mismatch.copy(), self.invalid_amount,
+                                 dict(self._values), self._originals, self.expected_recalculated,
+                                 codes=self._codes.copy())
+
+    def _patch(self, rows):
+        if len(rows):
+            self._codes[rows] = status_codes(self._mismatch[rows], self.invalid_amount[rows])
+
+
+def truncation_decimals(tolerance):
+    """Decimal places a tolerance such as 0.01 or 1e-10 truncates to."""
+    return max(-Decimal(str(tolerance)).as_tuple().exponent, 0)
+
+
+def truncate(number, decimals=2):
+    factor = Decimal(10) ** -decimals
+    return number.quantize(factor, rounding=ROUND_DOWN)
+
+
+def to_decimal(values):
+    return np.array([Decimal(x) for x in values], dtype=object)
+
+
+def recalculate_deposits_decimal(df, truncations, recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS,
+                                 checkpoint=None):
+    """
+    Evaluate the RC_ formulas with Decimal objects, truncating each output to the decimal
+    places of its tolerance. Only those decimal places matter, not the tolerance itself.
+    checkpoint, when given, is called between formula steps.
+
+    Returns:
+        dict: RC_ column -> object array of Decimals.
+    """
+    decimals = {col: truncation_decimals(tolerance) for col, tolerance in truncations.items()}
+
+    def finalize(col, values):
+        return np.array([truncate(x, decimals[col]) for x in values], dtype=object)
+
+    return recalculations.evaluate(df, convert=to_decimal, finalize=finalize, checkpoint=checkpoint)
+
+
+@perf.timed(perf.COMPARE)
+def validate_recalculated_deposits_decimal(df, recalculated, truncations, checkpoint=None):
+    """
+    Compare Decimal RC_ values from recalculate_deposits_decimal row by row; df is not modified.
+    checkpoint, when given, is called every CHECKPOINT_ROWS rows.
+    """
+    truncations = {col: Decimal(str(tolerance)) for col, tolerance in truncations.items()}
+    columns = list(truncations)
+    originals = {col_name: df[col_name.replace('RC_', '')].to_numpy() for col_name in recalculated}
+    invalid_amount = np.zeros(len(df), dtype=bool)
+    mismatch = np.zeros((len(df), len(columns)), dtype=bool)
+
+    for i, amount in enumerate(df['Amount Dc'].to_numpy()):
+        if checkpoint is not None and i % CHECKPOINT_ROWS == 0:
+            checkpoint()
+        invalid_amount[i] = not Decimal(amount) > 0
+        for j, col_name in enumerate(columns):
+            if abs(Decimal(recalculated[col_name][i]) - Decimal(originals[col_name][i])) > truncations[col_name]:
+                mismatch[i, j] = True
+
+    return ValidationResults(df['Transaction ID'].to_numpy(), columns, mismatch, invalid_amount, recalculated,
+                             originals, expected_recalculated=True)
+
+
+def recalculate_and_validate_deposits_decimal(df, truncations, recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS):
+    """
+    Reference Decimal implementation used by the "correct decimal" deposit page.
+
+    Every cell is converted to a Decimal, each RC_ value is truncated to the decimal places of
+    its tolerance and compared against the exported value under the current decimal context.
+
+    Parameters:
+        df (DataFrame): Deposit export read with dtype=str, so amounts are parsed exactly.
+        truncations (dict): Tolerance per RC_ column, e.g. 0.01 (truncate to 2 places, allow 0.01).
+
+    Returns:
+        ValidationResults: Status, mismatch matrix and the RC_/original value pairs.
+    """
+    recalculated = recalculate_deposits_decimal(df, truncations, recalculations)
+    for col, values in recalculated.items():
+        df[col] = values
+    return validate_recalculated_deposits_decimal(df, recalculated, truncations)
+
+
+def parse_deposits_exact(df, truncations, recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS, checkpoint=None):
+    """
+    Parse every column the fixed-point path reads (formula inputs, checked columns, Amount Dc)
+    once, for recalculate_deposits_exact and validate_recalculated_deposits_exact to share.
+    checkpoint, when given, is called after each column.
+
+    Returns:
+        dict: Column -> FixedPointArray.
+    """
+    columns = [*recalculations.inputs, 'Amount Dc', *(col.replace('RC_', '') for col in truncations)]
+    parsed = {}
+    for col in dict.fromkeys(columns):
+        parsed[col] = FixedPointArray.from_text(df[col].to_numpy())
+        if checkpoint is not None:
+            checkpoint()
+    return parsed
+
+
+def recalculate_deposits_exact(df, truncations, recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS, parsed=None,
+                               checkpoint=None):
+    """
+    Fixed-point counterpart of recalculate_deposits_decimal.
+
+    Parameters:
+        parsed (dict): Columns from parse_deposits_exact; parsed from df when not given.
+        checkpoint (callable): Optional checkpoint() called between formula steps.
+
+    Returns:
+        dict: RC_ column -> FixedPointArray.
+    """
+    decimals = {col: truncation_decimals(tolerance) for col, tolerance in truncations.items()}
+
+    def finalize(col, values):
+        return values.quantize_down(-decimals[col])
+
+    return recalculations.evaluate(df, convert=FixedPointArray.from_text, finalize=finalize, inputs=parsed,
+                                   checkpoint=checkpoint)
+
+
+@perf.timed(perf.COMPARE)
+def validate_recalculated_deposits_exact(df, recalculated, truncations, parsed=None):
+    """
+    Compare FixedPointArray RC_ values from recalculate_deposits_exact; df is not modified.
+
+    RC_ values stay FixedPointArray columns in the results and are formatted only for the rows
+    shown. parsed (from parse_deposits_exact) saves parsing the checked columns again.
+    """
+    truncations = {col: Decimal(str(tolerance)) for col, tolerance in truncations.items()}
+    columns = list(truncations)
+    parsed = parsed or {}
+
+    def exact(col):
+        return parsed[col] if col in parsed else FixedPointArray.from_text(df[col].to_numpy())
+
+    originals = {col_name: df[col_name.replace('RC_', '')].to_numpy() for col_name in recalculated}
+    invalid_amount = ~(exact('Amount Dc') > 0)
+
+    mismatch = np.zeros((len(df), len(columns)), dtype=bool)
+    for j, col_name in enumerate(columns):
+        mismatch[:, j] = abs(recalculated[col_name] - exact(col_name.replace('RC_', ''))) > truncations[col_name]
+
+    return ValidationResults(df['Transaction ID'].to_numpy(), columns, mismatch, invalid_amount, dict(recalculated),
+                             originals, expected_recalculated=True)
+
+
+def recalculate_and_validate_deposits_exact(df, truncations, recalculations=XAU_BACKUP_DEPOSIT_RECALCULATIONS):
+    """
+    Fixed-point counterpart of recalculate_and_validate_deposits_decimal.
+
+    Amounts are parsed from the CSV text into FixedPointArray columns and every formula,
+    truncation and comparison runs as integer array arithmetic that reproduces the Decimal
+    path bit for bit. Each column is parsed once. RC_ values are formatted as exact decimal
+    strings when rows are displayed.
+
+    Parameters:
+        df (DataFrame): Deposit export read with dtype=str.
+        truncations (dict): Tolerance per RC_ column, as for the Decimal path.
+
+    Returns:
+        ValidationResults: Same statuses and discrepancies as the Decimal path.
+    """
+    parsed = parse_deposits_exact(df, truncations, recalculations)
+    recalculated = recalculate_deposits_exact(df, truncations, recalculations, parsed)
+    return validate_recalculated_deposits_exact(df, recalculated, truncations, parsed)
+
+
+def recalculate_withdrawals(df, recalculations=WITHDRAW_RECALCULATIONS, checkpoint=None):
+    """
+    Evaluate the withdraw RC_ formulas (amount in USD, fees, amount received) without modifying df.
+    checkpoint, when given, is called between formula steps.
+
+    Returns:
+        dict: RC_ column -> float array, in registry order.
+    """
+    return recalculations.evaluate(df, convert=lambda a: a.astype(float, copy=False), checkpoint=checkpoint)
+
+
+def validate_recalculated_withdrawals(df, recalculated, tolerances=None):
+    """
+    Compare precomputed withdraw RC_ values against the export, on the deposit comparison engine.
+
+    Rows whose Withdraw Amount OC is not above zero fail the amount check. The RC_ value is
+    reported as 'Expected', as on the deposit pages.
+    """
+    return validate_recalculated_deposits(df, recalculated, tolerances or WITHDRAW_TOLERANCES,
+                                          invalid_amount=amount_not_positive(df, WITHDRAW_AMOUNT),
+                                          expected_recalculated=True)
+
+
+def recalculate_and_validate_withdrawals(df, tolerances=None):
+    """
+    Validate a withdraw export: amount check plus the WITHDRAW_FORMULAS recalculations.
+
+    Parameters:
+        df (DataFrame): Withdraw export, e.g. read through WITHDRAW_SCHEMA. Not modified.
+        tolerances (dict): Absolute tolerance per RC_ column. Defaults to WITHDRAW_TOLERANCES.
+
+    Returns:
+        ValidationResults: Same layout as a deposit validation.
+    """
+    return validate_recalculated_withdrawals(df, recalculate_withdrawals(df), tolerances)
+
+
+def recalculate_transfers(df, checkpoint=None):
+    # Columns read through TRANSFER_SCHEMA are already float64 and are not copied
+    for col, values in TRANSFER_RECALCULATIONS.evaluate(df, convert=lambda a: a.astype(float, copy=False),
+                                                        checkpoint=checkpoint).items():
+        df[col] = values
+    return df
+
+
+@perf.timed(perf.COMPARE)
+def compare_transfers(df):
+    df['Transaction Fee Oc Matching'] = np.isclose(df['Transaction Fee Oc'].astype(float, copy=False), 
+                                                   df['Recalculated Transaction Fee Oc'], 
+                                                   rtol=1e-5, atol=1e-8)
+    df['Transaction Fee Oc Difference'] = df['Transaction Fee Oc'].astype(float, copy=False) - df['Recalculated Transaction Fee Oc']
+    df['Transfer Amount Matching'] = df['Transfer Amount DC'] == df['Destination Amount DC']
+    df['Currency Matching'] = df['Original Currency - OC'] == df['Destination Currency - DC']
+    df['All Matching'] = df['Transaction Fee Oc Matching'] & df['Transfer Amount Matching'] & df['Currency Matching']
+    return df
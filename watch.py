@@ -0,0 +1,324 @@
+"""
+Validate exports as they land in an inbox directory, as a long-running service.
+
+Usage:
+    python watch.py inbox/
+    python watch.py inbox/ --engine exact --workers 8 --files 3 --port 8765
+    python watch.py inbox/ --once
+
+The inbox is polled every --interval seconds; a CSV, Parquet or Feather file counts as landed
+once its size and modification time hold still between two polls, so a file still being
+copied in is not read half-written (writing under a dot-name and renaming it in skips that
+wait). Its kind (deposit, withdraw or transfer) follows from its header. Results are written
+next to the input:
+
+    <name>.invalid.csv    the invalid rows, as cli.py --output writes them
+    <name>.report.csv     the mismatch report by currency, day and network (see report.py)
+    <name>.summary.json   the counters, or the error that stopped validation
+
+A file whose summary is newer than the file itself is not validated again, also after a
+restart. Validation runs on one pool of worker processes kept for the service's lifetime, so
+the imports, compiled formulas and schemas are loaded once, not per file; --files inputs
+are validated at once, each split into shards across the pool as cli.py does.
+
+With --port, http://127.0.0.1:PORT/status answers with JSON: queue depth, files and rows
+done, throughput and the latest results.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cli import (DEPOSIT_ENGINES, default_tolerances, summary_counts, validate_files, write_reports,
+                 write_results)
+from columnar import INPUT_TYPES
+from schema import TRANSFER_SCHEMA, WITHDRAW_SCHEMA, MissingColumnsError, read_header
+from streaming import CHUNK_ROWS, MAX_OFFENDING_ROWS
+
+POLL_INTERVAL = 1.0
+CONCURRENT_FILES = 2
+
+# Results listed by the status endpoint, and the window its throughput is measured over (seconds)
+LAST_RESULTS = 20
+THROUGHPUT_WINDOW = 300
+
+# Artifact name -> suffix; files ending in one are results, not inputs
+ARTIFACTS = {'invalid': '.invalid.csv', 'report': '.report.csv', 'summary': '.summary.json'}
+
+
+def detect_kind(header, engine='main'):
+    """
+    The transaction type whose schema a header satisfies.
+
+    Raises:
+        MissingColumnsError: Naming the deposit columns missing when no schema matches.
+    """
+    deposit_schema = DEPOSIT_ENGINES[engine][2]
+    for kind, schema in (('transfer', TRANSFER_SCHEMA), ('withdraw', WITHDRAW_SCHEMA), ('deposit', deposit_schema)):
+        if not schema.missing(header):
+            return kind
+    deposit_schema.check(header)
+
+
+def artifact_paths(path):
+    """Artifact name -> path next to an input, e.g. exports/a.csv -> exports/a.summary.json."""
+    stem = os.path.splitext(path)[0]
+    return {name: stem + suffix for name, suffix in ARTIFACTS.items()}
+
+
+def is_input(name):
+    """Whether an inbox file name is an export to validate (not hidden, partial or an artifact)."""
+    if name.startswith('.') or name.endswith(tuple(ARTIFACTS.values())):
+        return False
+    return os.path.splitext(name)[1].lstrip('.').lower() in INPUT_TYPES
+
+
+def _replace(path, write):
+    # Write under a hidden name and rename, so readers never see a partial artifact
+    directory, name = os.path.split(path)
+    partial = os.path.join(directory, '.' + name)
+    write(partial)
+    os.replace(partial, path)
+
+
+class InboxWatcher:
+    """
+    Poll an inbox and validate every export that lands in it.
+
+    Parameters:
+        inbox (str): Directory to watch; artifacts are written into it.
+        engine (str): Deposit engine in cli.DEPOSIT_ENGINES.
+        workers (int): Worker processes shared by every file; defaults to the CPU count.
+        files (int): Files validated at once.
+        interval (float): Seconds between polls.
+        chunksize (int): Rows per chunk inside each shard.
+        max_offending_rows (int): Cap on invalid rows kept per file.
+    """
+
+    def __init__(self, inbox, engine='main', workers=None, files=CONCURRENT_FILES, interval=POLL_INTERVAL,
+                 chunksize=CHUNK_ROWS, max_offending_rows=MAX_OFFENDING_ROWS):
+        if engine not in DEPOSIT_ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}; expected one of {list(DEPOSIT_ENGINES)}")
+        self.inbox = inbox
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.chunksize = chunksize
+        self.max_offending_rows = max_offending_rows
+        self.started = time.time()
+        self.results = deque(maxlen=LAST_RESULTS)
+        self.files_done = 0
+        self.files_failed = 0
+        self.rows_done = 0
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._files = ThreadPoolExecutor(max_workers=files, thread_name_prefix='inbox-file')
+        self._lock = threading.Lock()
+        # path -> (size, mtime) at the last poll, until the file holds still
+        self._seen = {}
+        # path -> (size, mtime) of files queued or validated by this process
+        self._taken = {}
+        self._queued = set()
+        self._running = set()
+        self._finished = deque()
+
+    def warm_up(self):
+        """Start every worker process now, so the first file does not wait for them."""
+        for future in [self._pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return self
+
+    def landed(self):
+        """Inputs that held still since the last poll and have no up-to-date summary."""
+        landed = []
+        for entry in os.scandir(self.inbox):
+            if not entry.is_file() or not is_input(entry.name):
+                continue
+            stat = entry.stat()
+            state = (stat.st_size, stat.st_mtime_ns)
+            previous, self._seen[entry.path] = self._seen.get(entry.path), state
+            if previous != state or self._taken.get(entry.path) == state:
+                continue
+            summary = artifact_paths(entry.path)['summary']
+            if os.path.exists(summary) and os.stat(summary).st_mtime_ns >= stat.st_mtime_ns:
+                self._taken[entry.path] = state
+                continue
+            landed.append((entry.path, state))
+        return landed
+
+    def poll(self):
+        """Queue every file that landed since the last poll; returns how many were queued."""
+        landed = self.landed()
+        for path, state in landed:
+            self._taken[path] = state
+            with self._lock:
+                self._queued.add(path)
+            self._files.submit(self.validate, path)
+        return len(landed)
+
+    def run(self, stop=None, once=False):
+        """
+        Poll until stop (a threading.Event) is set.
+
+        With once, validate what is in the inbox now and return when it is done; files are
+        taken as they are, without waiting for them to hold still.
+        """
+        stop = stop or threading.Event()
+        if once:
+            # The first scan only records sizes, so the second takes every file
+            self.landed()
+            self.poll()
+            self.drain()
+            return
+        while not stop.is_set():
+            self.poll()
+            stop.wait(self.interval)
+
+    def drain(self):
+        """Wait until every queued file is validated."""
+        while True:
+            with self._lock:
+                if not self._queued and not self._running:
+                    return
+            time.sleep(0.05)
+
+    def validate(self, path):
+        """Validate one input and write its artifacts; runs on a file thread."""
+        with self._lock:
+            self._queued.discard(path)
+            self._running.add(path)
+        artifacts = artifact_paths(path)
+        record = {'file': path, 'kind': None, 'total_rows': 0, 'invalid_count': 0, 'error': None,
+                  'started': time.time()}
+        try:
+            try:
+                record['kind'] = kind = detect_kind(read_header(path), self.engine)
+                tolerances = None if kind == 'transfer' else default_tolerances(kind, self.engine)
+                summary = validate_files(kind, [path], self.engine, tolerances, self.workers, self.chunksize,
+                                         self.max_offending_rows, report=True, pool=self._pool)[path]
+                _replace(artifacts['invalid'], lambda target: write_results({path: summary}, target))
+                _replace(artifacts['report'], lambda target: write_reports({path: summary}, target))
+                record.update(summary_counts(summary))
+            except (MissingColumnsError, ValueError, OSError) as e:
+                record['error'] = str(e)
+            except Exception as e:
+                # Any other failure is the file's too; the service keeps running and the summary says why
+                record['error'] = f"{type(e).__name__}: {e}"
+            record['seconds'] = time.time() - record['started']
+            try:
+                _replace(artifacts['summary'], lambda target: _write_json(record, target))
+            except OSError as e:
+                record['error'] = record['error'] or f"Cannot write {artifacts['summary']}: {e}"
+        finally:
+            # Whatever happened, the file is no longer running, so drain() returns
+            finished = time.time()
+            with self._lock:
+                self._running.discard(path)
+                self.results.appendleft(record)
+                if record['error']:
+                    self.files_failed += 1
+                else:
+                    self.files_done += 1
+                    self.rows_done += record['total_rows']
+                    self._finished.append((finished, record['total_rows']))
+        return record
+
+    def status(self):
+        """Queue depth, totals, throughput and the latest results, as served on /status."""
+        now = time.time()
+        with self._lock:
+            while self._finished and self._finished[0][0] < now - THROUGHPUT_WINDOW:
+                self._finished.popleft()
+            window = min(THROUGHPUT_WINDOW, now - self.started) or 1.0
+            return {
+                'inbox': os.path.abspath(self.inbox),
+                'engine': self.engine,
+                'workers': self.workers,
+                'uptime_seconds': now - self.started,
+                'queue_depth': len(self._queued) + len(self._running),
+                'queued': sorted(self._queued),
+                'running': sorted(self._running),
+                'files_done': self.files_done,
+                'files_failed': self.files_failed,
+                'rows_done': self.rows_done,
+                'files_per_minute': len(self._finished) / window * 60,
+                'rows_per_second': sum(rows for _, rows in self._finished) / window,
+                'last_results': list(self.results),
+            }
+
+    def close(self):
+        """Finish the files being validated; queued ones are left for the next start."""
+        self._files.shutdown(wait=True, cancel_futures=True)
+        self._pool.shutdown(wait=True)
+
+
+def _write_json(record, path):
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2)
+
+
+def serve_status(watcher, port, host='127.0.0.1'):
+    """Serve watcher.status() as JSON on /status from a daemon thread; returns the server."""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/status'):
+                self.send_error(404)
+                return
+            body = json.dumps(watcher.status(), indent=2).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, name='status', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inbox')
+    parser.add_argument('--engine', choices=list(DEPOSIT_ENGINES), default='main',
+                        help="Deposit engine: main, truncated or exact (see cli.py)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--files', type=int, default=CONCURRENT_FILES, help="Files validated at once")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--max-offending-rows', type=int, default=MAX_OFFENDING_ROWS)
+    parser.add_argument('--port', type=int, default=None, help="Serve /status on this local port")
+    parser.add_argument('--once', action='store_true', help="Validate the inbox's current files and exit")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.inbox):
+        parser.error(f"not a directory: {args.inbox}")
+
+    watcher = InboxWatcher(args.inbox, args.engine, args.workers, args.files, args.interval, args.chunksize,
+                           args.max_offending_rows).warm_up()
+    server = serve_status(watcher, args.port) if args.port is not None else None
+    print(f"Watching {os.path.abspath(args.inbox)} with {watcher.workers} workers"
+          + (f"; status on http://127.0.0.1:{server.server_port}/status" if server else ""), file=sys.stderr)
+    # A service manager stops the service with SIGTERM; the file being validated is finished first
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        watcher.run(stop, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+        watcher.close()
+    return 1 if args.once and watcher.files_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())